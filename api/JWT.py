@@ -1,3 +1,7 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 
 from jose import JWTError, jwt
@@ -6,6 +10,56 @@ from api import schemas
 from core.config import settings
 
 
+class TokenCache:
+    """LRU cache of verified tokens, entries are dropped at the token's exp."""
+
+    def __init__(self, max_size: int, clock=time.time):
+        self.max_size = max_size
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, tuple[schemas.TokenData, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, key: bytes) -> schemas.TokenData | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                token_data, expires_at = entry
+                if expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return token_data
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: bytes, token_data: schemas.TokenData, expires_at: float):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (token_data, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def statistics(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+token_cache = TokenCache(max_size=settings.TOKEN_CACHE_SIZE)
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     if expires_delta:
@@ -18,6 +72,11 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
 
 
 def verify_token(token: str, credentials_exception):
+    cache_key = token_cache.key(token)
+    token_data = token_cache.get(cache_key)
+    if token_data is not None:
+        return token_data
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: str = payload.get('user_id')
@@ -26,4 +85,9 @@ def verify_token(token: str, credentials_exception):
         token_data = schemas.TokenData(user_id=user_id)
     except JWTError:
         raise credentials_exception
+
+    # only tokens with an expiry are cached, so no entry outlives its token
+    expires_at = payload.get('exp')
+    if isinstance(expires_at, (int, float)):
+        token_cache.put(cache_key, token_data, expires_at)
     return token_data
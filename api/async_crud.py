@@ -0,0 +1,131 @@
+import io
+
+from fastapi import HTTPException, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api import models, schemas, crud, hashing, images, recurrence, JWT
+from core import validator
+from core.concurrency import run_blocking
+from core.config import settings
+
+
+async def login(request: OAuth2PasswordRequestForm, db: AsyncSession):
+    db_user = await get_user_by_email(email=request.username, db=db)
+
+    # awaited, so a slow hash holds no threadpool thread
+    if not await hashing.verify_async(request.password, db_user.password_hash, db_user.password_salt):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f'Incorrect password.'
+        )
+
+    access_token = JWT.create_access_token(data={'user_id': db_user.id})
+    return {'access_token': access_token, 'token_type': 'bearer'}
+
+
+async def get_all_users(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: str | None = None):
+    result = await db.execute(crud.all_users_statement(skip=skip, limit=limit, cursor=cursor))
+    return result.scalars().all()
+
+
+async def get_user_by_id(db: AsyncSession, user_id: int):
+    result = await db.execute(select(models.User).where(models.User.id == user_id))
+    db_user = result.scalars().first()
+
+    if db_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f'User not found.'
+        )
+
+    return db_user
+
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    db_user = result.scalars().first()
+
+    if db_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f'User not found.'
+        )
+
+    return db_user
+
+
+async def validate_unique_email(db: AsyncSession, email: str):
+    result = await db.execute(select(models.User.id).where(models.User.email == email))
+    if result.first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Email already registered.',
+        )
+
+
+async def create_user(db: AsyncSession, request: schemas.UserCreate):
+    salt = hashing.generate_salt()
+    db_user = models.User(
+        email=request.email,
+        password_hash=await hashing.bcrypt_async(request.password, salt),
+        password_salt=salt,
+        profile_picture=f'{settings.DEFAULT_PROFILE_PICTURE}',
+        # the collection of a pending object is empty, nothing is lazy loaded here
+        calls=[],
+    )
+
+    db.add(db_user)
+    await db.commit()
+    # created_at is a server default, the only column the response still needs
+    await db.refresh(db_user, attribute_names=['created_at'])
+    return db_user
+
+
+async def get_all_calls(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: str | None = None):
+    result = await db.execute(crud.all_calls_statement(skip=skip, limit=limit, cursor=cursor))
+    return result.scalars().all()
+
+
+async def get_conflicting_call_ids(db: AsyncSession, user_id: int, intervals: list,
+                                   exclude_call_id: int | None = None):
+    if not intervals:
+        return []
+    statement = crud.conflicting_calls_statement(user_id=user_id, intervals=intervals,
+                                                 exclude_call_id=exclude_call_id)
+    rows = (await db.execute(statement)).all()
+    exceptions_statement = crud.series_exceptions_statement(rows)
+    exceptions = (await db.execute(exceptions_statement)).all() if exceptions_statement is not None else []
+    return recurrence.conflicting_ids(rows, intervals, exceptions=exceptions)
+
+
+async def create_call_for_user(db: AsyncSession, user_id: int, call: schemas.CallCreate):
+    validator.validate_title(call.title)
+    validator.validate_duration(call.duration)
+    validator.validate_recurrence(date=call.date, duration=call.duration, frequency=call.recurrence_frequency,
+                                  interval=call.recurrence_interval, until=call.recurrence_until)
+
+    db_user = await get_user_by_id(user_id=user_id, db=db)
+    intervals = recurrence.planned_intervals(call.date, call.duration, call.recurrence_frequency,
+                                             call.recurrence_interval, call.recurrence_until)
+    conflicting_call_ids = await get_conflicting_call_ids(db=db, user_id=user_id, intervals=intervals)
+    validator.validate_no_conflicting_calls(conflicting_call_ids=conflicting_call_ids)
+
+    # the collection of a pending object is empty, nothing is lazy loaded here
+    db_call = models.Call(**call.dict(), owner_id=user_id, users=[db_user])
+
+    db.add(db_call)
+    await db.execute(crud.bump_user_versions([user_id]))
+    await db.commit()
+    return db_call
+
+
+async def upload_profile_image(db: AsyncSession, user_id: int, image: bytes):
+    await get_user_by_id(user_id=user_id, db=db)
+
+    file_path = await run_blocking(images.store_profile_image, source=io.BytesIO(image))
+
+    await db.execute(update(models.User).where(models.User.id == user_id).values(profile_picture=str(file_path)))
+    await db.execute(crud.bump_user_versions([user_id]))
+    await db.commit()
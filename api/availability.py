@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+
+def to_epoch(date: datetime) -> float:
+    # naive datetimes are stored as UTC
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.timestamp()
+
+
+def from_epoch(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+def merge_busy(starts: np.ndarray, ends: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Merge overlapping [start, end) intervals, returns sorted disjoint intervals."""
+    if starts.size == 0:
+        return starts, ends
+
+    order = np.argsort(starts, kind='stable')
+    starts, ends = starts[order], ends[order]
+
+    # an interval opens a new block when it starts after every earlier interval ended
+    reach = np.maximum.accumulate(ends)
+    opens = np.empty(starts.size, dtype=bool)
+    opens[0] = True
+    opens[1:] = starts[1:] > reach[:-1]
+
+    block_starts = starts[opens]
+    block_ends = reach[np.r_[np.flatnonzero(opens)[1:] - 1, starts.size - 1]]
+    return block_starts, block_ends
+
+
+def free_slots(starts: np.ndarray, ends: np.ndarray, window_start: float, window_end: float,
+               duration: float, limit: int | None = None) -> list[tuple[float, float]]:
+    """Gaps of at least `duration` seconds between busy intervals inside the window.
+
+    All values are epoch seconds. Slots are ranked by start time, the
+    earliest gap that fits comes first.
+    """
+    starts = np.clip(np.asarray(starts, dtype=np.float64), window_start, window_end)
+    ends = np.clip(np.asarray(ends, dtype=np.float64), window_start, window_end)
+    busy_starts, busy_ends = merge_busy(starts, ends)
+
+    gap_starts = np.r_[window_start, busy_ends]
+    gap_ends = np.r_[busy_starts, window_end]
+    fits = np.flatnonzero(gap_ends - gap_starts >= duration)
+    if limit is not None:
+        fits = fits[:limit]
+
+    return list(zip(gap_starts[fits].tolist(), gap_ends[fits].tolist()))
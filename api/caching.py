@@ -0,0 +1,51 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response, status
+
+# API data may be cached by the client but has to be revalidated every time
+DATA_CACHE_CONTROL = 'private, no-cache'
+
+
+def make_etag(*parts) -> str:
+    # weak, the tag tracks the data, not the exact bytes of the response
+    digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _opaque_tag(tag: str) -> str:
+    return tag.strip().removeprefix('W/')
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime | None = None) -> bool:
+    # If-None-Match takes precedence over If-Modified-Since (RFC 7232, section 6)
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        if if_none_match.strip() == '*':
+            return True
+        return _opaque_tag(etag) in {_opaque_tag(tag) for tag in if_none_match.split(',')}
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+
+    return False
+
+
+def cache_headers(etag: str, cache_control: str = DATA_CACHE_CONTROL,
+                  last_modified: datetime | None = None) -> dict[str, str]:
+    headers = {'ETag': etag, 'Cache-Control': cache_control}
+    if last_modified is not None:
+        headers['Last-Modified'] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def not_modified(headers: dict[str, str]) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
@@ -1,35 +1,49 @@
-from datetime import timedelta
-from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO
 
+import numpy as np
 from fastapi import HTTPException, status
-from fastapi.responses import FileResponse
-from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import Float, Text, and_, cast, delete, exists, func, literal_column, or_, select, true, tuple_, union, \
+    update
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from sqlalchemy.orm import Session, selectinload
 
-from api import models, schemas, hashing, JWT
+from api import models, schemas, availability, hashing, images, pagination, recurrence, trigrams
 from core import validator
 from core.config import settings
 
+# eager loads matching the nesting of the response models, so serializing a
+# page costs a constant number of queries instead of one per row
+USER_RESPONSE_OPTIONS = (selectinload(models.User.calls).selectinload(models.Call.users),)
+CALL_RESPONSE_OPTIONS = (selectinload(models.Call.users),)
+SERIES_OPTIONS = (selectinload(models.Call.exceptions),)
 
-def login(request: OAuth2PasswordRequestForm, db: Session):
-    db_user = get_user_by_email(email=request.username, db=db)
+# what a conflict check reads of each candidate call, no ORM rows are built
+SCHEDULE_COLUMNS = (models.Call.id, models.Call.date, models.Call.duration, models.Call.recurrence_frequency,
+                    models.Call.recurrence_interval, models.Call.recurrence_until)
+CALL_SCHEDULE = ('date', 'duration', 'recurrence_frequency', 'recurrence_interval', 'recurrence_until')
 
-    if not hashing.verify(request.password, db_user.password_hash, db_user.password_salt):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=f'Incorrect password.'
-        )
 
-    access_token = JWT.create_access_token(data={'user_id': db_user.id})
-    return {'access_token': access_token, 'token_type': 'bearer'}
+def all_users_statement(skip: int = 0, limit: int = 100, cursor: str | None = None):
+    statement = select(models.User).order_by(models.User.id)
+
+    # keyset pagination on id costs the same for every page, skip is O(skip)
+    if cursor is not None:
+        last_id = pagination.decode_user_cursor(cursor)
+        statement = statement.where(models.User.id > last_id)
+    else:
+        statement = statement.offset(skip)
+
+    return statement.limit(limit)
 
 
-def get_all_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+def get_all_users(db: Session, skip: int = 0, limit: int = 100, cursor: str | None = None):
+    statement = all_users_statement(skip=skip, limit=limit, cursor=cursor).options(*USER_RESPONSE_OPTIONS)
+    return db.execute(statement).scalars().all()
 
 
-def get_user_by_id(db: Session, user_id: int):
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+def get_user_by_id(db: Session, user_id: int, options: tuple = ()):
+    db_user = db.query(models.User).filter(models.User.id == user_id).options(*options).first()
 
     if db_user is None:
         raise HTTPException(
@@ -40,8 +54,65 @@ def get_user_by_id(db: Session, user_id: int):
     return db_user
 
 
-def get_user_by_email(db: Session, email: str):
-    db_user = db.query(models.User).filter(models.User.email == email).first()
+def search_patterns(query: str) -> tuple[str, str]:
+    # LIKE wildcards in the query match literally
+    escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%', f'{escaped}%'
+
+
+def search_candidates(id_column, text_column, query: str, limit: int, *criteria,
+                      frequent: frozenset[str] = frozenset()):
+    """Ids and texts of the matches a search ranks.
+
+    Ranking computes similarity for every row it sees, so it only sees the
+    first limit prefix matches, since those always rank first, and when
+    they are fewer, up to SEARCH_CANDIDATES matches from the trigram index.
+    Under the C collation the lower(column) btree serves both the prefix
+    LIKE and its order, so that scan stops at the limit. The trigram scan
+    leaves out the frequent trigrams of the query, see trigrams.narrow_query.
+    """
+    contains, prefix = search_patterns(query)
+    narrow, _ = search_patterns(trigrams.narrow_query(query, frequent))
+    lowered = func.lower(text_column).collate('C')
+    prefix_matches = select(id_column, text_column.label('text')) \
+        .where(lowered.like(prefix.lower(), escape='\\'), *criteria) \
+        .order_by(lowered) \
+        .limit(limit) \
+        .cte('prefix_matches')
+    matches = select(id_column, text_column.label('text')).where(text_column.ilike(narrow, escape='\\'), *criteria)
+    if narrow != contains:
+        # under lower() the whole pattern is only checked on the rows the index found
+        matches = matches.where(func.lower(text_column).like(contains.lower(), escape='\\'))
+    # a one-time filter, the trigram scan does not run when the prefix matches fill the limit
+    matches = matches.where(select(func.count()).select_from(prefix_matches).scalar_subquery() < limit) \
+        .limit(settings.SEARCH_CANDIDATES)
+    return union(select(prefix_matches.c.id, prefix_matches.c.text), matches).subquery()
+
+
+def search_users(db: Session, query: str, limit: int = 10):
+    query = query.strip()
+    validator.validate_search_query(query)
+    limit = min(limit, settings.SEARCH_MAX_LIMIT)
+    _, prefix = search_patterns(query)
+
+    # prefix matches rank first, then the closest ones
+    candidates = search_candidates(models.User.id, models.User.email, query, limit,
+                                   frequent=trigrams.frequent_trigrams.get(db, models.User.email))
+    # ranked on the candidates' emails, only the top ones are read back from users
+    is_prefix = candidates.c.text.ilike(prefix, escape='\\').label('is_prefix')
+    similarity = func.similarity(candidates.c.text, query).label('similarity')
+    ranked = select(candidates.c.id, is_prefix, similarity) \
+        .order_by(is_prefix.desc(), similarity.desc(), candidates.c.id) \
+        .limit(limit) \
+        .subquery()
+    statement = select(models.User) \
+        .join(ranked, ranked.c.id == models.User.id) \
+        .order_by(ranked.c.is_prefix.desc(), ranked.c.similarity.desc(), models.User.id)
+    return db.execute(statement).scalars().all()
+
+
+def get_user_by_email(db: Session, email: str, options: tuple = ()):
+    db_user = db.query(models.User).filter(models.User.email == email).options(*options).first()
 
     if db_user is None:
         raise HTTPException(
@@ -52,21 +123,6 @@ def get_user_by_email(db: Session, email: str):
     return db_user
 
 
-def create_user(db: Session, request: schemas.UserCreate):
-    salt = hashing.generate_salt()
-    db_user = models.User(
-        email=request.email,
-        password_hash=hashing.bcrypt(request.password, salt),
-        password_salt=salt,
-        profile_picture=f'{settings.DEFAULT_PROFILE_PICTURE}',
-    )
-
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
-
-
 def update_user(db: Session, user_id: int, request: schemas.UserUpdate):
     user = db.query(models.User).filter(models.User.id == user_id)
 
@@ -92,8 +148,12 @@ def update_user(db: Session, user_id: int, request: schemas.UserUpdate):
         params['password_salt'] = salt
 
     user.update(params)
+    db.execute(bump_user_versions([user_id]))
+    if 'email' in params:
+        # the email is embedded in the call participants of everyone sharing a call
+        db.execute(bump_user_versions(co_participants(user_id)))
     db.commit()
-    return user.first()
+    return get_user_by_id(user_id=user_id, db=db, options=USER_RESPONSE_OPTIONS)
 
 
 def delete_user(db: Session, user_id: int):
@@ -105,77 +165,249 @@ def delete_user(db: Session, user_id: int):
             detail=f'User not found.',
         )
 
+    db.execute(bump_user_versions(co_participants(user_id)))
     user.delete(synchronize_session=False)
     db.commit()
 
 
-def get_calls_of_user(db: Session, user_id: int):
-    db_user = get_user_by_id(user_id=user_id, db=db)
-    return db_user.calls
+def get_calls_of_user(db: Session, user_id: int, start: datetime | None = None, end: datetime | None = None,
+                      limit: int = settings.AGENDA_DEFAULT_LIMIT):
+    get_user_by_id(user_id=user_id, db=db)
+    start, end = validator.validate_time_window(start=start, end=end)
+    now = datetime.now(timezone.utc)
+    if start is None and (end is None or end > now):
+        # without a start the limit would keep the oldest calls of the account,
+        # the agenda starts at the calls still running or coming up
+        start = now
+
+    # with a window the planner can range scan calls by date and probe the
+    # calls_users primary key, so cost follows the window, not account age
+    statement = select(models.Call) \
+        .join(models.calls_users, models.calls_users.c.call_id == models.Call.id) \
+        .where(models.calls_users.c.user_id == user_id, calls_in_window_clause(start=start, end=end)) \
+        .order_by(models.Call.date, models.Call.id) \
+        .options(*CALL_RESPONSE_OPTIONS)
+
+    # the limit applies to single calls in SQL, series are few and expanded here
+    calls = db.execute(statement.where(models.Call.recurrence_frequency.is_(None)).limit(limit)).scalars().all()
+    series = db.execute(statement.where(models.Call.recurrence_frequency.isnot(None)).options(*SERIES_OPTIONS))
+    occurrences = [occurrence for call in series.scalars() for occurrence in recurrence.expand(call, start, end)]
+    if not occurrences:
+        return calls
+
+    return sorted(calls + occurrences, key=lambda call: (call.date, call.id))[:limit]
+
+
+def calls_in_window_clause(start: datetime | None = None, end: datetime | None = None):
+    single = [models.Call.recurrence_frequency.is_(None)]
+    series = [models.Call.recurrence_frequency.isnot(None)]
+    if start is not None:
+        # no call is longer than MAX_CALL_DURATION, so only calls starting after
+        # start - MAX_CALL_DURATION can still be running at start, which bounds
+        # the date range scanned through the indexes on calls.date
+        lookback = start - timedelta(minutes=settings.MAX_CALL_DURATION)
+        single.append(models.Call.date > lookback)
+        single.append(models.Call.date + func.make_interval(0, 0, 0, 0, 0, models.Call.duration) > start)
+        series.append(or_(models.Call.recurrence_until.is_(None), models.Call.recurrence_until > lookback))
+    if end is not None:
+        single.append(models.Call.date < end)
+        series.append(models.Call.date < end)
+    # a series is a candidate when its span touches the window, its
+    # occurrences are matched exactly by recurrence.expand
+    return or_(and_(*single), and_(*series))
+
+
+def conflicting_calls_statement(user_id: int, intervals: list[tuple[datetime, datetime]],
+                                exclude_call_id: int | None = None):
+    # every call the user takes part in counts, not only the ones they own; the
+    # planner either range scans calls by date and probes the calls_users
+    # primary key, or walks the user's memberships, whichever is cheaper.
+    # candidates span the whole interval list, exact overlaps are left to
+    # recurrence.conflicting_ids
+    statement = select(*SCHEDULE_COLUMNS) \
+        .join(models.calls_users, models.calls_users.c.call_id == models.Call.id) \
+        .where(models.calls_users.c.user_id == user_id,
+               calls_in_window_clause(start=intervals[0][0], end=intervals[-1][1]))
+    if exclude_call_id is not None:
+        statement = statement.where(models.Call.id != exclude_call_id)
+
+    return statement.order_by(models.Call.date)
+
+
+def series_exceptions_statement(rows):
+    """Exceptions of the series among schedule rows, None when there is no series."""
+    call_ids = [row.id for row in rows if row.recurrence_frequency is not None]
+    if not call_ids:
+        return None
+    exception = models.CallException
+    return select(exception.call_id, exception.occurrence, exception.cancelled, exception.duration) \
+        .where(exception.call_id.in_(call_ids))
+
+
+def get_conflicting_call_ids(db: Session, user_id: int, intervals: list[tuple[datetime, datetime]],
+                             exclude_call_id: int | None = None):
+    if not intervals:
+        return []
+    statement = conflicting_calls_statement(user_id=user_id, intervals=intervals,
+                                            exclude_call_id=exclude_call_id)
+    rows = db.execute(statement).all()
+    exceptions_statement = series_exceptions_statement(rows)
+    exceptions = db.execute(exceptions_statement).all() if exceptions_statement is not None else []
+    return recurrence.conflicting_ids(rows, intervals, exceptions=exceptions)
+
+
+def check_call_conflicts(db: Session, user_id: int, intervals: list[tuple[datetime, datetime]],
+                         exclude_call_id: int | None = None,
+                         message: str = 'You already have a scheduled meeting in this timeslot.'):
+    conflicting_call_ids = get_conflicting_call_ids(db=db, user_id=user_id, intervals=intervals,
+                                                    exclude_call_id=exclude_call_id)
+    validator.validate_no_conflicting_calls(conflicting_call_ids=conflicting_call_ids, message=message)
 
 
 def create_call_for_user(db: Session, user_id: int, call: schemas.CallCreate):
     validator.validate_title(call.title)
     validator.validate_duration(call.duration)
+    validator.validate_recurrence(date=call.date, duration=call.duration, frequency=call.recurrence_frequency,
+                                  interval=call.recurrence_interval, until=call.recurrence_until)
 
     db_user = get_user_by_id(user_id=user_id, db=db)
-    db_call = models.Call(**call.dict(), owner_id=user_id)
-
-    zero_time = timedelta(minutes=0)
-    new_call_start = db_call.date
-    new_call_end = db_call.date + timedelta(minutes=db_call.duration)
-    for c in db_user.owned_calls:
-        old_call_start = c.date
-        old_call_end = c.date + timedelta(minutes=c.duration)
-        if min(new_call_end, old_call_end) - max(new_call_start, old_call_start) > zero_time:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail=f'You already have a scheduled meeting in this timeslot.',
-            )
+    check_call_conflicts(db=db, user_id=user_id, intervals=recurrence.planned_intervals(
+        call.date, call.duration, call.recurrence_frequency, call.recurrence_interval, call.recurrence_until))
 
+    db_call = models.Call(**call.dict(), owner_id=user_id)
     db_call.users.append(db_user)
 
     db.add(db_call)
+    db.execute(bump_user_versions([user_id]))
     db.commit()
     db.refresh(db_call)
     return db_call
 
 
+def call_users_statement(call_id: int):
+    return select(models.User) \
+        .join(models.calls_users, models.calls_users.c.user_id == models.User.id) \
+        .where(models.calls_users.c.call_id == call_id) \
+        .order_by(models.User.id)
+
+
+def is_call_member(db: Session, call_id: int, user_id: int):
+    # answered from the calls_users primary key, the participant list is never loaded
+    return db.execute(select(exists().where(
+        models.calls_users.c.call_id == call_id,
+        models.calls_users.c.user_id == user_id,
+    ))).scalar()
+
+
 def add_user_to_call(db: Session, user_id: int, call_id: int):
-    db_user = get_user_by_id(user_id=user_id, db=db)
+    get_user_by_id(user_id=user_id, db=db)
     db_call = get_call_by_id(call_id=call_id, db=db)
 
-    if db_user in db_call.users:
+    if is_call_member(db=db, call_id=call_id, user_id=user_id):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f'User is already in this call.',
         )
 
-    db_call.users.append(db_user)
+    check_call_conflicts(db=db, user_id=user_id, intervals=recurrence.call_intervals(db_call),
+                         exclude_call_id=call_id, message='User has a scheduled meeting in this timeslot.')
+
+    db.execute(
+        insert(models.calls_users)
+        .values(user_id=user_id, call_id=call_id)
+        .on_conflict_do_nothing()
+    )
+    db.execute(bump_user_versions(call_participants(call_id)))
     db.commit()
-    db.refresh(db_call)
-    return db_call.users
+    return db.execute(call_users_statement(call_id)).scalars().all()
 
 
 def remove_user_from_call(db: Session, user_id: int, call_id: int):
-    db_user = get_user_by_id(user_id=user_id, db=db)
-    db_call = get_call_by_id(call_id=call_id, db=db)
-
-    if db_user not in db_call.users:
+    get_user_by_id(user_id=user_id, db=db)
+    get_call_by_id(call_id=call_id, db=db)
+
+    # before the delete, so the removed user is bumped too
+    db.execute(bump_user_versions(call_participants(call_id)))
+    removed = db.execute(
+        delete(models.calls_users)
+        .where(models.calls_users.c.call_id == call_id, models.calls_users.c.user_id == user_id)
+        .returning(models.calls_users.c.user_id)
+    ).first()
+
+    if removed is None:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f'User is not in this call.',
         )
 
-    db_call.users.remove(db_user)
     db.commit()
-    db.refresh(db_call)
-    return db_call.users
+    return db.execute(call_users_statement(call_id)).scalars().all()
+
+
+def add_users_to_call(db: Session, call_id: int, user_ids: list[int]):
+    db_call = get_call_by_id(call_id=call_id, db=db)
+    user_ids = list(dict.fromkeys(user_ids))
+    result = schemas.BulkResult()
+
+    # existence and current membership of every requested user in one query
+    rows = db.execute(
+        select(models.User.id, models.calls_users.c.call_id.isnot(None))
+        .outerjoin(models.calls_users, and_(models.calls_users.c.user_id == models.User.id,
+                                            models.calls_users.c.call_id == call_id))
+        .where(models.User.id.in_(user_ids))
+    ).all()
+    found = {user_id: is_member for user_id, is_member in rows}
+    result.not_found = [user_id for user_id in user_ids if user_id not in found]
+    result.already_present = [user_id for user_id in user_ids if found.get(user_id)]
+
+    candidates = [user_id for user_id in user_ids if found.get(user_id) is False]
+    intervals = recurrence.call_intervals(db_call)
+    if candidates and intervals:
+        # calls every candidate takes part in, owned or not, in one query
+        member_calls = db.execute(
+            select(models.calls_users.c.user_id, *SCHEDULE_COLUMNS)
+            .join(models.Call, models.Call.id == models.calls_users.c.call_id)
+            .where(
+                models.calls_users.c.user_id.in_(candidates),
+                models.Call.id != call_id,
+                calls_in_window_clause(start=intervals[0][0], end=intervals[-1][1]),
+            )
+        ).all()
+        calls = list({row.id: row for row in member_calls}.values())
+        exceptions_statement = series_exceptions_statement(calls)
+        exceptions = db.execute(exceptions_statement).all() if exceptions_statement is not None else []
+        conflicting_ids = set(recurrence.conflicting_ids(calls, intervals, exceptions=exceptions))
+        conflicting = {row.user_id for row in member_calls if row.id in conflicting_ids}
+        result.conflicting = [user_id for user_id in candidates if user_id in conflicting]
+        candidates = [user_id for user_id in candidates if user_id not in conflicting]
+
+    if candidates:
+        # rows inserted concurrently since the lookup are skipped, not an error
+        added = set(db.execute(
+            insert(models.calls_users)
+            .values([{'user_id': user_id, 'call_id': call_id} for user_id in candidates])
+            .on_conflict_do_nothing()
+            .returning(models.calls_users.c.user_id)
+        ).scalars())
+        result.added = [user_id for user_id in candidates if user_id in added]
+        result.already_present += [user_id for user_id in candidates if user_id not in added]
+        if added:
+            db.execute(bump_user_versions(call_participants(call_id)))
+
+    db.commit()
+    return result
+
+
+def contacts_statement(user_id: int):
+    return select(models.User) \
+        .join(models.users_contacts, models.users_contacts.c.contact_id == models.User.id) \
+        .where(models.users_contacts.c.user_id == user_id) \
+        .order_by(models.User.id)
 
 
 def get_contacts(db: Session, user_id: int):
-    db_user = get_user_by_id(user_id=user_id, db=db)
-    return db_user.contacts
+    get_user_by_id(user_id=user_id, db=db)
+    return db.execute(contacts_statement(user_id)).scalars().all()
 
 
 def add_contact(db: Session, user_id: int, contact_id: int):
@@ -185,37 +417,96 @@ def add_contact(db: Session, user_id: int, contact_id: int):
             detail=f'User can not be added as a contact.',
         )
 
-    db_user = get_user_by_id(user_id=user_id, db=db)
-    db_contact = get_user_by_id(user_id=contact_id, db=db)
+    get_user_by_id(user_id=user_id, db=db)
+    get_user_by_id(user_id=contact_id, db=db)
+
+    # the primary key decides membership, nothing is inserted if the row exists
+    added = db.execute(
+        insert(models.users_contacts)
+        .values(user_id=user_id, contact_id=contact_id)
+        .on_conflict_do_nothing()
+        .returning(models.users_contacts.c.contact_id)
+    ).first()
 
-    if db_contact in db_user.contacts:
+    if added is None:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f'Contact is already in contact list.',
         )
 
-    db_user.contacts.append(db_contact)
     db.commit()
-    return db_user.contacts
+    return db.execute(contacts_statement(user_id)).scalars().all()
+
+
+def add_contacts(db: Session, user_id: int, contact_ids: list[int]):
+    get_user_by_id(user_id=user_id, db=db)
+    contact_ids = list(dict.fromkeys(contact_ids))
+    result = schemas.BulkResult()
+    result.invalid = [contact_id for contact_id in contact_ids if contact_id == user_id]
+    contact_ids = [contact_id for contact_id in contact_ids if contact_id != user_id]
+
+    # existence and current membership of every requested contact in one query
+    rows = db.execute(
+        select(models.User.id, models.users_contacts.c.contact_id.isnot(None))
+        .outerjoin(models.users_contacts, and_(models.users_contacts.c.contact_id == models.User.id,
+                                               models.users_contacts.c.user_id == user_id))
+        .where(models.User.id.in_(contact_ids))
+    ).all()
+    found = {contact_id: is_contact for contact_id, is_contact in rows}
+    result.not_found = [contact_id for contact_id in contact_ids if contact_id not in found]
+    result.already_present = [contact_id for contact_id in contact_ids if found.get(contact_id)]
+
+    candidates = [contact_id for contact_id in contact_ids if found.get(contact_id) is False]
+    if candidates:
+        added = set(db.execute(
+            insert(models.users_contacts)
+            .values([{'user_id': user_id, 'contact_id': contact_id} for contact_id in candidates])
+            .on_conflict_do_nothing()
+            .returning(models.users_contacts.c.contact_id)
+        ).scalars())
+        result.added = [contact_id for contact_id in candidates if contact_id in added]
+        result.already_present += [contact_id for contact_id in candidates if contact_id not in added]
+
+    db.commit()
+    return result
 
 
 def remove_contact(db: Session, user_id: int, contact_id: int):
-    db_user = get_user_by_id(user_id=user_id, db=db)
-    db_contact = get_user_by_id(user_id=contact_id, db=db)
+    get_user_by_id(user_id=user_id, db=db)
+    get_user_by_id(user_id=contact_id, db=db)
+
+    removed = db.execute(
+        delete(models.users_contacts)
+        .where(models.users_contacts.c.user_id == user_id, models.users_contacts.c.contact_id == contact_id)
+        .returning(models.users_contacts.c.contact_id)
+    ).first()
 
-    if db_contact not in db_user.contacts:
+    if removed is None:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f'Contact is not in contact list.',
         )
 
-    db_user.contacts.remove(db_contact)
     db.commit()
-    return db_user.contacts
+    return db.execute(contacts_statement(user_id)).scalars().all()
 
 
-def get_all_calls(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Call).offset(skip).limit(limit).all()
+def all_calls_statement(skip: int = 0, limit: int = 100, cursor: str | None = None):
+    statement = select(models.Call).order_by(models.Call.date, models.Call.id)
+
+    # keyset pagination on (date, id) is served by ix_calls_date_id
+    if cursor is not None:
+        last_date, last_id = pagination.decode_call_cursor(cursor)
+        statement = statement.where(tuple_(models.Call.date, models.Call.id) > tuple_(last_date, last_id))
+    else:
+        statement = statement.offset(skip)
+
+    return statement.limit(limit).options(*CALL_RESPONSE_OPTIONS)
+
+
+def get_all_calls(db: Session, skip: int = 0, limit: int = 100, cursor: str | None = None):
+    statement = all_calls_statement(skip=skip, limit=limit, cursor=cursor)
+    return db.execute(statement).scalars().all()
 
 
 def get_call_by_id(db: Session, call_id: int):
@@ -230,6 +521,20 @@ def get_call_by_id(db: Session, call_id: int):
     return db_call
 
 
+def changed_schedule(db_call: models.Call, params: dict) -> set[str]:
+    """Schedule fields in params that differ from the stored call, naive dates are read as UTC."""
+    changed = set()
+    for key in CALL_SCHEDULE:
+        if key not in params:
+            continue
+        value, current = params[key], getattr(db_call, key)
+        if isinstance(value, datetime) and current is not None:
+            value, current = recurrence.aware(value), recurrence.aware(current)
+        if value != current:
+            changed.add(key)
+    return changed
+
+
 def update_call(db: Session, call_id: int, user_id: int, request: schemas.CallUpdate):
     call = db.query(models.Call).filter(models.Call.id == call_id)
 
@@ -247,11 +552,94 @@ def update_call(db: Session, call_id: int, user_id: int, request: schemas.CallUp
 
     params = {k: v for k, v in request.dict().items() if v}
 
+    db_call = call.first()
+    changed = changed_schedule(db_call, params)
+    if changed:
+        values = {key: params.get(key, getattr(db_call, key)) for key in CALL_SCHEDULE}
+        validator.validate_duration(values['duration'])
+        validator.validate_recurrence(date=values['date'], duration=values['duration'],
+                                      frequency=values['recurrence_frequency'],
+                                      interval=values['recurrence_interval'], until=values['recurrence_until'])
+
+        # exceptions are keyed by occurrence date, only those no longer on an
+        # occurrence of the new schedule are dropped; a change of duration or
+        # end date moves no occurrence
+        exceptions, dropped = [], []
+        for exception in db_call.exceptions:
+            if values['recurrence_frequency'] is not None and recurrence.is_occurrence(
+                    values['date'], values['recurrence_frequency'], values['recurrence_interval'],
+                    values['recurrence_until'], exception.occurrence):
+                exceptions.append(exception)
+            else:
+                dropped.append(exception.occurrence)
+        intervals = recurrence.planned_intervals(values['date'], values['duration'], values['recurrence_frequency'],
+                                                 values['recurrence_interval'], values['recurrence_until'],
+                                                 exceptions=exceptions)
+        check_call_conflicts(db=db, user_id=user_id, intervals=intervals, exclude_call_id=call_id)
+        if dropped:
+            db.execute(delete(models.CallException).where(models.CallException.call_id == call_id,
+                                                          models.CallException.occurrence.in_(dropped)))
+
     call.update(params)
+    if params:
+        db.execute(bump_user_versions(call_participants(call_id)))
     db.commit()
     return call.first()
 
 
+def update_occurrence(db: Session, call_id: int, user_id: int, request: schemas.OccurrenceUpdate):
+    db_call = get_call_by_id(call_id=call_id, db=db)
+
+    if db_call.owner_id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f'Only owner can update this call.',
+        )
+
+    if db_call.recurrence_frequency is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Call is not recurring.',
+        )
+
+    occurrence = recurrence.aware(request.occurrence)
+    if not recurrence.is_occurrence(db_call.date, db_call.recurrence_frequency, db_call.recurrence_interval,
+                                    db_call.recurrence_until, occurrence):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'No occurrence of this call starts at {occurrence.isoformat()}.',
+        )
+
+    if request.duration is not None and not request.cancelled:
+        validator.validate_duration(request.duration)
+        validator.validate_recurrence(date=db_call.date, duration=request.duration,
+                                      frequency=db_call.recurrence_frequency,
+                                      interval=db_call.recurrence_interval, until=db_call.recurrence_until)
+        intervals = [(occurrence, occurrence + timedelta(minutes=request.duration))]
+        check_call_conflicts(db=db, user_id=user_id, intervals=intervals, exclude_call_id=call_id)
+
+    exception = models.CallException.__table__
+    if request.cancelled or request.duration is not None:
+        values = {'cancelled': request.cancelled, 'duration': None if request.cancelled else request.duration}
+        db.execute(
+            insert(exception)
+            .values(call_id=call_id, occurrence=occurrence, **values)
+            .on_conflict_do_update(index_elements=[exception.c.call_id, exception.c.occurrence], set_=values)
+        )
+    else:
+        # an occurrence back to normal needs no row
+        db.execute(delete(exception).where(exception.c.call_id == call_id, exception.c.occurrence == occurrence))
+
+    # exceptions are part of the call representation, so its version moves too
+    db.execute(update(models.Call).where(models.Call.id == call_id).values(updated_at=func.now()))
+    db.commit()
+    return db.execute(
+        select(models.CallException)
+        .where(models.CallException.call_id == call_id)
+        .order_by(models.CallException.occurrence)
+    ).scalars().all()
+
+
 def remove_call(db: Session, call_id: int, user_id: int):
     call = db.query(models.Call).filter(models.Call.id == call_id)
 
@@ -267,25 +655,106 @@ def remove_call(db: Session, call_id: int, user_id: int):
             detail=f'Only owner can delete this call.',
         )
 
+    db.execute(bump_user_versions(call_participants(call_id)))
     call.delete(synchronize_session=False)
     db.commit()
 
 
+def search_calls(db: Session, user_id: int, query: str, limit: int = 10):
+    query = query.strip()
+    validator.validate_search_query(query)
+    limit = min(limit, settings.SEARCH_MAX_LIMIT)
+    _, prefix = search_patterns(query)
+
+    # only calls the user takes part in, ranked like search_users
+    candidates = search_candidates(models.Call.id, models.Call.title, query, limit,
+                                   models.calls_users.c.call_id == models.Call.id,
+                                   models.calls_users.c.user_id == user_id,
+                                   frequent=trigrams.frequent_trigrams.get(db, models.Call.title))
+    statement = select(models.Call) \
+        .join(candidates, candidates.c.id == models.Call.id) \
+        .order_by(models.Call.title.ilike(prefix, escape='\\').desc(),
+                  func.similarity(models.Call.title, query).desc(),
+                  models.Call.date.desc(),
+                  models.Call.id) \
+        .limit(limit) \
+        .options(*CALL_RESPONSE_OPTIONS)
+    return db.execute(statement).scalars().all()
+
+
 def get_users_of_call(db: Session, call_id: int):
-    db_call = get_call_by_id(call_id=call_id, db=db)
-    return db_call.users
+    get_call_by_id(call_id=call_id, db=db)
+    return db.execute(call_users_statement(call_id)).scalars().all()
 
 
-def download_profile_image(db: Session, user_id: int):
-    db_user = get_user_by_id(user_id=user_id, db=db)
-    file_path = Path(db_user.profile_picture)
+def get_availability(db: Session, request: schemas.AvailabilityRequest):
+    start, end = validator.validate_time_window(start=request.start, end=request.end)
+    validator.validate_duration(request.duration)
 
-    if file_path.exists() and file_path.is_file():
-        return FileResponse(file_path)
-    return FileResponse(settings.DEFAULT_PROFILE_PICTURE)
+    user_ids = list(dict.fromkeys(request.user_ids))
+    found = set(db.execute(select(models.User.id).where(models.User.id.in_(user_ids))).scalars())
+    missing = [user_id for user_id in user_ids if user_id not in found]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f'Users {missing} not found.',
+        )
 
+    # calls in the window are range scanned by date and each probes the
+    # calls_users call_id index once; a join on the participants instead lets
+    # the planner hash every membership of their whole history
+    participant = select(models.calls_users.c.call_id) \
+        .where(models.calls_users.c.call_id == models.Call.id, models.calls_users.c.user_id.in_(user_ids)) \
+        .limit(1) \
+        .lateral()
+    window = calls_in_window_clause(start=start, end=end)
+
+    # busy intervals of every participant in one range query, aggregated into
+    # two arrays so no row, datetime or decimal is built per call
+    epochs, durations = db.execute(
+        select(func.array_agg(cast(func.extract('epoch', models.Call.date), Float)),
+               func.array_agg(models.Call.duration))
+        .join(participant, true())
+        .where(window, models.Call.recurrence_frequency.is_(None))
+    ).one()
+    epochs, durations = epochs or [], durations or []
+
+    # series are few, their occurrences in the window are appended to the same
+    # arrays; like conflict checks they are read as plain rows, not ORM objects
+    series = db.execute(
+        select(*SCHEDULE_COLUMNS)
+        .join(participant, true())
+        .where(window, models.Call.recurrence_frequency.isnot(None))
+    ).all()
+    exceptions = {}
+    exceptions_statement = series_exceptions_statement(series)
+    if exceptions_statement is not None:
+        for exception in db.execute(exceptions_statement):
+            exceptions.setdefault(exception.call_id, []).append(exception)
+    for call in series:
+        for date, duration in recurrence.occurrences(call.date, call.duration, call.recurrence_frequency,
+                                                     call.recurrence_interval, call.recurrence_until,
+                                                     exceptions=exceptions.get(call.id, ()), start=start, end=end):
+            epochs.append(availability.to_epoch(date))
+            durations.append(duration)
+
+    starts = np.array(epochs, dtype=np.float64)
+    ends = starts + np.array(durations, dtype=np.float64) * 60
+
+    slots = availability.free_slots(starts=starts, ends=ends,
+                                    window_start=availability.to_epoch(start),
+                                    window_end=availability.to_epoch(end),
+                                    duration=request.duration * 60, limit=request.limit)
+    return [schemas.TimeSlot(start=availability.from_epoch(start), end=availability.from_epoch(end))
+            for start, end in slots]
+
+
+def get_profile_image_path(db: Session, user_id: int, size: int | None = None):
+    db_user = get_user_by_id(user_id=user_id, db=db)
+    return images.resolve_profile_image(db_user.profile_picture, size)
 
-def upload_profile_image(db: Session, user_id: int, image: bytes):
+
+def upload_profile_image(db: Session, user_id: int, image: BinaryIO):
     user = db.query(models.User).filter(models.User.id == user_id)
 
     if not user.first():
@@ -294,9 +763,78 @@ def upload_profile_image(db: Session, user_id: int, image: bytes):
             detail=f'User not found.',
         )
 
-    file_path = Path(settings.IMAGES_FOLDER) / f'{user_id}{settings.IMAGE_EXTENSION}'
-    with open(file_path, 'wb') as f:
-        f.write(image)
+    file_path = images.store_profile_image(source=image)
 
     user.update({'profile_picture': str(file_path)})
+    db.execute(bump_user_versions([user_id]))
     db.commit()
+
+
+# Version rows identify the state of what a response embeds. The
+# association tables have no timestamps, so membership is tracked by a
+# digest of the ordered member ids.
+
+def ordered_ids_digest(column):
+    return func.md5(func.string_agg(cast(column, Text), aggregate_order_by(literal_column("','"), column)))
+
+
+# The user detail embeds every call of the user with its participants, too
+# much to aggregate on each request. Writes that change it bump users.version.
+
+def call_participants(call_id: int):
+    return select(models.calls_users.c.user_id).where(models.calls_users.c.call_id == call_id)
+
+
+def co_participants(user_id: int):
+    own_calls = models.calls_users.alias()
+    members = models.calls_users.alias()
+    return select(members.c.user_id) \
+        .join(own_calls, own_calls.c.call_id == members.c.call_id) \
+        .where(own_calls.c.user_id == user_id)
+
+
+def bump_user_versions(user_ids):
+    """Statement moving the version of the given users, a list of ids or a select of them."""
+    # updated_at is kept, it tracks changes of the user row itself
+    return update(models.User) \
+        .where(models.User.id.in_(user_ids)) \
+        .values(version=models.User.version + 1, updated_at=models.User.updated_at) \
+        .execution_options(synchronize_session=False)
+
+
+def get_user_version(db: Session, user_id: int | None = None, email: str | None = None):
+    # a primary key (or unique email) lookup, whatever the size of the call history
+    statement = select(models.User.id, models.User.version)
+
+    if email is not None:
+        statement = statement.where(models.User.email == email)
+    else:
+        statement = statement.where(models.User.id == user_id)
+
+    return db.execute(statement).first()
+
+
+def get_call_version(db: Session, call_id: int):
+    statement = select(
+        models.Call.id,
+        func.max(func.coalesce(models.Call.updated_at, models.Call.created_at)),
+        func.max(func.coalesce(models.User.updated_at, models.User.created_at)),
+        ordered_ids_digest(models.calls_users.c.user_id),
+    ).select_from(models.Call) \
+        .outerjoin(models.calls_users, models.calls_users.c.call_id == models.Call.id) \
+        .outerjoin(models.User, models.User.id == models.calls_users.c.user_id) \
+        .where(models.Call.id == call_id) \
+        .group_by(models.Call.id)
+
+    return db.execute(statement).first()
+
+
+def get_contacts_version(db: Session, user_id: int):
+    statement = select(
+        func.max(func.coalesce(models.User.updated_at, models.User.created_at)),
+        ordered_ids_digest(models.User.id),
+    ).select_from(models.users_contacts) \
+        .join(models.User, models.User.id == models.users_contacts.c.contact_id) \
+        .where(models.users_contacts.c.user_id == user_id)
+
+    return db.execute(statement).first()
@@ -0,0 +1,105 @@
+import zlib
+from typing import AsyncIterator, Generator
+
+import anyio
+import orjson
+from sqlalchemy import func, select
+from starlette.concurrency import iterate_in_threadpool
+
+from api import models
+from core.config import settings
+from core.database import SessionLocal
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+def users_statement():
+    # plain columns, credentials and relationships are never part of an export
+    return select(
+        models.User.id,
+        models.User.email,
+        models.User.profile_picture,
+        models.User.created_at,
+        models.User.updated_at,
+    ).order_by(models.User.id)
+
+
+def calls_statement():
+    # participants as an id array from the calls_users index, not a relationship load
+    user_ids = select(models.calls_users.c.user_id) \
+        .where(models.calls_users.c.call_id == models.Call.id) \
+        .order_by(models.calls_users.c.user_id) \
+        .scalar_subquery()
+    return select(
+        models.Call.id,
+        models.Call.title,
+        models.Call.owner_id,
+        models.Call.date,
+        models.Call.duration,
+        models.Call.recurrence_frequency,
+        models.Call.recurrence_interval,
+        models.Call.recurrence_until,
+        models.Call.created_at,
+        models.Call.updated_at,
+        func.array(user_ids).label('user_ids'),
+    ).order_by(models.Call.id)
+
+
+def ndjson_batches(statement) -> Generator[bytes, None, None]:
+    """Rows of statement as newline-delimited JSON, one chunk per batch.
+
+    A server-side cursor fetches EXPORT_BATCH_SIZE rows at a time, so memory
+    stays constant however many rows are exported. The session lives as
+    long as the stream, closing the generator early releases it.
+    """
+    db = SessionLocal()
+    result = None
+    try:
+        result = db.execute(statement.execution_options(stream_results=True,
+                                                        yield_per=settings.EXPORT_BATCH_SIZE))
+        keys = tuple(result.keys())
+        for rows in result.partitions():
+            yield b''.join(orjson.dumps(dict(zip(keys, row))) + b'\n' for row in rows)
+    finally:
+        if result is not None:
+            result.close()
+        db.close()
+
+
+def gzipped(chunks: Generator[bytes, None, None]) -> Generator[bytes, None, None]:
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    try:
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+    finally:
+        chunks.close()
+
+
+async def closing_stream(chunks: Generator[bytes, None, None]) -> AsyncIterator[bytes]:
+    """Chunks read in the threadpool, closed however the response ends.
+
+    A client disconnect cancels the response while a chunk may be read, the
+    generator is closed once that read is done instead of whenever it is
+    garbage collected, so its cursor and connection go back right away.
+    """
+    try:
+        async for chunk in iterate_in_threadpool(chunks):
+            yield chunk
+    finally:
+        with anyio.CancelScope(shield=True):
+            await anyio.to_thread.run_sync(chunks.close)
+
+
+def export_stream(statement, gzip: bool = False) -> AsyncIterator[bytes]:
+    chunks = ndjson_batches(statement)
+    return closing_stream(gzipped(chunks) if gzip else chunks)
+
+
+def export_headers(name: str, gzip: bool = False) -> dict:
+    headers = {'Content-Disposition': f'attachment; filename="{name}.ndjson"'}
+    if gzip:
+        headers['Content-Encoding'] = 'gzip'
+    return headers
@@ -1,10 +1,144 @@
+import asyncio
+import multiprocessing
 import random
 import string
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
+from core.config import settings
+from core.metrics import Histogram
+
 pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 
+# milliseconds from admission to result, including time spent queued
+HASH_LATENCY_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def _hash(password: str):
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str):
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class HashingPool:
+    """Size-capped process pool for bcrypt with admission control.
+
+    Async callers await the result without holding a thread. Sync callers
+    block a threadpool thread while they wait, so fewer of them are admitted
+    than the threadpool has threads.
+    """
+
+    def __init__(self, workers: int, queue_limit: int, blocking_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.blocking_limit = blocking_limit
+        self.latency_ms = Histogram(HASH_LATENCY_BUCKETS)
+        self.rejected = 0
+        self.restarts = 0
+        self._pending = 0
+        self._blocking = 0
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # created lazily so importing the module does not spawn processes
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def _reset_executor(self, broken: ProcessPoolExecutor):
+        # after a worker dies (OOM kill, segfault) the pool refuses all new work
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = None
+            self.restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _reject(self):
+        self.rejected += 1
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f'Server is busy, try again later.',
+            headers={'Retry-After': str(settings.HASH_RETRY_AFTER)},
+        )
+
+    def _admit(self, blocking: bool):
+        with self._lock:
+            if self._pending >= self.queue_limit or (blocking and self._blocking >= self.blocking_limit):
+                raise self._reject()
+            self._pending += 1
+            if blocking:
+                self._blocking += 1
+
+    def _release(self, blocking: bool, start: float):
+        self.latency_ms.observe((time.perf_counter() - start) * 1000)
+        with self._lock:
+            self._pending -= 1
+            if blocking:
+                self._blocking -= 1
+
+    def _on_done(self, executor: ProcessPoolExecutor, future: Future):
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._reset_executor(executor)
+
+    def _submit(self, func, *args) -> Future:
+        executor = self._get_executor()
+        try:
+            future = executor.submit(func, *args)
+        except BrokenProcessPool:
+            self._reset_executor(executor)
+            executor = self._get_executor()
+            future = executor.submit(func, *args)
+        # tasks that were running when a worker died fail, the next caller gets a fresh pool
+        future.add_done_callback(lambda done: self._on_done(executor, done))
+        return future
+
+    def run(self, func, *args):
+        self._admit(blocking=True)
+        start = time.perf_counter()
+        try:
+            return self._submit(func, *args).result()
+        except BrokenProcessPool:
+            raise self._reject()
+        finally:
+            self._release(blocking=True, start=start)
+
+    async def run_async(self, func, *args):
+        self._admit(blocking=False)
+        start = time.perf_counter()
+        try:
+            return await asyncio.wrap_future(self._submit(func, *args))
+        except BrokenProcessPool:
+            raise self._reject()
+        finally:
+            self._release(blocking=False, start=start)
+
+    def statistics(self):
+        return {
+            'workers': self.workers,
+            'queue_limit': self.queue_limit,
+            'blocking_limit': self.blocking_limit,
+            'queue_depth': self._pending,
+            'blocking': self._blocking,
+            'rejected': self.rejected,
+            'restarts': self.restarts,
+            'latency_ms': self.latency_ms.snapshot(),
+        }
+
+
+hashing_pool = HashingPool(workers=settings.HASH_POOL_SIZE, queue_limit=settings.HASH_QUEUE_LIMIT,
+                           blocking_limit=settings.HASH_BLOCKING_LIMIT)
+
 
 def generate_salt(length: int = 64):
     return ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(length))
@@ -13,10 +147,22 @@ def generate_salt(length: int = 64):
 def bcrypt(password: str, salt: str = ''):
     if salt:
         password += salt
-    return pwd_context.hash(password)
+    return hashing_pool.run(_hash, password)
 
 
 def verify(plain_password: str, hashed_password: str, salt: str = ''):
     if salt:
         plain_password += salt
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing_pool.run(_verify, plain_password, hashed_password)
+
+
+async def bcrypt_async(password: str, salt: str = ''):
+    if salt:
+        password += salt
+    return await hashing_pool.run_async(_hash, password)
+
+
+async def verify_async(plain_password: str, hashed_password: str, salt: str = ''):
+    if salt:
+        plain_password += salt
+    return await hashing_pool.run_async(_verify, plain_password, hashed_password)
@@ -0,0 +1,151 @@
+import functools
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import BinaryIO
+
+from fastapi import HTTPException, status
+from PIL import Image, UnidentifiedImageError
+
+from core.config import settings
+
+
+def image_too_large():
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f'Image too large. Maximum size is {settings.MAX_IMAGE_SIZE} bytes.',
+    )
+
+
+def invalid_image():
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f'Invalid image.',
+    )
+
+
+def store_folder() -> Path:
+    folder = Path(settings.IMAGE_STORE_FOLDER)
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder
+
+
+def original_path(digest: str) -> Path:
+    return store_folder() / f'{digest}{settings.IMAGE_EXTENSION}'
+
+
+def rendition_path(digest: str, size: int) -> Path:
+    return store_folder() / f'{digest}_{size}{settings.IMAGE_EXTENSION}'
+
+
+def store_profile_image(source: BinaryIO) -> Path:
+    """Copy the image into the content-addressed store and render its thumbnails.
+
+    The copy goes to a temp file in chunks and is atomically moved into
+    place, so a failed or oversized upload never leaves a partial file.
+    Identical images end up as one file.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=store_folder(), suffix='.part')
+    try:
+        size = 0
+        digest = hashlib.sha256()
+        with os.fdopen(fd, 'wb') as f:
+            while chunk := source.read(settings.IMAGE_CHUNK_SIZE):
+                size += len(chunk)
+                if size > settings.MAX_IMAGE_SIZE:
+                    raise image_too_large()
+                digest.update(chunk)
+                f.write(chunk)
+
+        validate_image(Path(temp_path))
+        file_path = original_path(digest.hexdigest())
+        stored = not file_path.exists()
+        if stored:
+            os.replace(temp_path, file_path)
+        else:
+            Path(temp_path).unlink()
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+    try:
+        for rendition in settings.IMAGE_RENDITIONS:
+            get_rendition(file_path, rendition)
+    except HTTPException:
+        # an original that can not be rendered is not kept in the store
+        if stored:
+            file_path.unlink(missing_ok=True)
+        raise
+    return file_path
+
+
+def resolve_profile_image(profile_picture: str, size: int | None = None) -> Path:
+    """Stored picture of a user, or the default one, in the rendition covering size."""
+    file_path = Path(profile_picture)
+    if not file_path.is_file():
+        file_path = Path(settings.DEFAULT_PROFILE_PICTURE)
+    if size is not None:
+        file_path = get_rendition(file_path, size)
+    return file_path
+
+
+def validate_image(file_path: Path):
+    try:
+        with Image.open(file_path) as image:
+            # a small file can still decode to a huge bitmap when it is rendered
+            if Image.MAX_IMAGE_PIXELS and image.width * image.height > Image.MAX_IMAGE_PIXELS:
+                raise invalid_image()
+            image.verify()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError):
+        raise invalid_image()
+
+
+@functools.lru_cache(maxsize=1024)
+def _hash_file(file_path: str, mtime_ns: int, size: int) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(settings.IMAGE_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_hash(file_path: Path) -> str:
+    # files in the store are named by their hash, anything else (default.jpg,
+    # pictures uploaded before the store existed) is hashed once per version
+    if file_path.parent.resolve() == store_folder().resolve():
+        return file_path.stem
+    stat = file_path.stat()
+    return _hash_file(str(file_path), stat.st_mtime_ns, stat.st_size)
+
+
+def select_rendition(size: int) -> int | None:
+    """Smallest configured rendition covering size, None if only the original does."""
+    for rendition in sorted(settings.IMAGE_RENDITIONS):
+        if rendition >= size:
+            return rendition
+    return None
+
+
+def get_rendition(file_path: Path, size: int) -> Path:
+    rendition = select_rendition(size)
+    if rendition is None:
+        return file_path
+
+    target = rendition_path(content_hash(file_path), rendition)
+    if not target.exists():
+        fd, temp_path = tempfile.mkstemp(dir=store_folder(), suffix='.part')
+        os.close(fd)
+        try:
+            try:
+                with Image.open(file_path) as image:
+                    image = image.convert('RGB')
+                    image.thumbnail((rendition, rendition))
+                    image.save(temp_path, format='JPEG', quality=85, optimize=True)
+            except Image.DecompressionBombError:
+                raise invalid_image()
+            os.replace(temp_path, target)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+    return target
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, DateTime, Table
+from sqlalchemy import Boolean, CheckConstraint, Column, ForeignKey, Integer, String, DateTime, Table, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -9,13 +9,17 @@ from core.database import Base
 calls_users = Table(
     'calls_users', Base.metadata,
     Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
-    Column('call_id', ForeignKey('calls.id', ondelete='CASCADE'), primary_key=True)
+    Column('call_id', ForeignKey('calls.id', ondelete='CASCADE'), primary_key=True),
+    # the primary key only serves lookups by user_id
+    Index('ix_calls_users_call_id', 'call_id'),
 )
 
 users_contacts = Table(
     'users_contacts', Base.metadata,
     Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
-    Column('contact_id', ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    Column('contact_id', ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+    # reverse side, who has this user as a contact
+    Index('ix_users_contacts_contact_id', 'contact_id'),
 )
 
 
@@ -28,16 +32,59 @@ class Call(Base):
     duration = Column(Integer)
     owner_id = Column(Integer, ForeignKey('users.id'))
 
+    # a recurring call is one row, its occurrences are expanded on read
+    recurrence_frequency = Column(String, nullable=True)  # 'daily' or 'weekly'
+    recurrence_interval = Column(Integer, nullable=True)
+    recurrence_until = Column(DateTime(timezone=True), nullable=True)
+
     owner = relationship('User', back_populates='owned_calls', cascade='all,delete')
     users = relationship('User', secondary=calls_users, back_populates='calls', cascade='all,delete')
+    exceptions = relationship('CallException', back_populates='call', cascade='all,delete-orphan',
+                              passive_deletes=True)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        # conflict and agenda range scans look back MAX_CALL_DURATION (1440 minutes)
+        CheckConstraint('duration > 0 AND duration <= 1440', name='ck_calls_duration'),
+        # serves the scheduling conflict range scan
+        Index('ix_calls_owner_id_date', 'owner_id', 'date'),
+        # serves keyset pagination of /calls/all
+        Index('ix_calls_date_id', 'date', 'id'),
+        # series are matched by start date alone, they are few compared to single calls
+        Index('ix_calls_recurring_date', 'date', postgresql_where=recurrence_frequency.isnot(None)),
+        # trigram index, serves substring search on titles; without a pending
+        # list of new entries, which every search would scan (migration 0008)
+        Index('ix_calls_title_trgm', 'title', postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'},
+              postgresql_with={'fastupdate': 'off'}),
+        # serves the bounded, ordered prefix candidates of a title search
+        Index('ix_calls_title_prefix', func.lower(title).collate('C')),
+    )
+
     def __repr__(self):
         return f'Call(id={self.id}, title={self.title}, owner_id={self.owner.id})'
 
 
+class CallException(Base):
+    __tablename__ = 'call_exceptions'
+
+    # only occurrences that differ from their series are stored
+    call_id = Column(Integer, ForeignKey('calls.id', ondelete='CASCADE'), primary_key=True)
+    occurrence = Column(DateTime(timezone=True), primary_key=True)
+    cancelled = Column(Boolean, nullable=False, default=False)
+    duration = Column(Integer, nullable=True)
+
+    call = relationship('Call', back_populates='exceptions')
+
+    __table_args__ = (
+        CheckConstraint('duration IS NULL OR (duration > 0 AND duration <= 1440)', name='ck_call_exceptions_duration'),
+    )
+
+    def __repr__(self):
+        return f'CallException(call_id={self.call_id}, occurrence={self.occurrence})'
+
+
 class User(Base):
     __tablename__ = 'users'
 
@@ -46,6 +93,8 @@ class User(Base):
     password_hash = Column(String)
     password_salt = Column(String)
     profile_picture = Column(String)
+    # moves whenever the user detail response would change, see crud.bump_user_versions
+    version = Column(Integer, nullable=False, server_default='1')
 
     owned_calls = relationship('Call', back_populates='owner', cascade='all,delete')
     calls = relationship('Call', secondary=calls_users, back_populates='users', cascade='all,delete')
@@ -56,5 +105,13 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        # trigram index, serves substring search on emails, fastupdate off like ix_calls_title_trgm
+        Index('ix_users_email_trgm', 'email', postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'},
+              postgresql_with={'fastupdate': 'off'}),
+        # serves the bounded, ordered prefix candidates of an email search
+        Index('ix_users_email_prefix', func.lower(email).collate('C')),
+    )
+
     def __repr__(self):
         return f'User({self.id=}, {self.email=})'
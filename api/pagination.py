@@ -0,0 +1,78 @@
+"""
+Keyset pagination cursors, opaque base64 strings of the last row's sort key.
+
+HTTP list endpoints keep returning a plain list, so their response model
+does not change, and send the cursor of the next page in the X-Next-Cursor
+header. WebSocket messages have no headers, so a request that carries a
+cursor key gets {"items": [...], "next_cursor": ...} instead. In both
+cases a missing or null next cursor means the last page was reached.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def invalid_cursor() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f'Invalid cursor.',
+    )
+
+
+def decode_cursor(cursor: str, length: int) -> list:
+    # websocket clients can send any json value as the cursor
+    if not isinstance(cursor, str):
+        raise invalid_cursor()
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        values = None
+
+    if not isinstance(values, list) or len(values) != length:
+        raise invalid_cursor()
+
+    return values
+
+
+def decode_id(value) -> int:
+    # bool is a subclass of int, but never a valid id
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise invalid_cursor()
+    return value
+
+
+def decode_user_cursor(cursor: str) -> int:
+    user_id, = decode_cursor(cursor, length=1)
+    return decode_id(user_id)
+
+
+def decode_call_cursor(cursor: str) -> tuple[datetime, int]:
+    date, call_id = decode_cursor(cursor, length=2)
+    if not isinstance(date, str):
+        raise invalid_cursor()
+    try:
+        return datetime.fromisoformat(date), decode_id(call_id)
+    except ValueError:
+        raise invalid_cursor()
+
+
+def next_user_cursor(users: list, limit: int) -> str | None:
+    if not users or len(users) < limit:
+        return None
+    return encode_cursor(users[-1].id)
+
+
+def next_call_cursor(calls: list, limit: int) -> str | None:
+    if not calls or len(calls) < limit:
+        return None
+    return encode_cursor(calls[-1].date.isoformat(), calls[-1].id)
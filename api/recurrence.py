@@ -0,0 +1,156 @@
+import bisect
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator
+
+from core.config import settings
+
+FREQUENCIES = {
+    'daily': timedelta(days=1),
+    'weekly': timedelta(weeks=1),
+}
+
+
+def aware(date: datetime) -> datetime:
+    # naive datetimes are stored as UTC
+    return date.replace(tzinfo=timezone.utc) if date.tzinfo is None else date
+
+
+def period(frequency: str, interval: int | None) -> timedelta:
+    return FREQUENCIES[frequency] * (interval or 1)
+
+
+def occurrence_dates(first: datetime, frequency: str, interval: int | None, until: datetime | None,
+                     start: datetime | None = None, end: datetime | None = None) -> Iterator[datetime]:
+    """Start dates of a series within [start, end).
+
+    The first date is computed directly from start, so the cost depends on
+    the size of the window and not on how long ago the series began.
+    """
+    step = period(frequency, interval)
+    index = 0
+    if start is not None and start > first:
+        index = -((first - start) // step)
+    date = first + step * index
+    while (end is None or date < end) and (until is None or date <= until):
+        yield date
+        index += 1
+        date = first + step * index
+
+
+def is_occurrence(first: datetime, frequency: str, interval: int | None, until: datetime | None,
+                  date: datetime) -> bool:
+    first, date = aware(first), aware(date)
+    if date < first or (until is not None and date > aware(until)):
+        return False
+    return (date - first) % period(frequency, interval) == timedelta(0)
+
+
+def occurrences(date: datetime, duration: int, frequency: str | None = None, interval: int | None = None,
+                until: datetime | None = None, exceptions: Iterable = (),
+                start: datetime | None = None, end: datetime | None = None) -> Iterator[tuple[datetime, int]]:
+    """(date, duration) of every occurrence overlapping [start, end).
+
+    A single call has one occurrence. Cancelled occurrences of a series are
+    skipped and resized ones use their own duration. An open ended series
+    is expanded up to RECURRENCE_HORIZON days past now, or past the start
+    of the window or of the series when that is later.
+    """
+    date = aware(date)
+    start = aware(start) if start is not None else None
+    end = aware(end) if end is not None else None
+
+    if frequency is None:
+        if (start is None or date + timedelta(minutes=duration) > start) and (end is None or date < end):
+            yield date, duration
+        return
+
+    until = aware(until) if until is not None else None
+    if end is None and until is None:
+        end = max(start or date, date, datetime.now(timezone.utc)) + timedelta(days=settings.RECURRENCE_HORIZON)
+
+    overrides = {aware(exception.occurrence): exception for exception in exceptions}
+    # an occurrence starting up to MAX_CALL_DURATION before the window may still be running
+    lookback = start - timedelta(minutes=settings.MAX_CALL_DURATION) if start is not None else None
+    for occurrence in occurrence_dates(date, frequency, interval, until, start=lookback, end=end):
+        occurrence_duration = duration
+        exception = overrides.get(occurrence)
+        if exception is not None:
+            if exception.cancelled:
+                continue
+            occurrence_duration = exception.duration or duration
+        if start is None or occurrence + timedelta(minutes=occurrence_duration) > start:
+            yield occurrence, occurrence_duration
+
+
+class Occurrence:
+    """One occurrence of a recurring call, reads like the call with its own date and duration."""
+
+    def __init__(self, call, date: datetime, duration: int):
+        self.call = call
+        self.date = date
+        self.duration = duration
+
+    def __getattr__(self, name):
+        return getattr(self.call, name)
+
+
+def expand(call, start: datetime | None = None, end: datetime | None = None,
+           exceptions: Iterable | None = None) -> Iterator:
+    """Occurrences of a call within [start, end), exceptions default to the loaded call.exceptions."""
+    if call.recurrence_frequency is None:
+        yield call
+        return
+    for date, duration in occurrences(call.date, call.duration, call.recurrence_frequency,
+                                      call.recurrence_interval, call.recurrence_until,
+                                      exceptions=call.exceptions if exceptions is None else exceptions,
+                                      start=start, end=end):
+        yield Occurrence(call, date, duration)
+
+
+def planned_intervals(date: datetime, duration: int, frequency: str | None = None, interval: int | None = None,
+                      until: datetime | None = None, exceptions: Iterable = ()) -> list[tuple[datetime, datetime]]:
+    """Sorted [start, end) intervals a call will occupy, used for conflict checks.
+
+    Past occurrences of a series are not checked, future ones up to
+    RECURRENCE_HORIZON days ahead are.
+    """
+    start = max(aware(date), datetime.now(timezone.utc)) if frequency is not None else None
+    return [(occurrence, occurrence + timedelta(minutes=occurrence_duration))
+            for occurrence, occurrence_duration in occurrences(date, duration, frequency, interval, until,
+                                                               exceptions=exceptions, start=start)]
+
+
+def call_intervals(call) -> list[tuple[datetime, datetime]]:
+    return planned_intervals(call.date, call.duration, call.recurrence_frequency, call.recurrence_interval,
+                             call.recurrence_until, exceptions=call.exceptions)
+
+
+def conflicting_ids(calls: Iterable, intervals: list[tuple[datetime, datetime]],
+                    exceptions: Iterable | None = None) -> list[int]:
+    """Ids of the calls with an occurrence overlapping any of the sorted, disjoint intervals.
+
+    Calls can be plain rows, their exceptions are then passed separately as
+    rows carrying a call_id.
+    """
+    if not intervals:
+        return []
+    by_call = None
+    if exceptions is not None:
+        by_call = {}
+        for exception in exceptions:
+            by_call.setdefault(exception.call_id, []).append(exception)
+    starts = [start for start, _ in intervals]
+    window_start, window_end = intervals[0][0], intervals[-1][1]
+
+    ids = []
+    for call in calls:
+        call_exceptions = by_call.get(call.id, ()) if by_call is not None else None
+        for occurrence in expand(call, start=window_start, end=window_end, exceptions=call_exceptions):
+            occurrence_start = aware(occurrence.date)
+            occurrence_end = occurrence_start + timedelta(minutes=occurrence.duration)
+            # only the last interval starting before this occurrence ends can overlap it
+            index = bisect.bisect_left(starts, occurrence_end) - 1
+            if index >= 0 and intervals[index][1] > occurrence_start:
+                ids.append(call.id)
+                break
+    return ids
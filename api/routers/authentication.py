@@ -1,10 +1,10 @@
 from fastapi import Depends, APIRouter, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from api import crud, schemas
+from api import async_crud, schemas
 from core import validator
-from core.database import get_db
+from core.database import get_async_db
 
 router = APIRouter(
     tags=['Authentication'],
@@ -12,13 +12,13 @@ router = APIRouter(
 
 
 @router.post('/register', response_model=schemas.User, status_code=status.HTTP_201_CREATED)
-def register(request: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(request: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     validator.validate_email_format(email=request.email)
     validator.validate_password_length(password=request.password)
-    validator.validate_unique_email(email=request.email, db=db)
-    return crud.create_user(request=request, db=db)
+    await async_crud.validate_unique_email(email=request.email, db=db)
+    return await async_crud.create_user(request=request, db=db)
 
 
 @router.post('/login', response_model=schemas.Token, status_code=status.HTTP_202_ACCEPTED)
-def login(request: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    return crud.login(request=request, db=db)
+async def login(request: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.login(request=request, db=db)
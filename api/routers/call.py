@@ -1,7 +1,9 @@
-from fastapi import Depends, APIRouter, status
+from fastapi import Depends, APIRouter, Query, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from api import crud, schemas, OAuth2
+from api import caching, crud, export, schemas, pagination, serializer, OAuth2
+from core.config import settings
 from core.database import get_db
 
 router = APIRouter(
@@ -13,16 +15,55 @@ router = APIRouter(
 @router.get('/all', response_model=list[schemas.Call], status_code=status.HTTP_200_OK)
 def get_all_calls(skip: int = 0,
                   limit: int = 100,
+                  cursor: str | None = None,
                   db: Session = Depends(get_db),
                   current_user=Depends(OAuth2.get_current_user)):
-    return crud.get_all_calls(skip=skip, limit=limit, db=db)
+    calls = crud.get_all_calls(skip=skip, limit=limit, cursor=cursor, db=db)
+    headers = {}
+    next_cursor = pagination.next_call_cursor(calls, limit)
+    if next_cursor:
+        headers['X-Next-Cursor'] = next_cursor
+    return serializer.json_response(serializer.serialize_calls(calls), headers=headers)
+
+
+@router.get('/search', response_model=list[schemas.Call], status_code=status.HTTP_200_OK)
+def search_calls(q: str,
+                 limit: int = Query(10, gt=0, le=settings.SEARCH_MAX_LIMIT),
+                 db: Session = Depends(get_db),
+                 current_user=Depends(OAuth2.get_current_user)):
+    user_id: int = current_user.user_id
+    calls = crud.search_calls(user_id=user_id, query=q, limit=limit, db=db)
+    return serializer.json_response(serializer.serialize_calls(calls))
+
+
+@router.get('/export', status_code=status.HTTP_200_OK)
+def export_calls(gzip: bool = False,
+                 current_user=Depends(OAuth2.get_current_user)):
+    return StreamingResponse(export.export_stream(export.calls_statement(), gzip=gzip),
+                             media_type=export.NDJSON_MEDIA_TYPE, headers=export.export_headers('calls', gzip))
+
+
+@router.post('/availability', response_model=list[schemas.TimeSlot], status_code=status.HTTP_200_OK)
+def get_availability(request: schemas.AvailabilityRequest,
+                     db: Session = Depends(get_db),
+                     current_user=Depends(OAuth2.get_current_user)):
+    return crud.get_availability(request=request, db=db)
 
 
 @router.get('/{call_id}', response_model=schemas.Call, status_code=status.HTTP_200_OK)
 def get_call_by_id(call_id: int,
+                   request: Request,
                    db: Session = Depends(get_db),
                    current_user=Depends(OAuth2.get_current_user)):
-    return crud.get_call_by_id(call_id=call_id, db=db)
+    headers = {}
+    version = crud.get_call_version(call_id=call_id, db=db)
+    if version is not None:
+        headers = caching.cache_headers(caching.make_etag('call', *version))
+        if caching.is_not_modified(request, headers['ETag']):
+            return caching.not_modified(headers)
+
+    db_call = crud.get_call_by_id(call_id=call_id, db=db)
+    return serializer.json_response(serializer.serialize_call(db_call), headers=headers)
 
 
 @router.put('/{call_id}', response_model=schemas.Call, status_code=status.HTTP_200_OK)
@@ -42,11 +83,29 @@ def delete_call(call_id: int,
     return crud.remove_call(call_id=call_id, user_id=user_id, db=db)
 
 
+@router.put('/{call_id}/occurrences', response_model=list[schemas.CallException], status_code=status.HTTP_200_OK)
+def update_occurrence(call_id: int,
+                      request: schemas.OccurrenceUpdate,
+                      db: Session = Depends(get_db),
+                      current_user=Depends(OAuth2.get_current_user)):
+    user_id: int = current_user.user_id
+    return crud.update_occurrence(call_id=call_id, user_id=user_id, request=request, db=db)
+
+
 @router.get('/{call_id}/users', response_model=list[schemas.UserBase], status_code=status.HTTP_200_OK)
 def get_users_of_call(call_id: int,
                       db: Session = Depends(get_db),
                       current_user=Depends(OAuth2.get_current_user)):
-    return crud.get_users_of_call(call_id=call_id, db=db)
+    users = crud.get_users_of_call(call_id=call_id, db=db)
+    return serializer.json_response(serializer.serialize_users(users))
+
+
+@router.post('/{call_id}/users', response_model=schemas.BulkResult, status_code=status.HTTP_200_OK)
+def add_users_to_call(call_id: int,
+                      request: schemas.UserIDs,
+                      db: Session = Depends(get_db),
+                      current_user=Depends(OAuth2.get_current_user)):
+    return crud.add_users_to_call(call_id=call_id, user_ids=request.user_ids, db=db)
 
 
 @router.post('/{call_id}/users/{user_id}', response_model=list[schemas.UserBase], status_code=status.HTTP_200_OK)
@@ -1,7 +1,7 @@
-from fastapi import Depends, APIRouter, status
+from fastapi import Depends, APIRouter, Request, status
 from sqlalchemy.orm import Session
 
-from api import crud, schemas, OAuth2
+from api import caching, crud, schemas, serializer, OAuth2
 from core.database import get_db
 
 router = APIRouter(
@@ -11,10 +11,26 @@ router = APIRouter(
 
 
 @router.get('', response_model=list[schemas.UserBase], status_code=status.HTTP_200_OK)
-def get_user_contacts(db: Session = Depends(get_db),
+def get_user_contacts(request: Request,
+                      db: Session = Depends(get_db),
                       current_user: schemas.TokenData = Depends(OAuth2.get_current_user)):
     user_id: int = current_user.user_id
-    return crud.get_contacts(user_id=user_id, db=db)
+
+    version = crud.get_contacts_version(user_id=user_id, db=db)
+    headers = caching.cache_headers(caching.make_etag('contacts', user_id, *version))
+    if caching.is_not_modified(request, headers['ETag']):
+        return caching.not_modified(headers)
+
+    contacts = crud.get_contacts(user_id=user_id, db=db)
+    return serializer.json_response(serializer.serialize_users(contacts), headers=headers)
+
+
+@router.post('', response_model=schemas.BulkResult, status_code=status.HTTP_200_OK)
+def add_user_contacts(request: schemas.UserIDs,
+                      db: Session = Depends(get_db),
+                      current_user: schemas.TokenData = Depends(OAuth2.get_current_user)):
+    user_id: int = current_user.user_id
+    return crud.add_contacts(user_id=user_id, contact_ids=request.user_ids, db=db)
 
 
 @router.post('/{contact_id}', response_model=list[schemas.UserBase], status_code=status.HTTP_200_OK)
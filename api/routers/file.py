@@ -1,8 +1,11 @@
-from fastapi import APIRouter, File, Depends, status
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, File, Depends, Query, Request, UploadFile, status
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 
-from api import crud, OAuth2, schemas
+from api import caching, crud, images, OAuth2, schemas
+from core.config import settings
 from core.database import get_db
 
 router = APIRouter(
@@ -12,15 +15,27 @@ router = APIRouter(
 
 
 @router.get('/download', response_class=FileResponse, status_code=status.HTTP_200_OK)
-def download_profile_image(db: Session = Depends(get_db),
+def download_profile_image(request: Request,
+                           size: int | None = Query(None, gt=0),
+                           db: Session = Depends(get_db),
                            current_user: schemas.TokenData = Depends(OAuth2.get_current_user)):
     user_id: int = current_user.user_id
-    return crud.download_profile_image(user_id=user_id, db=db)
+    file_path = crud.get_profile_image_path(user_id=user_id, size=size, db=db)
+
+    # the content hash changes exactly when the served bytes change
+    etag = f'"{images.content_hash(file_path)}"'
+    last_modified = datetime.fromtimestamp(file_path.stat().st_mtime, tz=timezone.utc)
+    headers = caching.cache_headers(etag, f'private, max-age={settings.IMAGE_CACHE_MAX_AGE}', last_modified)
+    if caching.is_not_modified(request, etag, last_modified):
+        return caching.not_modified(headers)
+    return FileResponse(file_path, headers=headers)
 
 
 @router.put('/upload')
-def upload_profile_image(image: bytes = File(...),
+def upload_profile_image(image: UploadFile = File(...),
                          db: Session = Depends(get_db),
                          current_user: schemas.TokenData = Depends(OAuth2.get_current_user)):
+    # BodySizeLimitMiddleware caps the body while it is received,
+    # the chunked copy to disk enforces the exact limit on the image
     user_id: int = current_user.user_id
-    return crud.upload_profile_image(user_id=user_id, image=image, db=db)
+    return crud.upload_profile_image(user_id=user_id, image=image.file, db=db)
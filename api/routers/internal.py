@@ -0,0 +1,36 @@
+from fastapi import Depends, APIRouter, status
+
+from api import OAuth2, schemas, hashing, JWT
+from api.websocket.connection import manager
+from core.database import get_pool_statistics
+from core.limiter import concurrency_limiter
+
+router = APIRouter(
+    tags=['Internal'],
+    prefix='/internal',
+)
+
+
+@router.get('/pool', status_code=status.HTTP_200_OK)
+def get_pool_stats(current_user: schemas.TokenData = Depends(OAuth2.get_current_user)):
+    return get_pool_statistics()
+
+
+@router.get('/hashing', status_code=status.HTTP_200_OK)
+def get_hashing_stats(current_user: schemas.TokenData = Depends(OAuth2.get_current_user)):
+    return hashing.hashing_pool.statistics()
+
+
+@router.get('/token-cache', status_code=status.HTTP_200_OK)
+def get_token_cache_stats(current_user: schemas.TokenData = Depends(OAuth2.get_current_user)):
+    return JWT.token_cache.statistics()
+
+
+@router.get('/websocket', status_code=status.HTTP_200_OK)
+def get_websocket_stats(current_user: schemas.TokenData = Depends(OAuth2.get_current_user)):
+    return manager.statistics()
+
+
+@router.get('/concurrency', status_code=status.HTTP_200_OK)
+def get_concurrency_stats(current_user: schemas.TokenData = Depends(OAuth2.get_current_user)):
+    return concurrency_limiter.statistics()
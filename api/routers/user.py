@@ -1,7 +1,11 @@
-from fastapi import Depends, APIRouter, status
+from datetime import datetime
+
+from fastapi import Depends, APIRouter, Query, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from api import crud, schemas, OAuth2
+from api import caching, crud, export, schemas, pagination, serializer, OAuth2
+from core.config import settings
 from core.database import get_db
 
 router = APIRouter(
@@ -13,19 +17,54 @@ router = APIRouter(
 @router.get('/all', response_model=list[schemas.User], status_code=status.HTTP_200_OK)
 def get_all_users(skip: int = 0,
                   limit: int = 100,
+                  cursor: str | None = None,
                   db: Session = Depends(get_db),
                   current_user: schemas.TokenData = Depends(OAuth2.get_current_user)):
-    return crud.get_all_users(db=db, skip=skip, limit=limit)
+    users = crud.get_all_users(db=db, skip=skip, limit=limit, cursor=cursor)
+    headers = {}
+    next_cursor = pagination.next_user_cursor(users, limit)
+    if next_cursor:
+        headers['X-Next-Cursor'] = next_cursor
+    return serializer.json_response(serializer.serialize_user_details(users), headers=headers)
+
+
+@router.get('/search', response_model=list[schemas.UserBase], status_code=status.HTTP_200_OK)
+def search_users(q: str,
+                 limit: int = Query(10, gt=0, le=settings.SEARCH_MAX_LIMIT),
+                 db: Session = Depends(get_db),
+                 current_user: schemas.TokenData = Depends(OAuth2.get_current_user)):
+    users = crud.search_users(query=q, limit=limit, db=db)
+    return serializer.json_response(serializer.serialize_users(users))
+
+
+@router.get('/export', status_code=status.HTTP_200_OK)
+def export_users(gzip: bool = False,
+                 current_user: schemas.TokenData = Depends(OAuth2.get_current_user)):
+    return StreamingResponse(export.export_stream(export.users_statement(), gzip=gzip),
+                             media_type=export.NDJSON_MEDIA_TYPE, headers=export.export_headers('users', gzip))
 
 
 @router.get('', response_model=schemas.User, status_code=status.HTTP_200_OK)
-def get_user(email: str | None = None,
+def get_user(request: Request,
+             email: str | None = None,
              db: Session = Depends(get_db),
              current_user: schemas.TokenData = Depends(OAuth2.get_current_user)):
     if email is not None:
-        return crud.get_user_by_email(email=email, db=db)
-    user_id: int = current_user.user_id
-    return crud.get_user_by_id(user_id=user_id, db=db)
+        version = crud.get_user_version(email=email, db=db)
+    else:
+        version = crud.get_user_version(user_id=current_user.user_id, db=db)
+
+    headers = {}
+    if version is not None:
+        headers = caching.cache_headers(caching.make_etag('user', *version))
+        if caching.is_not_modified(request, headers['ETag']):
+            return caching.not_modified(headers)
+
+    if email is not None:
+        db_user = crud.get_user_by_email(email=email, db=db, options=crud.USER_RESPONSE_OPTIONS)
+    else:
+        db_user = crud.get_user_by_id(user_id=current_user.user_id, db=db, options=crud.USER_RESPONSE_OPTIONS)
+    return serializer.json_response(serializer.serialize_user_detail(db_user), headers=headers)
 
 
 @router.put('', response_model=schemas.User, status_code=status.HTTP_200_OK)
@@ -44,10 +83,14 @@ def delete_user(db: Session = Depends(get_db),
 
 
 @router.get('/calls', response_model=list[schemas.Call], status_code=status.HTTP_200_OK)
-def get_calls_of_user(db: Session = Depends(get_db),
+def get_calls_of_user(start: datetime | None = Query(None, alias='from'),
+                      end: datetime | None = Query(None, alias='to'),
+                      limit: int = Query(settings.AGENDA_DEFAULT_LIMIT, gt=0, le=settings.AGENDA_MAX_LIMIT),
+                      db: Session = Depends(get_db),
                       current_user: schemas.TokenData = Depends(OAuth2.get_current_user)):
     user_id: int = current_user.user_id
-    return crud.get_calls_of_user(user_id=user_id, db=db)
+    calls = crud.get_calls_of_user(user_id=user_id, start=start, end=end, limit=limit, db=db)
+    return serializer.json_response(serializer.serialize_calls(calls))
 
 
 @router.post('/calls', response_model=schemas.Call, status_code=status.HTTP_201_CREATED)
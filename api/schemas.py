@@ -1,6 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, conint, conlist, constr
 from datetime import datetime
 
+from core.config import settings
+
 
 class UserID(BaseModel):
     id: int
@@ -29,6 +31,9 @@ class Call(BaseModel):
     owner_id: int
     date: datetime
     duration: int
+    recurrence_frequency: str | None = None
+    recurrence_interval: int | None = None
+    recurrence_until: datetime | None = None
     users: list[UserBase] = []
 
     class Config:
@@ -52,6 +57,9 @@ class CallCreate(BaseModel):
     title: str
     date: datetime
     duration: int
+    recurrence_frequency: str | None = None
+    recurrence_interval: int | None = None
+    recurrence_until: datetime | None = None
 
 
 class UserCreate(BaseModel):
@@ -63,6 +71,24 @@ class CallUpdate(BaseModel):
     title: str | None = None
     date: datetime | None = None
     duration: int | None = None
+    recurrence_frequency: str | None = None
+    recurrence_interval: int | None = None
+    recurrence_until: datetime | None = None
+
+
+class CallException(BaseModel):
+    occurrence: datetime
+    cancelled: bool
+    duration: int | None = None
+
+    class Config:
+        orm_mode = True
+
+
+class OccurrenceUpdate(BaseModel):
+    occurrence: datetime
+    cancelled: bool = False
+    duration: int | None = None
 
 
 class UserUpdate(BaseModel):
@@ -70,6 +96,55 @@ class UserUpdate(BaseModel):
     password: str | None = None
 
 
+class Page(BaseModel):
+    skip: conint(ge=0) = 0
+    limit: conint(gt=0, le=1000) = 10
+    # keyset pagination when present, a null cursor requests the first page
+    cursor: str | None = None
+
+
+class SearchQuery(BaseModel):
+    q: constr(strip_whitespace=True, min_length=settings.SEARCH_MIN_LENGTH, max_length=settings.SEARCH_MAX_LENGTH)
+    limit: conint(gt=0, le=settings.SEARCH_MAX_LIMIT) = 10
+
+
+class FileDownload(BaseModel):
+    size: conint(gt=0) | None = None
+    mode: str | None = None
+    offset: conint(ge=0) = 0
+
+
+class TimeWindow(BaseModel):
+    start: datetime | None = Field(None, alias='from')
+    end: datetime | None = Field(None, alias='to')
+    limit: conint(gt=0, le=settings.AGENDA_MAX_LIMIT) = settings.AGENDA_DEFAULT_LIMIT
+
+
+class UserIDs(BaseModel):
+    user_ids: conlist(int, min_items=1, max_items=500)
+
+
+class AvailabilityRequest(BaseModel):
+    user_ids: conlist(int, min_items=1, max_items=500)
+    start: datetime = Field(..., alias='from')
+    end: datetime = Field(..., alias='to')
+    duration: int
+    limit: conint(gt=0) = 20
+
+
+class TimeSlot(BaseModel):
+    start: datetime
+    end: datetime
+
+
+class BulkResult(BaseModel):
+    added: list[int] = []
+    already_present: list[int] = []
+    not_found: list[int] = []
+    conflicting: list[int] = []
+    invalid: list[int] = []
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
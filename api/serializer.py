@@ -0,0 +1,71 @@
+import operator
+
+import orjson
+from fastapi import status
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_LIST
+
+from api import schemas
+
+
+def compile_serializer(model: type[BaseModel]):
+    """
+    Build a function turning an ORM object into a dict shaped like model.
+
+    Field access is resolved once here instead of validating every row
+    through pydantic on output. Values stay native (datetimes included),
+    orjson encodes them.
+    """
+    fields = []
+    for name, field in model.__fields__.items():
+        get = operator.attrgetter(name)
+        if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+            nested = compile_serializer(field.type_)
+            if field.shape == SHAPE_LIST:
+                fields.append((name, lambda obj, get=get, nested=nested: [nested(item) for item in get(obj)]))
+            else:
+                fields.append((name, lambda obj, get=get, nested=nested: _optional(nested, get(obj))))
+        else:
+            fields.append((name, get))
+
+    def serialize(obj):
+        return {name: get(obj) for name, get in fields}
+
+    serialize.__name__ = f'serialize_{model.__name__}'
+    return serialize
+
+
+def _optional(serialize, value):
+    return None if value is None else serialize(value)
+
+
+serialize_user = compile_serializer(schemas.UserBase)
+serialize_user_detail = compile_serializer(schemas.User)
+serialize_call = compile_serializer(schemas.Call)
+serialize_call_exception = compile_serializer(schemas.CallException)
+
+
+def serialize_users(users):
+    return [serialize_user(user) for user in users]
+
+
+def serialize_user_details(users):
+    return [serialize_user_detail(user) for user in users]
+
+
+def serialize_calls(calls):
+    return [serialize_call(call) for call in calls]
+
+
+def serialize_call_exceptions(exceptions):
+    return [serialize_call_exception(exception) for exception in exceptions]
+
+
+def dumps(data) -> bytes:
+    return orjson.dumps(data)
+
+
+def json_response(content, status_code: int = status.HTTP_200_OK, headers: dict | None = None):
+    # returning a response directly skips FastAPI's response_model validation
+    return ORJSONResponse(content, status_code=status_code, headers=headers)
@@ -0,0 +1,114 @@
+import re
+import threading
+import time
+
+from sqlalchemy import cast, column, func, select, table, tablesample
+from sqlalchemy.dialects.postgresql import REGCLASS
+from sqlalchemy.orm import Session
+
+from core.config import settings
+
+# pg_trgm splits text into words of letters and digits
+WORD = re.compile(r'[^\W_]+')
+
+
+def like_trigrams(query: str) -> list[tuple[int, int, str]]:
+    """(start, end, trigram) of what pg_trgm extracts from LIKE '%query%'.
+
+    A word is padded where a non-word character borders it, the padding
+    stands for that character, so its span covers it.
+    """
+    lowered = query.lower()
+    trigrams = []
+    for word in WORD.finditer(lowered):
+        start, end = word.span()
+        left = '  ' if start > 0 else ''
+        right = ' ' if end < len(lowered) else ''
+        padded = left + word.group() + right
+        for index in range(len(padded) - 2):
+            offset = start - len(left) + index
+            trigrams.append((max(offset, start - 1), min(offset + 3, end + 1), padded[index:index + 3]))
+    return trigrams
+
+
+def narrow_query(query: str, frequent: frozenset[str]) -> str:
+    """The longest part of the query without frequent trigrams.
+
+    Every row matching the query contains it. The trigram index reads
+    the rows of each trigram of a pattern, so leaving out the ones most
+    rows share keeps the index scan short, the whole pattern is then
+    checked on the few rows it finds.
+    """
+    trigrams = like_trigrams(query)
+    best, run = [], []
+    for trigram in trigrams:
+        if trigram[2] in frequent:
+            run = []
+            continue
+        run.append(trigram)
+        if len(run) > len(best):
+            best = list(run)
+    if not best or len(best) == len(trigrams):
+        return query
+    return query[best[0][0]:best[-1][1]]
+
+
+class FrequentTrigrams:
+    """Trigrams found in more than SEARCH_FREQUENT_TRIGRAM_SHARE of the rows of a column.
+
+    They are counted on a sample of the table and recounted every
+    SEARCH_TRIGRAM_REFRESH seconds.
+    """
+
+    def __init__(self, sample_rows: int, share: float, refresh: float, clock=time.monotonic):
+        self.sample_rows = sample_rows
+        self.share = share
+        self.refresh = refresh
+        self.clock = clock
+        self.samples = 0
+        self._entries: dict[str, tuple[frozenset[str], float]] = {}
+        self._lock = threading.Lock()
+
+    def statement(self, text_column):
+        pg_class = table('pg_class', column('oid'), column('reltuples'))
+        rows = select(pg_class.c.reltuples) \
+            .where(pg_class.c.oid == cast(text_column.table.name, REGCLASS)) \
+            .scalar_subquery()
+        percent = func.least(100, 100.0 * self.sample_rows / func.greatest(rows, 1))
+        sampled_table = tablesample(text_column.table, func.system(percent))
+        sample = select(sampled_table.c[text_column.name].label('text')).cte('sample')
+        # show_trgm lists each trigram of a row once, so counts are rows
+        trigrams = select(func.unnest(func.show_trgm(sample.c.text)).label('trigram')).subquery()
+        sampled = select(func.count()).select_from(sample).scalar_subquery()
+        return select(trigrams.c.trigram) \
+            .group_by(trigrams.c.trigram) \
+            .having(func.count() > self.share * sampled)
+
+    def get(self, db: Session, text_column) -> frozenset[str]:
+        key = f'{text_column.table.name}.{text_column.name}'
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[1] > self.clock():
+            return entry[0]
+
+        frequent = frozenset(db.execute(self.statement(text_column)).scalars())
+        with self._lock:
+            self._entries[key] = (frequent, self.clock() + self.refresh)
+            self.samples += 1
+        return frequent
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def statistics(self):
+        with self._lock:
+            return {
+                'columns': len(self._entries),
+                'samples': self.samples,
+            }
+
+
+frequent_trigrams = FrequentTrigrams(sample_rows=settings.SEARCH_TRIGRAM_SAMPLE_ROWS,
+                                     share=settings.SEARCH_FREQUENT_TRIGRAM_SHARE,
+                                     refresh=settings.SEARCH_TRIGRAM_REFRESH)
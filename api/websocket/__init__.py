@@ -1,16 +1,22 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
+import asyncio
+import json
+import logging
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
 from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
 
-from api.OAuth2 import get_current_user
+from api import JWT
 from api.websocket.handlers import get_requested_data
-from api.websocket.connection import manager
-from core.database import get_db
+from api.websocket.connection import manager, Connection, ConnectionClosed
+from core.config import settings
+from core.database import AsyncSessionLocal
 
 router = APIRouter(
     tags=['WebSocket'],
 )
 
+logger = logging.getLogger(__name__)
+
 # webpage for websocket testing
 with open('./api/websocket/webpage.html') as f:
     html = f.read()
@@ -22,16 +28,82 @@ async def get():
     return HTMLResponse(html)
 
 
+async def handle_request(request: dict, connection: Connection):
+    request_id = request.get('id')
+    try:
+        # every request gets its own session, concurrent requests can not share one
+        async with AsyncSessionLocal() as db:
+            data = await get_requested_data(request, db, connection=connection)
+    except Exception:
+        # e.g. the session failed to close, the client is still owed an answer for its id
+        logger.exception('websocket request %s failed', request_id)
+        data = {'error': 'internal error', 'status_code': status.HTTP_500_INTERNAL_SERVER_ERROR}
+
+    if request_id is None:
+        if not data:
+            return
+        response = data
+    elif isinstance(data, dict) and 'error' in data:
+        # errors sit next to the id, whatever failed
+        response = {'id': request_id, **data}
+    else:
+        response = {'id': request_id, 'data': data}
+
+    # a response waits for queue space, a download filling the queue must not cost it
+    try:
+        await manager.push_json(response, connection)
+    except ConnectionClosed:
+        pass
+
+
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket,
-                             # current_user: schemas.TokenData = Depends(get_current_user),
-                             db: Session = Depends(get_db), ):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, token: str | None = None):
+    # browsers can not set headers on websockets, the access token is passed as ?token=
+    user_id: int | None = None
+    if token is not None:
+        try:
+            user_id = JWT.verify_token(token, ValueError('Could not validate credentials')).user_id
+        except ValueError:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+
+    connection = await manager.connect(websocket, user_id=user_id)
+    limiter = asyncio.Semaphore(settings.WS_MAX_CONCURRENT_REQUESTS)
+    tasks: set[asyncio.Task] = set()
+
+    async def run_limited(request: dict):
+        try:
+            await handle_request(request, connection)
+        finally:
+            limiter.release()
+
     try:
         while True:
-            request = await websocket.receive_json()
-            data = get_requested_data(request, db)
-            if data:
-                await manager.send_json(data, websocket)
-    except WebSocketDisconnect:
-        manager.disconnect(websocket)
+            try:
+                request = await websocket.receive_json()
+            except (json.JSONDecodeError, KeyError):
+                # not JSON or a binary frame, the socket itself is fine
+                request = None
+            if not isinstance(request, dict):
+                await manager.push_json({'error': 'invalid request', 'status_code': status.HTTP_400_BAD_REQUEST},
+                                        connection)
+                continue
+
+            if request.get('id') is None:
+                # requests without an id keep the old in-order behaviour
+                await handle_request(request, connection)
+                continue
+
+            # stop reading from the socket while the connection is at its limit
+            await limiter.acquire()
+            task = asyncio.create_task(run_limited(request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except (WebSocketDisconnect, ConnectionClosed):
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        # wait for the handlers to unwind, so none of them outlives the connection and its sessions
+        await asyncio.gather(*tasks, return_exceptions=True)
+        manager.disconnect(connection)
@@ -1,4 +1,17 @@
-from fastapi import WebSocket
+import asyncio
+import itertools
+import time
+import uuid
+
+from fastapi import WebSocket, status
+
+from api import serializer
+from api.websocket.pubsub import PubSubBackend, InProcessBackend, create_backend
+from core.config import settings
+
+
+class ConnectionClosed(Exception):
+    """The socket is gone, nothing queued for it will be sent."""
 
 
 class ConnectionMeta(type):
@@ -10,26 +23,198 @@ class ConnectionMeta(type):
         return cls._instance
 
 
+class Connection:
+    """Socket with its own bounded outbound queue drained by a writer task."""
+
+    def __init__(self, websocket: WebSocket, user_id: int | None, queue_size: int, stream_budget: int | None = None):
+        self.id: str = uuid.uuid4().hex
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        # file chunks may take at most this many queue slots, the rest stays
+        # free for responses and fan-out while a download is streaming
+        self.stream_budget = asyncio.Semaphore(stream_budget or max(queue_size // 2, 1))
+        self.writer: asyncio.Task | None = None
+        self.dropped = 0
+        self.transfer_ids = itertools.count(1)
+        self._closed = asyncio.Event()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed.is_set()
+
+    def close(self):
+        # wakes every put() waiting for queue space
+        self._closed.set()
+
+    async def write(self):
+        while True:
+            kind, data = await self.queue.get()
+            match kind:
+                case 'text':
+                    await self.websocket.send_text(data)
+                case 'json':
+                    await self.websocket.send_text(serializer.dumps(data).decode('utf-8'))
+                case 'bytes':
+                    await self.websocket.send_bytes(data)
+                case 'stream':
+                    await self.websocket.send_bytes(data)
+                    self.stream_budget.release()
+
+    def enqueue(self, kind: str, data) -> bool:
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait((kind, data))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    async def _until_closed(self, awaitable):
+        # waits, but not for a writer that will never drain the queue again
+        if self.closed:
+            raise ConnectionClosed()
+        waiting = asyncio.ensure_future(awaitable)
+        closed = asyncio.ensure_future(self._closed.wait())
+        try:
+            await asyncio.wait((waiting, closed), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiting.cancel()
+            closed.cancel()
+        if self.closed:
+            raise ConnectionClosed()
+
+    async def put(self, kind: str, data):
+        if self.closed:
+            raise ConnectionClosed()
+        try:
+            self.queue.put_nowait((kind, data))
+            return
+        except asyncio.QueueFull:
+            pass
+        await self._until_closed(self.queue.put((kind, data)))
+
+    async def put_stream(self, data: bytes):
+        if self.stream_budget.locked():
+            await self._until_closed(self.stream_budget.acquire())
+        else:
+            await self.stream_budget.acquire()
+        try:
+            await self.put('stream', data)
+        except ConnectionClosed:
+            self.stream_budget.release()
+            raise
+
+
 class ConnectionManager(metaclass=ConnectionMeta):
 
     def __init__(self):
-        self.active_connections: list[WebSocket] = []
+        self.active_connections: dict[str, Connection] = {}
+        self.user_connections: dict[int | None, dict[str, Connection]] = {}
+        self.backend: PubSubBackend = InProcessBackend()
+
+    async def start(self, backend: PubSubBackend | None = None):
+        self.backend = backend or create_backend()
+        await self.backend.start(self._deliver)
 
-    async def connect(self, websocket: WebSocket):
+    async def stop(self):
+        await self.backend.stop()
+
+    async def connect(self, websocket: WebSocket, user_id: int | None = None) -> Connection:
         await websocket.accept()
-        self.active_connections.append(websocket)
+        connection = Connection(websocket, user_id, queue_size=settings.WS_SEND_QUEUE_SIZE,
+                                stream_budget=settings.WS_STREAM_QUEUE_SLOTS)
+        self.active_connections[connection.id] = connection
+        self.user_connections.setdefault(user_id, {})[connection.id] = connection
+        connection.writer = asyncio.create_task(self._run_writer(connection))
+        return connection
+
+    def disconnect(self, connection: Connection):
+        connection.close()
+        if self.active_connections.pop(connection.id, None) is None:
+            return
+
+        user_connections = self.user_connections.get(connection.user_id, {})
+        user_connections.pop(connection.id, None)
+        if not user_connections:
+            self.user_connections.pop(connection.user_id, None)
+
+        if connection.writer is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+
+    def get_connection(self, connection_id: str) -> Connection | None:
+        return self.active_connections.get(connection_id)
+
+    def get_user_connections(self, user_id: int | None) -> list[Connection]:
+        return list(self.user_connections.get(user_id, {}).values())
+
+    async def _run_writer(self, connection: Connection):
+        try:
+            await connection.write()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # the socket is gone or broken, stop routing messages to it
+            self.disconnect(connection)
+
+    async def _close(self, connection: Connection, code: int):
+        self.disconnect(connection)
+        try:
+            await connection.websocket.close(code=code)
+        except Exception:
+            pass
+
+    def _send(self, kind: str, data, connection: Connection) -> bool:
+        if connection.enqueue(kind, data):
+            return True
+        if settings.WS_SLOW_CONSUMER_POLICY == 'disconnect':
+            asyncio.create_task(self._close(connection, code=status.WS_1013_TRY_AGAIN_LATER))
+        return False
+
+    def send_text(self, data: str, connection: Connection) -> bool:
+        return self._send('text', data, connection)
+
+    def send_json(self, data: dict, connection: Connection) -> bool:
+        return self._send('json', data, connection)
+
+    def send_bytes(self, data: bytes, connection: Connection) -> bool:
+        return self._send('bytes', data, connection)
+
+    # push_* wait for queue space instead of applying the slow consumer
+    # policy, for frames that have to arrive (request responses, file
+    # transfers), and raise ConnectionClosed once the socket is gone. the
+    # send_* policy is meant for fan-out, send_to_user and broadcast
+    async def push_json(self, data: dict, connection: Connection):
+        await connection.put('json', data)
+
+    async def push_bytes(self, data: bytes, connection: Connection):
+        # file chunks, bounded by the connection's stream budget
+        await connection.put_stream(data)
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+    def send_to_user(self, user_id: int, data: dict) -> bool:
+        # published through the backend so sockets held by other workers get it too
+        return self.backend.publish({'user_id': user_id, 'data': data, 'sent_at': time.time()})
 
-    async def send_text(self, data: str, websocket: WebSocket):
-        await websocket.send_text(data)
+    def broadcast(self, data: dict) -> bool:
+        return self.backend.publish({'broadcast': True, 'data': data, 'sent_at': time.time()})
 
-    async def send_json(self, data: dict, websocket: WebSocket):
-        await websocket.send_json(data)
+    def _deliver(self, messages: list[dict]):
+        for message in messages:
+            if message.get('broadcast'):
+                connections = list(self.active_connections.values())
+            else:
+                connections = self.get_user_connections(message.get('user_id'))
+            for connection in connections:
+                self.send_json(message['data'], connection)
 
-    async def send_bytes(self, data: bytes, websocket: WebSocket):
-        await websocket.send_bytes(data)
+    def statistics(self):
+        return {
+            'connections': len(self.active_connections),
+            'users': len(self.user_connections),
+            'dropped_messages': sum(connection.dropped for connection in self.active_connections.values()),
+            'pubsub': self.backend.stats.snapshot(),
+        }
 
 
 manager = ConnectionManager()
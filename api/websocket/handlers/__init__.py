@@ -1,100 +1,118 @@
 import json
-
-from sqlalchemy.orm import Session
-
-from api.websocket.handlers import call_handler, user_handler, file_handler
-
-
-def get_requested_data(request: dict, db: Session):
+import logging
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.websocket.connection import Connection
+from api.websocket.handlers import call_handler, user_handler, contact_handler, file_handler
+from api.websocket.router import Router
+
+# built once at import, mirrors the HTTP routers
+router = Router()
+
+router.add('GET', '/users/all', user_handler.get_all_users)
+router.add('GET', '/users/search', user_handler.search_users)
+router.add('GET', '/users', user_handler.get_user)
+router.add('PUT', '/users', user_handler.update_user)
+router.add('DELETE', '/users', user_handler.delete_user)
+router.add('GET', '/users/calls', user_handler.get_calls_of_user)
+router.add('POST', '/users/calls', user_handler.create_call_for_user)
+
+router.add('GET', '/calls/all', call_handler.get_all_calls)
+router.add('GET', '/calls/search', call_handler.search_calls)
+router.add('POST', '/calls/availability', call_handler.get_availability)
+router.add('GET', '/calls/{call_id}', call_handler.get_call_by_id)
+router.add('PUT', '/calls/{call_id}', call_handler.update_call)
+router.add('DELETE', '/calls/{call_id}', call_handler.delete_call)
+router.add('PUT', '/calls/{call_id}/occurrences', call_handler.update_occurrence)
+router.add('GET', '/calls/{call_id}/users', call_handler.get_users_of_call)
+router.add('POST', '/calls/{call_id}/users', call_handler.add_users_to_call)
+router.add('POST', '/calls/{call_id}/users/{user_id}', call_handler.add_user_to_call)
+router.add('DELETE', '/calls/{call_id}/users/{user_id}', call_handler.remove_user_from_call)
+
+router.add('GET', '/contacts', contact_handler.get_contacts)
+router.add('POST', '/contacts', contact_handler.add_contacts)
+router.add('POST', '/contacts/{contact_id}', contact_handler.add_contact)
+router.add('DELETE', '/contacts/{contact_id}', contact_handler.remove_contact)
+
+router.add('GET', '/file/download', file_handler.download_profile_image)
+router.add('PUT', '/file/upload', file_handler.upload_profile_image)
+
+SUPPORTED_METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+
+logger = logging.getLogger(__name__)
+
+
+def parse_body(body: str | dict | None) -> dict:
+    if isinstance(body, dict):
+        return body
+    if body and not isinstance(body, str):
+        raise ValueError('body must be an object or a JSON encoded string')
+    body = json.loads(body) if body else {}
+    if not isinstance(body, dict):
+        raise ValueError('body must be an object')
+    return body
+
+
+async def get_requested_data(request: dict, db: AsyncSession, connection: Connection | None = None):
     """
     example request json structure:
     {
+        "id": 7,
         "method": "GET",
-        "path": "/users",
+        "path": "/calls/42/users",
         "body": {
             "data": "anything",
             ...
         }
     }
+    body may also be a JSON encoded string, the optional id is echoed in the
+    response envelope so responses can arrive out of order:
+    {"id": 7, "data": ...} on success and
+    {"id": 7, "error": ..., "status_code": 400} on failure, whether the
+    handler, the session or anything unexpected failed. Without an id the
+    data or the error object is sent as is.
     """
-    method: str = request.get('method', '')
-    match method.upper():
-        case 'GET':
-            return handle_get(request, db)
-        case 'POST':
-            return handle_post(request, db)
-        case 'PUT':
-            return handle_put(request, db)
-        case 'DELETE':
-            return handle_delete(request, db)
-    return {'error': 'method not supported'}
-
-
-def handle_get(request: dict, db: Session):
-    path: str = request.get('path', '')
-    body: str = request.get('body', '')
-    request_body: dict = json.loads(body) if body else {}
-
-    match path.lower():
-        case '/users/all':
-            return user_handler.get_all_users(request_body=request_body, db=db)
-        case '/users':
-            return user_handler.get_user(request_body=request_body, db=db)
-        case '/users/calls':
-            pass
-        case '/calls/all':
-            return call_handler.get_all_calls(request_body=request_body, db=db)
-        case '/calls/{call_id}':
-            pass
-        case '/calls/{call_id}/users':
-            pass
-        case '/contacts':
-            pass
-        case '/file/download':
-            return file_handler.download_profile_image(request_body=request_body, db=db)
-    return {'error': 'path not supported'}
-
-
-def handle_post(request: dict, db: Session):
-    path: str = request.get('path', '')
-    body: str = request.get('body', '')
-    request_body: dict = json.loads(body) if body else {}
-
-    match path.lower():
-        case '/users/calls':
-            return user_handler.create_call_for_user(request_body=request_body, db=db)
-        case '/calls/{call_id}/users/{user_id}':
-            pass
-        case '/contacts/{contact_id}':
-            pass
-    return {'error': 'path not supported'}
-
-
-def handle_put(request: dict, db: Session):
-    path: str = request.get('path', '')
-    body: str = request.get('body', '')
-    request_body: dict = json.loads(body) if body else {}
-
-    match path.lower():
-        case '/users':
-            pass
-        case '/calls/{call_id}':
-            pass
-        case '/file/upload':
-            return file_handler.upload_profile_image(request_body=request_body, db=db)
-    return {'error': 'path not supported'}
-
-
-def handle_delete(request: dict, db: Session):
-    path: str = request.get('path', '')
-
-    match path.lower():
-        case '/users':
-            pass
-        case '/calls/{call_id}':
-            pass
-        case '/calls/{call_id}/users/{user_id}':
-            pass
-        case '/contacts/{contact_id}':
-            pass
-    return {'error': 'path not supported'}
+    current_user_id: int | None = connection.user_id if connection else None
+    method: str = str(request.get('method') or '').upper()
+    if method not in SUPPORTED_METHODS:
+        return {'error': 'method not supported'}
+
+    path: str = str(request.get('path') or '')
+    resolved = router.resolve(method, path.lower())
+    if resolved is None:
+        return {'error': 'path not supported'}
+    route, path_params = resolved
+
+    if 'current_user_id' in route.arguments and current_user_id is None:
+        return {'error': 'not authenticated', 'status_code': status.HTTP_401_UNAUTHORIZED}
+
+    try:
+        request_body = parse_body(request.get('body'))
+    except ValueError:
+        return {'error': 'invalid body', 'status_code': status.HTTP_400_BAD_REQUEST}
+
+    context = {
+        'request_body': request_body,
+        'db': db,
+        'current_user_id': current_user_id,
+        'connection': connection,
+        'request_id': request.get('id'),
+        **path_params,
+    }
+    try:
+        return await route(context)
+    except HTTPException as e:
+        return {'error': e.detail, 'status_code': e.status_code}
+    except ValidationError as e:
+        return {'error': e.errors(), 'status_code': status.HTTP_422_UNPROCESSABLE_ENTITY}
+    except DBAPIError:
+        logger.exception('websocket request %s %s failed in the database', method, path)
+        return {'error': 'database error', 'status_code': status.HTTP_500_INTERNAL_SERVER_ERROR}
+    except Exception:
+        # one failed request must not close a socket shared by all the others
+        logger.exception('websocket request %s %s failed', method, path)
+        return {'error': 'internal error', 'status_code': status.HTTP_500_INTERNAL_SERVER_ERROR}
@@ -1,12 +1,68 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from api import crud
-from api.websocket import serializer
+from api import async_crud, crud, schemas, pagination, serializer
+from core.concurrency import run_in_session
 
 
-def get_all_calls(request_body: dict, db: Session):
-    skip: int = request_body.get('skip', 0)
-    limit: int = request_body.get('limit', 10)
-    calls = crud.get_all_calls(db=db, skip=skip, limit=limit)
+async def get_all_calls(request_body: dict, db: AsyncSession):
+    page = schemas.Page(**request_body)
+    if 'cursor' in page.__fields_set__:
+        calls = await async_crud.get_all_calls(db=db, limit=page.limit, cursor=page.cursor)
+        return {
+            'items': serializer.serialize_calls(calls),
+            'next_cursor': pagination.next_call_cursor(calls, page.limit),
+        }
+    calls = await async_crud.get_all_calls(db=db, skip=page.skip, limit=page.limit)
     return serializer.serialize_calls(calls)
 
+
+async def search_calls(request_body: dict, current_user_id: int):
+    search = schemas.SearchQuery(**request_body)
+    return await run_in_session(crud.search_calls, serializer.serialize_calls, user_id=current_user_id,
+                                query=search.q, limit=search.limit)
+
+
+async def get_availability(request_body: dict):
+    request = schemas.AvailabilityRequest(**request_body)
+    slots = await run_in_session(crud.get_availability, request=request)
+    return [slot.dict() for slot in slots]
+
+
+async def get_call_by_id(call_id: int):
+    return await run_in_session(crud.get_call_by_id, serializer.serialize_call, call_id=call_id)
+
+
+async def update_call(request_body: dict, call_id: int, current_user_id: int):
+    request = schemas.CallUpdate(**request_body)
+    return await run_in_session(crud.update_call, serializer.serialize_call,
+                                call_id=call_id, user_id=current_user_id, request=request)
+
+
+async def delete_call(call_id: int, current_user_id: int):
+    await run_in_session(crud.remove_call, call_id=call_id, user_id=current_user_id)
+    return {'status': 'OK'}
+
+
+async def update_occurrence(request_body: dict, call_id: int, current_user_id: int):
+    request = schemas.OccurrenceUpdate(**request_body)
+    return await run_in_session(crud.update_occurrence, serializer.serialize_call_exceptions,
+                                call_id=call_id, user_id=current_user_id, request=request)
+
+
+async def get_users_of_call(call_id: int):
+    return await run_in_session(crud.get_users_of_call, serializer.serialize_users, call_id=call_id)
+
+
+async def add_users_to_call(request_body: dict, call_id: int):
+    request = schemas.UserIDs(**request_body)
+    result = await run_in_session(crud.add_users_to_call, call_id=call_id, user_ids=request.user_ids)
+    return result.dict()
+
+
+async def add_user_to_call(call_id: int, user_id: int):
+    return await run_in_session(crud.add_user_to_call, serializer.serialize_users, call_id=call_id, user_id=user_id)
+
+
+async def remove_user_from_call(call_id: int, user_id: int):
+    return await run_in_session(crud.remove_user_from_call, serializer.serialize_users,
+                                call_id=call_id, user_id=user_id)
@@ -0,0 +1,22 @@
+from api import crud, schemas, serializer
+from core.concurrency import run_in_session
+
+
+async def get_contacts(current_user_id: int):
+    return await run_in_session(crud.get_contacts, serializer.serialize_users, user_id=current_user_id)
+
+
+async def add_contacts(request_body: dict, current_user_id: int):
+    request = schemas.UserIDs(**request_body)
+    result = await run_in_session(crud.add_contacts, user_id=current_user_id, contact_ids=request.user_ids)
+    return result.dict()
+
+
+async def add_contact(contact_id: int, current_user_id: int):
+    return await run_in_session(crud.add_contact, serializer.serialize_users,
+                                user_id=current_user_id, contact_id=contact_id)
+
+
+async def remove_contact(contact_id: int, current_user_id: int):
+    return await run_in_session(crud.remove_contact, serializer.serialize_users,
+                                user_id=current_user_id, contact_id=contact_id)
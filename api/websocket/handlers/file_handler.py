@@ -1,29 +1,101 @@
 import base64
+import struct
 from pathlib import Path
 
-from sqlalchemy.orm import Session
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from api import crud
+from api import async_crud, images, schemas
+from api.websocket.connection import Connection, ConnectionClosed, manager
+from core.concurrency import run_blocking
 from core.config import settings
 
+# every binary frame starts with (transfer id, offset of the chunk in the file)
+CHUNK_HEADER = struct.Struct('>IQ')
 
-def download_profile_image(request_body: dict, db: Session):
-    # TODO: set user_id
-    user_id: int = 15
-    db_user = crud.get_user_by_id(user_id=user_id, db=db)
-    file_path = Path(db_user.profile_picture)
 
-    if not file_path.exists() or not file_path.is_file():
-        file_path = settings.PROFILE_IMAGE_DEFAULT_PATH
+def _read_file(file_path: Path):
     with open(file_path, 'rb') as f:
-        image = f.read()
-        image_base64 = base64.b64encode(image)
+        return f.read()
+
+
+def _read_chunk(f, size: int):
+    return f.read(size)
+
+
+def _file_size(file_path: Path) -> int:
+    return file_path.stat().st_size
+
+
+async def _profile_image_path(db: AsyncSession, user_id: int, size: int | None = None) -> Path:
+    db_user = await async_crud.get_user_by_id(user_id=user_id, db=db)
+    # the file checks and rendering touch the disk, keep them off the event loop
+    return await run_blocking(images.resolve_profile_image, db_user.profile_picture, size)
+
+
+async def stream_file(file_path: Path, offset: int, connection: Connection, request_id=None):
+    size = await run_blocking(_file_size, file_path)
+    if not isinstance(offset, int) or not 0 <= offset <= size:
+        return {'error': 'invalid offset'}
+
+    transfer_id = next(connection.transfer_ids)
+    chunk_size = settings.WS_FILE_CHUNK_SIZE
+    f = None
+    try:
+        await manager.push_json({
+            'id': request_id,
+            'type': 'file',
+            'transfer_id': transfer_id,
+            'content_type': 'image/jpeg',
+            'size': size,
+            'offset': offset,
+            'chunk_size': chunk_size,
+            'chunk_header': 'transfer_id:uint32,offset:uint64,big-endian',
+        }, connection)
+
+        f = await run_blocking(open, file_path, 'rb')
+        await run_blocking(f.seek, offset)
+        while offset < size:
+            chunk = await run_blocking(_read_chunk, f, chunk_size)
+            if not chunk:
+                break
+            await manager.push_bytes(CHUNK_HEADER.pack(transfer_id, offset) + chunk, connection)
+            offset += len(chunk)
+    except ConnectionClosed:
+        # the client is gone, it resumes from its last offset on the next connection
+        pass
+    finally:
+        # closed inline, an await here could be cut short by a second cancellation
+        if f is not None:
+            f.close()
+
+    return {'transfer_id': transfer_id, 'size': size, 'complete': offset == size}
+
+
+async def download_profile_image(request_body: dict, db: AsyncSession, current_user_id: int,
+                                 connection: Connection, request_id=None):
+    request = schemas.FileDownload(**request_body)
+    file_path = await _profile_image_path(db=db, user_id=current_user_id, size=request.size)
+
+    # binary mode streams raw chunks, an interrupted download resumes from 'offset'
+    if request.mode == 'binary':
+        # release the pooled connection, it is not needed while streaming
+        await db.close()
+        return await stream_file(file_path, offset=request.offset, connection=connection, request_id=request_id)
+
+    image = await run_blocking(_read_file, file_path)
+    image_base64 = base64.b64encode(image)
     return {'image': image_base64.decode('utf-8')}
 
 
-def upload_profile_image(request_body: dict, db: Session):
-    # TODO: set user_id
-    image_base64: str = request_body.get('image', '')
-    image = base64.b64decode(image_base64)
-    crud.upload_profile_image(user_id=15, image=image, db=db)
+async def upload_profile_image(request_body: dict, db: AsyncSession, current_user_id: int):
+    image_base64 = request_body.get('image', '')
+    try:
+        image = base64.b64decode(image_base64, validate=True)
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Image must be a base64 encoded string.',
+        )
+    await async_crud.upload_profile_image(user_id=current_user_id, image=image, db=db)
     return {'image': 'OK'}
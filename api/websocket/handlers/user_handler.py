@@ -1,36 +1,48 @@
-from _datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from sqlalchemy.orm import Session
+from api import async_crud, crud, schemas, pagination, serializer
+from core.concurrency import run_in_session
 
-from api import crud, schemas
-from api.websocket import serializer
 
-
-def get_all_users(request_body: dict, db: Session):
-    skip: int = request_body.get('skip', 0)
-    limit: int = request_body.get('limit', 10)
-    users = crud.get_all_users(db=db, skip=skip, limit=limit)
+async def get_all_users(request_body: dict, db: AsyncSession):
+    page = schemas.Page(**request_body)
+    if 'cursor' in page.__fields_set__:
+        users = await async_crud.get_all_users(db=db, limit=page.limit, cursor=page.cursor)
+        return {
+            'items': serializer.serialize_users(users),
+            'next_cursor': pagination.next_user_cursor(users, page.limit),
+        }
+    users = await async_crud.get_all_users(db=db, skip=page.skip, limit=page.limit)
     return serializer.serialize_users(users)
 
 
-def get_user(request_body: dict, db: Session):
-    # TODO: get user_id from request_body
-    # user_id = request_body.get('user_id')
-    user = crud.get_user_by_id(user_id=16, db=db)
+async def search_users(request_body: dict):
+    search = schemas.SearchQuery(**request_body)
+    return await run_in_session(crud.search_users, serializer.serialize_users, query=search.q, limit=search.limit)
+
+
+async def get_user(db: AsyncSession, current_user_id: int):
+    user = await async_crud.get_user_by_id(user_id=current_user_id, db=db)
     return serializer.serialize_user(user)
 
 
-def create_call_for_user(request_body: dict, db: Session):
-    title: str = request_body.get('title')
-    date_string: str = request_body.get('date')
-    duration: int = request_body.get('duration')
+async def update_user(request_body: dict, current_user_id: int):
+    request = schemas.UserUpdate(**request_body)
+    return await run_in_session(crud.update_user, serializer.serialize_user, user_id=current_user_id, request=request)
+
+
+async def delete_user(current_user_id: int):
+    await run_in_session(crud.delete_user, user_id=current_user_id)
+    return {'status': 'OK'}
+
+
+async def get_calls_of_user(request_body: dict, current_user_id: int):
+    window = schemas.TimeWindow(**request_body)
+    return await run_in_session(crud.get_calls_of_user, serializer.serialize_calls, user_id=current_user_id,
+                                start=window.start, end=window.end, limit=window.limit)
 
-    # check if any of the fields are missing
-    if not all([title, date_string, duration]):
-        return {'error': 'missing fields'}
 
-    # TODO: date este nefunguje
-    date = datetime.strptime(date_string, '%Y-%m-%dT%H:%M:%S.%fZ')
-    call = schemas.CallCreate(title=title, date=date, duration=duration)
-    call = crud.create_call_for_user(call=call, user_id=13, db=db)
+async def create_call_for_user(request_body: dict, db: AsyncSession, current_user_id: int):
+    call = schemas.CallCreate(**request_body)
+    call = await async_crud.create_call_for_user(call=call, user_id=current_user_id, db=db)
     return serializer.serialize_call(call)
@@ -0,0 +1,243 @@
+import abc
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable
+
+import asyncpg
+import orjson
+
+from api import serializer
+from core.config import settings
+from core.metrics import Histogram
+
+# milliseconds between publish and delivery to the local sockets
+DELIVERY_LATENCY_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_NOTIFY_PAYLOAD = 7900
+
+# seconds between attempts to reopen a lost LISTEN connection, doubling up to the maximum
+RECONNECT_DELAY = 0.1
+MAX_RECONNECT_DELAY = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+class PubSubStats:
+
+    def __init__(self):
+        self.published = 0
+        self.rejected = 0
+        self.failed = 0
+        self.reconnects = 0
+        self.received = 0
+        self.batches_sent = 0
+        self.batches_received = 0
+        self.delivery_latency_ms = Histogram(DELIVERY_LATENCY_BUCKETS)
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def record_received(self, messages: list[dict]):
+        now = time.time()
+        for message in messages:
+            self.delivery_latency_ms.observe((now - message.get('sent_at', now)) * 1000)
+        with self._lock:
+            self.received += len(messages)
+            self.batches_received += 1
+
+    def snapshot(self):
+        elapsed = max(time.time() - self.started_at, 1e-9)
+        return {
+            'published': self.published,
+            'rejected': self.rejected,
+            'failed': self.failed,
+            'reconnects': self.reconnects,
+            'received': self.received,
+            'batches_sent': self.batches_sent,
+            'batches_received': self.batches_received,
+            'received_per_second': self.received / elapsed,
+            'delivery_latency_ms': self.delivery_latency_ms.snapshot(),
+        }
+
+
+class PubSubBackend(abc.ABC):
+    """Delivers every published message to the subscriber of each worker."""
+
+    def __init__(self):
+        self.stats = PubSubStats()
+        self._on_messages: Callable[[list[dict]], None] | None = None
+
+    async def start(self, on_messages: Callable[[list[dict]], None]):
+        self._on_messages = on_messages
+
+    async def stop(self):
+        self._on_messages = None
+
+    @abc.abstractmethod
+    def publish(self, message: dict) -> bool:
+        """Queue the message for every worker, False if it cannot be delivered."""
+
+    def _deliver(self, messages: list[dict]):
+        self.stats.record_received(messages)
+        if self._on_messages is not None:
+            self._on_messages(messages)
+
+
+class InProcessBackend(PubSubBackend):
+    """Single worker backend, messages are delivered immediately."""
+
+    def publish(self, message: dict) -> bool:
+        self.stats.published += 1
+        self.stats.batches_sent += 1
+        self._deliver([message])
+        return True
+
+
+class PostgresBackend(PubSubBackend):
+    """Multi-worker backend over Postgres LISTEN/NOTIFY with batched publishing."""
+
+    def __init__(self, dsn: str, channel: str, batch_size: int, batch_interval: float):
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._buffer: list[bytes] = []
+        self._flush_requested = asyncio.Event()
+        self._listen_connection: asyncpg.Connection | None = None
+        self._publish_connection: asyncpg.Connection | None = None
+        self._flusher: asyncio.Task | None = None
+        self._reconnector: asyncio.Task | None = None
+        self._stopping = False
+
+    async def start(self, on_messages: Callable[[list[dict]], None]):
+        await super().start(on_messages)
+        self._stopping = False
+        await self._listen()
+        self._publish_connection = await asyncpg.connect(self.dsn)
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _listen(self):
+        connection = await asyncpg.connect(self.dsn)
+        try:
+            await connection.add_listener(self.channel, self._on_notify)
+        except BaseException:
+            await connection.close()
+            raise
+        connection.add_termination_listener(self._on_listen_terminated)
+        self._listen_connection = connection
+
+    def _on_listen_terminated(self, connection):
+        # a restart or a dropped connection would otherwise end cross-worker delivery for good
+        if self._stopping or connection is not self._listen_connection:
+            return
+        logger.warning('pubsub LISTEN connection lost, reconnecting')
+        if self._reconnector is None or self._reconnector.done():
+            self._reconnector = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self):
+        # notifications sent while no connection listens are lost
+        delay = RECONNECT_DELAY
+        while not self._stopping:
+            try:
+                await self._listen()
+            except Exception:
+                logger.warning('pubsub LISTEN reconnect failed, retrying in %.1fs', delay, exc_info=True)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+            else:
+                self.stats.reconnects += 1
+                logger.info('pubsub LISTEN connection restored')
+                return
+
+    async def stop(self):
+        self._stopping = True
+        if self._reconnector is not None:
+            self._reconnector.cancel()
+            await asyncio.gather(self._reconnector, return_exceptions=True)
+            self._reconnector = None
+        if self._flusher is not None:
+            self._flusher.cancel()
+            # let it unwind first, so the final flush is the only one sending
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self._flush()
+        for connection in (self._listen_connection, self._publish_connection):
+            if connection is not None:
+                await connection.close()
+        await super().stop()
+
+    def publish(self, message: dict) -> bool:
+        payload = serializer.dumps(message)
+        # a message that does not fit a NOTIFY on its own would fail its whole batch
+        if len(payload) + 2 > MAX_NOTIFY_PAYLOAD:
+            self.stats.rejected += 1
+            logger.warning('pubsub message of %d bytes exceeds the NOTIFY payload limit, dropped', len(payload))
+            return False
+        self._buffer.append(payload)
+        self.stats.published += 1
+        if len(self._buffer) >= self.batch_size:
+            self._flush_requested.set()
+        return True
+
+    def _on_notify(self, connection, pid, channel, payload: str):
+        self._deliver(orjson.loads(payload))
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.batch_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self._flush()
+
+    @staticmethod
+    def _batches(messages: list[bytes]):
+        """Bounds (start, end) of runs of messages that fit into one NOTIFY payload."""
+        start, size = 0, 2
+        for end, message in enumerate(messages):
+            if end > start and size + len(message) + 1 > MAX_NOTIFY_PAYLOAD:
+                yield start, end
+                start, size = end, 2
+            size += len(message) + 1
+        if start < len(messages):
+            yield start, len(messages)
+
+    async def _flush(self):
+        if not self._buffer or self._publish_connection is None:
+            return
+        messages, self._buffer = self._buffer, []
+
+        for start, end in self._batches(messages):
+            try:
+                await self._notify(messages[start:end])
+            except asyncio.CancelledError:
+                # requeued for the final flush in stop(), the batch in flight may arrive twice
+                self._buffer[:0] = messages[start:]
+                raise
+            except Exception:
+                # one failed batch must not stop the flusher, the rest still goes out
+                self.stats.failed += end - start
+                logger.exception('pubsub batch of %d messages could not be published', end - start)
+
+    async def _notify(self, batch: list[bytes]):
+        if self._publish_connection.is_closed():
+            self._publish_connection = await asyncpg.connect(self.dsn)
+        payload = b'[' + b','.join(batch) + b']'
+        await self._publish_connection.execute('SELECT pg_notify($1, $2)', self.channel, payload.decode('utf-8'))
+        self.stats.batches_sent += 1
+
+
+def create_backend() -> PubSubBackend:
+    match settings.WS_PUBSUB_BACKEND:
+        case 'postgres':
+            return PostgresBackend(
+                dsn=settings.DATABASE_URL,
+                channel=settings.WS_PUBSUB_CHANNEL,
+                batch_size=settings.WS_PUBSUB_BATCH_SIZE,
+                batch_interval=settings.WS_PUBSUB_BATCH_INTERVAL,
+            )
+    return InProcessBackend()
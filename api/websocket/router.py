@@ -0,0 +1,88 @@
+import inspect
+
+
+class Route:
+    """Handler plus what it needs, worked out once at registration."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        parameters = inspect.signature(handler).parameters
+        self.arguments = frozenset(parameters)
+        self.converters = {name: parameter.annotation for name, parameter in parameters.items()
+                           if parameter.annotation in (int, float)}
+
+    def convert(self, path_params: dict[str, str]) -> dict | None:
+        try:
+            return {name: self.converters.get(name, str)(value) for name, value in path_params.items()}
+        except ValueError:
+            return None
+
+    async def __call__(self, context: dict):
+        return await self.handler(**{name: value for name, value in context.items() if name in self.arguments})
+
+
+class RouteNode:
+    __slots__ = ('children', 'param_name', 'param_child', 'routes')
+
+    def __init__(self):
+        self.children: dict[str, RouteNode] = {}
+        self.param_name: str | None = None
+        self.param_child: RouteNode | None = None
+        self.routes: dict[str, Route] = {}
+
+
+class Router:
+    """Segment trie mapping (method, path) to handlers, '{name}' segments capture path parameters."""
+
+    def __init__(self):
+        self.root = RouteNode()
+
+    @staticmethod
+    def split(path: str) -> list[str]:
+        return [segment for segment in path.strip('/').split('/') if segment]
+
+    def add(self, method: str, path: str, handler):
+        node = self.root
+        for segment in self.split(path):
+            if segment.startswith('{') and segment.endswith('}'):
+                name = segment[1:-1]
+                if node.param_child is None:
+                    node.param_name, node.param_child = name, RouteNode()
+                elif node.param_name != name:
+                    raise ValueError(f'Conflicting path parameter {name!r} in {path!r}.')
+                node = node.param_child
+            else:
+                node = node.children.setdefault(segment, RouteNode())
+        node.routes[method.upper()] = Route(handler)
+
+    def resolve(self, method: str, path: str) -> tuple[Route, dict] | None:
+        path_params: dict[str, str] = {}
+        node = self._match(self.root, self.split(path), 0, path_params)
+        if node is None or method.upper() not in node.routes:
+            return None
+
+        route = node.routes[method.upper()]
+        converted = route.convert(path_params)
+        if converted is None:
+            return None
+        return route, converted
+
+    def _match(self, node: RouteNode, segments: list[str], index: int, path_params: dict) -> RouteNode | None:
+        if index == len(segments):
+            return node
+
+        # static segments win over parameters, fall back to the parameter branch
+        child = node.children.get(segments[index])
+        if child is not None:
+            found = self._match(child, segments, index + 1, path_params)
+            if found is not None:
+                return found
+
+        if node.param_child is not None:
+            path_params[node.param_name] = segments[index]
+            found = self._match(node.param_child, segments, index + 1, path_params)
+            if found is not None:
+                return found
+            del path_params[node.param_name]
+
+        return None
@@ -0,0 +1,67 @@
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import settings
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class BodySizeLimitMiddleware:
+    """Rejects HTTP request bodies over the limit of their path with 413.
+
+    The limit is enforced while the body is received, so a chunked upload
+    without Content-Length is cut off at the limit instead of being
+    spooled to a temp file first. Paths without a limit pass through.
+    """
+
+    def __init__(self, app: ASGIApp, limits: dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    def too_large(self, limit: int) -> JSONResponse:
+        return JSONResponse(
+            {'detail': f'Request body too large. Maximum size is {limit} bytes.'},
+            status_code=413,
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        limit = self.limits.get(scope['path']) if scope['type'] == 'http' else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        content_length = dict(scope['headers']).get(b'content-length', b'')
+        if content_length.isdigit() and int(content_length) > limit:
+            return await self.too_large(limit)(scope, receive, send)
+
+        received = 0
+        rejected = False
+
+        async def receive_limited() -> Message:
+            nonlocal received, rejected
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > limit:
+                    # answer now, the app only sees its body parsing fail
+                    rejected = True
+                    await self.too_large(limit)(scope, receive, send)
+                    raise BodyTooLarge()
+            return message
+
+        async def send_unless_rejected(message: Message):
+            # whatever the app responds to the aborted body is dropped
+            if not rejected:
+                await send(message)
+
+        try:
+            await self.app(scope, receive_limited, send_unless_rejected)
+        except BodyTooLarge:
+            pass
+
+
+# multipart framing adds a little on top of the image itself
+body_limits = {
+    '/file/upload': settings.MAX_IMAGE_SIZE + settings.IMAGE_CHUNK_SIZE,
+}
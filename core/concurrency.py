@@ -0,0 +1,29 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from core.config import settings
+from core.database import SessionLocal
+
+# bounded pool for blocking calls made from the event loop, so a slow query or
+# file read occupies one of these threads instead of freezing every socket
+blocking_executor = ThreadPoolExecutor(max_workers=settings.BLOCKING_POOL_SIZE, thread_name_prefix='blocking')
+
+
+async def run_blocking(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_in_session(func, serialize=None, **kwargs):
+    """Run a sync crud function on its own session in the blocking pool.
+
+    The result is serialized inside the worker thread, while the session
+    is still open and lazy relationships can load.
+    """
+    def call():
+        with SessionLocal() as db:
+            result = func(db=db, **kwargs)
+            return serialize(result) if serialize else result
+
+    return await run_blocking(call)
@@ -18,20 +18,104 @@ class Settings:
     POSTGRES_PORT: str = os.getenv('POSTGRES_PORT', 5432)
     POSTGRES_DB: str = os.getenv('POSTGRES_DB')
     DATABASE_URL = f'postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}'
+    ASYNC_DATABASE_URL = f'postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}'
+
+    # connection pool, size it against Postgres max_connections:
+    # workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) for each engine
+    DB_POOL_SIZE: int = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT: int = int(os.getenv('DB_POOL_TIMEOUT', 30))  # seconds
+    DB_POOL_RECYCLE: int = int(os.getenv('DB_POOL_RECYCLE', 1800))  # seconds
+    DB_POOL_PRE_PING: bool = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    DB_STATEMENT_TIMEOUT: int = int(os.getenv('DB_STATEMENT_TIMEOUT', 30_000))  # milliseconds
+
+    # websocket outbound queues, a fan-out message meeting a full queue either
+    # is dropped or disconnects the slow client ('drop' | 'disconnect');
+    # request responses and file chunks wait for space instead
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv('WS_SEND_QUEUE_SIZE', 64))
+    WS_SLOW_CONSUMER_POLICY: str = os.getenv('WS_SLOW_CONSUMER_POLICY', 'disconnect')
+    # queue slots file chunks may hold, the rest stays free during downloads
+    WS_STREAM_QUEUE_SLOTS: int = int(os.getenv('WS_STREAM_QUEUE_SLOTS', 32))
+    # requests carrying an id run concurrently, at most this many per connection
+    WS_MAX_CONCURRENT_REQUESTS: int = int(os.getenv('WS_MAX_CONCURRENT_REQUESTS', 8))
+
+    # websocket fan-out between workers ('memory' | 'postgres')
+    WS_PUBSUB_BACKEND: str = os.getenv('WS_PUBSUB_BACKEND', 'memory')
+    WS_PUBSUB_CHANNEL: str = os.getenv('WS_PUBSUB_CHANNEL', 'ws_messages')
+    WS_PUBSUB_BATCH_SIZE: int = int(os.getenv('WS_PUBSUB_BATCH_SIZE', 100))
+    WS_PUBSUB_BATCH_INTERVAL: float = float(os.getenv('WS_PUBSUB_BATCH_INTERVAL', 0.005))  # seconds
+
+    # threads for blocking work (file IO, sync queries) started from async code
+    BLOCKING_POOL_SIZE: int = int(os.getenv('BLOCKING_POOL_SIZE', 8))
 
     # user settings
     EMAIL_REGEX: str = r'^[.\w-]+@([\w-]+\.)+[\w-]{2,4}$'
     MIN_PASSWORD_LENGTH: int = 7
 
+    # trigram indexes need at least 3 characters to narrow down a search
+    SEARCH_MIN_LENGTH: int = 3
+    SEARCH_MAX_LENGTH: int = 100
+    SEARCH_MAX_LIMIT: int = 50
+    # matches ranked per search, a common query ranks this many instead of all of them
+    SEARCH_CANDIDATES: int = int(os.getenv('SEARCH_CANDIDATES', 1000))
+    # trigrams in more than this share of the rows are left out of trigram index scans,
+    # counted on a sample of the table that is refreshed periodically
+    SEARCH_FREQUENT_TRIGRAM_SHARE: float = float(os.getenv('SEARCH_FREQUENT_TRIGRAM_SHARE', 0.05))
+    SEARCH_TRIGRAM_SAMPLE_ROWS: int = int(os.getenv('SEARCH_TRIGRAM_SAMPLE_ROWS', 2000))
+    SEARCH_TRIGRAM_REFRESH: int = int(os.getenv('SEARCH_TRIGRAM_REFRESH', 600))  # seconds
+
+    # call settings
+    # minutes, bounds the conflict range scan, enforced by ck_calls_duration (migration 0005)
+    MAX_CALL_DURATION: int = 24 * 60
+    # the agenda is capped even without a window, so an old account does not return its whole history
+    AGENDA_DEFAULT_LIMIT: int = 100
+    AGENDA_MAX_LIMIT: int = 1000
+    # open ended windows over recurring calls are expanded this far ahead
+    RECURRENCE_HORIZON: int = int(os.getenv('RECURRENCE_HORIZON', 365))  # days
+
+    # password hashing runs in its own process pool, requests beyond the
+    # queue limit are rejected with 503 instead of piling up
+    HASH_POOL_SIZE: int = int(os.getenv('HASH_POOL_SIZE', 2))
+    HASH_QUEUE_LIMIT: int = int(os.getenv('HASH_QUEUE_LIMIT', 32))
+    # sync callers (password changes) hold a threadpool thread while waiting,
+    # keep this well below the 40 threads of the anyio threadpool
+    HASH_BLOCKING_LIMIT: int = int(os.getenv('HASH_BLOCKING_LIMIT', 4))
+    HASH_RETRY_AFTER: int = int(os.getenv('HASH_RETRY_AFTER', 1))  # seconds
+
+    # in-flight HTTP requests per route class adapt to latency (AIMD),
+    # requests beyond the current limit are rejected with 503
+    CONCURRENCY_TARGETS: dict[str, float] = {  # milliseconds to first byte
+        'auth': float(os.getenv('CONCURRENCY_TARGET_AUTH', 1000)),
+        'reads': float(os.getenv('CONCURRENCY_TARGET_READS', 100)),
+        'writes': float(os.getenv('CONCURRENCY_TARGET_WRITES', 250)),
+        'file': float(os.getenv('CONCURRENCY_TARGET_FILE', 500)),
+    }
+    CONCURRENCY_INITIAL_LIMIT: int = int(os.getenv('CONCURRENCY_INITIAL_LIMIT', 20))
+    CONCURRENCY_MIN_LIMIT: int = int(os.getenv('CONCURRENCY_MIN_LIMIT', 2))
+    CONCURRENCY_MAX_LIMIT: int = int(os.getenv('CONCURRENCY_MAX_LIMIT', 100))
+    CONCURRENCY_BACKOFF: float = float(os.getenv('CONCURRENCY_BACKOFF', 0.9))
+    CONCURRENCY_RETRY_AFTER: int = int(os.getenv('CONCURRENCY_RETRY_AFTER', 1))  # seconds
+
     # command pre vygenerovanie secret key: openssl rand -hex 32
     SECRET_KEY = 'ccccde617c75da86d9b3f10ff36051d35957016dbcae181f60cc6cc72ff9acad'
     ALGORITHM = 'HS256'
     ACCESS_TOKEN_EXPIRE_MINUTES = 10_080  # 60 * 24 * 7 = 10_080 minutes = 1 week
+    TOKEN_CACHE_SIZE: int = int(os.getenv('TOKEN_CACHE_SIZE', 10_000))
 
     # profile picture settings
     IMAGES_FOLDER = 'images/'
     IMAGE_EXTENSION = '.jpg'
     DEFAULT_PROFILE_PICTURE = f'{IMAGES_FOLDER}default{IMAGE_EXTENSION}'
+    # uploads are stored once by content hash, with square renditions (px) next to them
+    IMAGE_STORE_FOLDER = f'{IMAGES_FOLDER}objects/'
+    IMAGE_RENDITIONS: tuple[int, ...] = (64, 128, 512)
+    IMAGE_CACHE_MAX_AGE: int = int(os.getenv('IMAGE_CACHE_MAX_AGE', 300))  # seconds
+    MAX_IMAGE_SIZE: int = int(os.getenv('MAX_IMAGE_SIZE', 5 * 1024 * 1024))  # bytes
+    IMAGE_CHUNK_SIZE: int = 64 * 1024
+
+    # rows fetched per round trip from the server-side cursor of exports
+    EXPORT_BATCH_SIZE: int = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+    WS_FILE_CHUNK_SIZE: int = int(os.getenv('WS_FILE_CHUNK_SIZE', 64 * 1024))
 
 
 settings = Settings()
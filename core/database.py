@@ -1,16 +1,48 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from core.config import settings
+from core.pool import InstrumentedQueuePool, InstrumentedAsyncQueuePool
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
+SQLALCHEMY_ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+pool_options = {
+    'pool_size': settings.DB_POOL_SIZE,
+    'max_overflow': settings.DB_MAX_OVERFLOW,
+    'pool_timeout': settings.DB_POOL_TIMEOUT,
+    'pool_recycle': settings.DB_POOL_RECYCLE,
+    'pool_pre_ping': settings.DB_POOL_PRE_PING,
+}
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    connect_args={'options': f'-c statement_timeout={settings.DB_STATEMENT_TIMEOUT}'},
+    **pool_options,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    SQLALCHEMY_ASYNC_DATABASE_URL,
+    poolclass=InstrumentedAsyncQueuePool,
+    connect_args={'server_settings': {'statement_timeout': str(settings.DB_STATEMENT_TIMEOUT)}},
+    **pool_options,
+)
+AsyncSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=async_engine,
+                                 class_=AsyncSession, expire_on_commit=False)
+
 Base = declarative_base()
 
 
+def get_pool_statistics():
+    return {
+        'sync': engine.pool.statistics(),
+        'async': async_engine.sync_engine.pool.statistics(),
+    }
+
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -18,3 +50,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Dependency for async endpoints (WebSocket)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,166 @@
+import time
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import settings
+from core.metrics import Histogram
+
+# milliseconds from admission to the start of the response
+LIMITER_LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# paths that are never limited, so health and stats stay reachable under overload
+EXEMPT_PREFIXES = ('/internal', '/docs', '/redoc', '/openapi.json')
+
+
+class AIMDLimiter:
+    """Concurrency limit that adapts to latency, additive increase multiplicative decrease.
+
+    While requests finish within the latency target and the limit is in use,
+    it grows by about one per limit's worth of requests. A slow or failed
+    request shrinks it by the backoff ratio, at most once per target
+    latency so a burst of slow responses counts as one signal.
+    """
+
+    def __init__(self, name: str, target_ms: float, initial: int, minimum: int, maximum: int,
+                 backoff: float, clock=time.monotonic):
+        self.name = name
+        self.target_ms = target_ms
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.clock = clock
+        self.limit = float(initial)
+        self.in_flight = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.decreases = 0
+        self.latency_ms = Histogram(LIMITER_LATENCY_BUCKETS)
+        self._last_decrease = 0.0
+
+    def try_acquire(self) -> bool:
+        # only called from the event loop, no lock needed
+        if self.in_flight >= int(self.limit):
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        self.accepted += 1
+        return True
+
+    def release(self, latency_ms: float, overloaded: bool):
+        in_use = self.in_flight
+        self.in_flight -= 1
+        self.latency_ms.observe(latency_ms)
+
+        now = self.clock()
+        if overloaded or latency_ms > self.target_ms:
+            if (now - self._last_decrease) * 1000 >= self.target_ms:
+                self.limit = max(self.minimum, self.limit * self.backoff)
+                self.decreases += 1
+                self._last_decrease = now
+        elif in_use * 2 >= self.limit:
+            # an idle limit is not evidence that more concurrency is safe
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def statistics(self):
+        return {
+            'limit': int(self.limit),
+            'in_flight': self.in_flight,
+            'target_ms': self.target_ms,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'decreases': self.decreases,
+            'latency_ms': self.latency_ms.snapshot(),
+        }
+
+
+class ConcurrencyLimiter:
+    """One AIMDLimiter per route class."""
+
+    def __init__(self, targets: dict[str, float], initial: int, minimum: int, maximum: int, backoff: float):
+        self.limiters = {
+            name: AIMDLimiter(name, target_ms, initial=initial, minimum=minimum, maximum=maximum, backoff=backoff)
+            for name, target_ms in targets.items()
+        }
+
+    @staticmethod
+    def route_class(method: str, path: str) -> str | None:
+        if path.startswith(EXEMPT_PREFIXES):
+            return None
+        if path in ('/login', '/register'):
+            return 'auth'
+        if path.startswith('/file'):
+            return 'file'
+        if method in ('GET', 'HEAD', 'OPTIONS'):
+            return 'reads'
+        return 'writes'
+
+    def get(self, method: str, path: str) -> AIMDLimiter | None:
+        route_class = self.route_class(method, path)
+        return self.limiters.get(route_class) if route_class else None
+
+    def statistics(self):
+        return {name: limiter.statistics() for name, limiter in self.limiters.items()}
+
+
+concurrency_limiter = ConcurrencyLimiter(
+    targets=settings.CONCURRENCY_TARGETS,
+    initial=settings.CONCURRENCY_INITIAL_LIMIT,
+    minimum=settings.CONCURRENCY_MIN_LIMIT,
+    maximum=settings.CONCURRENCY_MAX_LIMIT,
+    backoff=settings.CONCURRENCY_BACKOFF,
+)
+
+
+class ConcurrencyLimitMiddleware:
+    """Rejects HTTP requests beyond the current limit of their route class with 503.
+
+    Rejection happens before any routing or dependency runs, so an overloaded
+    database costs a rejected client one fast response instead of a slot in
+    the threadpool. The slot is released when the response starts, a streamed
+    export or a slow download does not hold it for its whole body. WebSocket
+    traffic is not limited here.
+    """
+
+    def __init__(self, app: ASGIApp, limiter: ConcurrencyLimiter = concurrency_limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        limiter = self.limiter.get(scope['method'], scope['path'])
+        if limiter is None:
+            return await self.app(scope, receive, send)
+
+        if not limiter.try_acquire():
+            response = JSONResponse(
+                {'detail': 'Server is busy, try again later.'},
+                status_code=503,
+                headers={'Retry-After': str(settings.CONCURRENCY_RETRY_AFTER)},
+            )
+            return await response(scope, receive, send)
+
+        start = time.perf_counter()
+        released = False
+
+        def release(status_code: int):
+            nonlocal released
+            if released:
+                return
+            released = True
+            # errors, pool timeouts and hashing admission rejects all point at overload
+            limiter.release((time.perf_counter() - start) * 1000, overloaded=status_code in (500, 503, 504))
+
+        async def send_wrapper(message: Message):
+            if message['type'] == 'http.response.start':
+                # time to first byte, so long downloads and streams do not read as slow
+                release(message['status'])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # only releases here when the app failed before starting a response
+            release(500)
@@ -0,0 +1,35 @@
+import bisect
+import threading
+
+
+class Histogram:
+    """Thread-safe histogram over fixed bucket upper bounds."""
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, maximum = self._sum, self._max
+        count = sum(counts)
+        buckets = {f'le_{bound:g}': n for bound, n in zip(self.bounds, counts)}
+        buckets['le_inf'] = counts[-1]
+        return {
+            'count': count,
+            'sum': total,
+            'avg': total / count if count else 0.0,
+            'max': maximum,
+            'buckets': buckets,
+        }
@@ -0,0 +1,72 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+from core.metrics import Histogram
+
+# milliseconds spent waiting for a connection to be handed out by the pool
+WAIT_TIME_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class PoolStats:
+
+    def __init__(self):
+        self.wait_time_ms = Histogram(WAIT_TIME_BUCKETS)
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self._lock = threading.Lock()
+
+    def record_checkout(self, wait_time_ms: float):
+        self.wait_time_ms.observe(wait_time_ms)
+        with self._lock:
+            self.checkouts += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.checkout_timeouts += 1
+
+
+class InstrumentedPoolMixin:
+    """Records checkout wait times and timeouts of a queue pool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_timeout()
+            raise
+        self.stats.record_checkout((time.perf_counter() - start) * 1000)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() replaces the pool, keep the counters
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def statistics(self):
+        return {
+            'size': self.size(),
+            'checked_in': self.checkedin(),
+            'checked_out': self.checkedout(),
+            'overflow': max(self.overflow(), 0),
+            'max_overflow': self._max_overflow,
+            'checkouts': self.stats.checkouts,
+            'checkout_timeouts': self.stats.checkout_timeouts,
+            'wait_time_ms': self.stats.wait_time_ms.snapshot(),
+        }
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
@@ -1,9 +1,10 @@
 import re
+from datetime import datetime, timedelta, timezone
 
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 
-from api import models
+from api import models, recurrence
 from core.config import settings
 
 
@@ -47,3 +48,81 @@ def validate_duration(duration: int):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f'Duration must be greater than 0.',
         )
+    if duration > settings.MAX_CALL_DURATION:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Duration must be at most {settings.MAX_CALL_DURATION} minutes.',
+        )
+
+
+def validate_recurrence(date: datetime, duration: int, frequency: str | None, interval: int | None,
+                        until: datetime | None):
+    if frequency is None:
+        if interval is not None or until is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f'Recurrence frequency is required.',
+            )
+        return
+
+    if frequency not in recurrence.FREQUENCIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Recurrence frequency must be one of {", ".join(recurrence.FREQUENCIES)}.',
+        )
+
+    if interval is not None and interval <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Recurrence interval must be greater than 0.',
+        )
+
+    if until is not None and recurrence.aware(until) < recurrence.aware(date):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Recurrence must not end before the call starts.',
+        )
+
+    # occurrences of one series never overlap each other
+    if timedelta(minutes=duration) > recurrence.period(frequency, interval):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Duration must not be longer than the recurrence period.',
+        )
+
+
+def validate_no_conflicting_calls(conflicting_call_ids: list[int],
+                                  message: str = 'You already have a scheduled meeting in this timeslot.'):
+    if conflicting_call_ids:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                'message': message,
+                'conflicting_call_ids': conflicting_call_ids,
+            },
+        )
+
+
+def validate_time_window(start: datetime | None, end: datetime | None) -> tuple[datetime | None, datetime | None]:
+    # naive bounds are taken as UTC like stored dates, so they compare with aware ones
+    start = recurrence.aware(start).astimezone(timezone.utc) if start is not None else None
+    end = recurrence.aware(end).astimezone(timezone.utc) if end is not None else None
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Start of the time window must be before its end.',
+        )
+    return start, end
+
+
+def validate_search_query(query: str):
+    if len(query.strip()) < settings.SEARCH_MIN_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Search query must be at least {settings.SEARCH_MIN_LENGTH} characters long.',
+        )
+    if len(query) > settings.SEARCH_MAX_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Search query must be at most {settings.SEARCH_MAX_LENGTH} characters long.',
+        )
@@ -1,23 +1,30 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
 
-from api import models, websocket
-from api.routers import authentication, call, user, contact, file
+from api import websocket
+from api.routers import authentication, call, user, contact, file, internal
+from api.websocket.connection import manager
+from core.body_limit import BodySizeLimitMiddleware, body_limits
 from core.config import settings
-from core.database import engine
+from core.limiter import ConcurrencyLimitMiddleware, concurrency_limiter
 
 
 def get_application():
-    _app = FastAPI(title=settings.PROJECT_NAME)
+    _app = FastAPI(title=settings.PROJECT_NAME, default_response_class=ORJSONResponse)
 
     # _app.add_middleware(HTTPSRedirectMiddleware)
+    _app.add_middleware(BodySizeLimitMiddleware, limits=body_limits)
+    # added before CORS so that CORS stays outermost and 503 rejects carry its headers
+    _app.add_middleware(ConcurrencyLimitMiddleware, limiter=concurrency_limiter)
     _app.add_middleware(
         CORSMiddleware,
         allow_origins=['*'],
         allow_credentials=True,
         allow_methods=['*'],
         allow_headers=['*'],
+        expose_headers=['X-Next-Cursor', 'ETag', 'Last-Modified'],
     )
 
     _app.include_router(authentication.router)
@@ -26,10 +33,12 @@ def get_application():
     _app.include_router(contact.router)
     _app.include_router(file.router)
     _app.include_router(websocket.router)
+    _app.include_router(internal.router)
 
-    return _app
+    _app.add_event_handler('startup', manager.start)
+    _app.add_event_handler('shutdown', manager.stop)
 
+    return _app
 
-models.Base.metadata.create_all(bind=engine)
 
 app = get_application()
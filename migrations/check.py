@@ -0,0 +1,44 @@
+"""
+Fail when api/models.py and the migrations have drifted apart.
+
+Upgrade a scratch database to head first, then run `python -m migrations.check`.
+Exits 1 if the database is not at head or if autogenerate would produce
+any operation, so it can gate CI.
+"""
+import sys
+
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from api import models
+from core.config import settings
+
+
+def main():
+    script = ScriptDirectory.from_config(Config('alembic.ini'))
+    engine = create_engine(settings.DATABASE_URL, poolclass=NullPool)
+
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={'compare_type': True})
+        current_heads = set(context.get_current_heads())
+        if current_heads != set(script.get_heads()):
+            print(f'Database is at {sorted(current_heads)}, migrations head is {sorted(script.get_heads())}.')
+            return 1
+        diff = compare_metadata(context, models.Base.metadata)
+
+    if diff:
+        print('Models and migrations differ, generate a migration with `alembic revision --autogenerate`:')
+        for operation in diff:
+            print(f'  {operation}')
+        return 1
+
+    print('Models and migrations are in sync.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""hot path indexes
+
+Indexes for the actual access paths: conflict checks and agenda scans
+on calls(owner_id, date), keyset pagination on calls(date, id), and the
+non-leading columns of the association table primary keys.
+Built concurrently so live tables are not locked for writes.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_calls_owner_id_date', 'calls', 'owner_id, date'),
+    ('ix_calls_date_id', 'calls', 'date, id'),
+    ('ix_calls_users_call_id', 'calls_users', 'call_id'),
+    ('ix_users_contacts_contact_id', 'users_contacts', 'contact_id'),
+)
+
+
+def upgrade():
+    # IF NOT EXISTS covers databases where create_all already built some of them
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})')
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _, _ in INDEXES:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
@@ -0,0 +1,47 @@
+"""recurring calls
+
+Recurrence rule columns on calls, the sparse call_exceptions table for
+occurrences that were cancelled or resized, and a partial index over
+the start date of recurring calls only.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('calls', sa.Column('recurrence_frequency', sa.String(), nullable=True))
+    op.add_column('calls', sa.Column('recurrence_interval', sa.Integer(), nullable=True))
+    op.add_column('calls', sa.Column('recurrence_until', sa.DateTime(timezone=True), nullable=True))
+
+    op.create_table(
+        'call_exceptions',
+        sa.Column('call_id', sa.Integer(), nullable=False),
+        sa.Column('occurrence', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('cancelled', sa.Boolean(), nullable=False),
+        sa.Column('duration', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['call_id'], ['calls.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('call_id', 'occurrence'),
+    )
+
+    # every existing row is a single call, the partial index starts out empty
+    op.create_index('ix_calls_recurring_date', 'calls', ['date'], unique=False,
+                    postgresql_where=sa.text('recurrence_frequency IS NOT NULL'))
+
+
+def downgrade():
+    op.drop_index('ix_calls_recurring_date', table_name='calls')
+    op.drop_table('call_exceptions')
+    op.drop_column('calls', 'recurrence_until')
+    op.drop_column('calls', 'recurrence_interval')
+    op.drop_column('calls', 'recurrence_frequency')
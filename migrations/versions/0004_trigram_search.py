@@ -0,0 +1,37 @@
+"""trigram search
+
+pg_trgm GIN indexes over users.email and calls.title, serving the
+substring and prefix ILIKE queries of /users/search and /calls/search.
+Built concurrently so live tables are not locked for writes.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_users_email_trgm', 'users', 'email'),
+    ('ix_calls_title_trgm', 'calls', 'title'),
+)
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.get_context().autocommit_block():
+        for name, table, column in INDEXES:
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)')
+
+
+def downgrade():
+    # the extension stays, other objects may depend on it
+    with op.get_context().autocommit_block():
+        for name, _, _ in INDEXES:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
@@ -0,0 +1,47 @@
+"""call duration check
+
+Conflict, agenda and availability queries only look back
+MAX_CALL_DURATION (1440 minutes) from the start of a window, so a longer
+call would be silently missed. The API already rejects such durations,
+this makes the database enforce the bound too.
+
+Rows written before that are not changed here. The upgrade stops and
+lists them instead, shorten or split them and run it again.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+MAX_CALL_DURATION = 1440  # minutes, keep in sync with settings.MAX_CALL_DURATION
+
+
+def upgrade():
+    connection = op.get_bind()
+    invalid = connection.execute(sa.text(
+        'SELECT id FROM calls WHERE duration IS NULL OR duration <= 0 OR duration > :max ORDER BY id'
+    ), {'max': MAX_CALL_DURATION}).scalars().all()
+    if invalid:
+        raise RuntimeError(
+            f'{len(invalid)} calls have a duration outside 1..{MAX_CALL_DURATION} minutes '
+            f'(ids: {", ".join(map(str, invalid[:50]))}{", ..." if len(invalid) > 50 else ""}). '
+            f'Shorten or split them, then run the migration again.'
+        )
+
+    op.create_check_constraint('ck_calls_duration', 'calls', f'duration > 0 AND duration <= {MAX_CALL_DURATION}')
+    op.create_check_constraint('ck_call_exceptions_duration', 'call_exceptions',
+                               f'duration IS NULL OR (duration > 0 AND duration <= {MAX_CALL_DURATION})')
+
+
+def downgrade():
+    op.drop_constraint('ck_call_exceptions_duration', 'call_exceptions', type_='check')
+    op.drop_constraint('ck_calls_duration', 'calls', type_='check')
@@ -0,0 +1,29 @@
+"""user version
+
+A counter moved by every write that changes the user detail response
+(the user, their calls and the participants of those calls). Its ETag
+becomes a primary key lookup instead of an aggregate over the whole call
+history.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a constant server default, so existing rows are filled without a table rewrite
+    op.add_column('users', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    op.drop_column('users', 'version')
@@ -0,0 +1,36 @@
+"""search prefix indexes
+
+lower(column) COLLATE "C" indexes over users.email and calls.title. A
+search reads its prefix candidates from them in order and stops at the
+limit, instead of rechecking every trigram match. Built concurrently so
+live tables are not locked for writes.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-20 14:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_users_email_prefix', 'users', 'email'),
+    ('ix_calls_title_prefix', 'calls', 'title'),
+)
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, column in INDEXES:
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ((lower({column}) COLLATE "C"))')
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _, _ in INDEXES:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
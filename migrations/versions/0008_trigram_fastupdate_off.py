@@ -0,0 +1,32 @@
+"""trigram indexes without a pending list
+
+Turns fastupdate off on the pg_trgm GIN indexes over users.email and
+calls.title. New entries then go straight into the index instead of a
+pending list that every search scans until vacuum merges it. Entries
+already pending are merged here, setting the option alone keeps them.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-21 14:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+INDEXES = ('ix_users_email_trgm', 'ix_calls_title_trgm')
+
+
+def upgrade():
+    for name in INDEXES:
+        op.execute(f'ALTER INDEX {name} SET (fastupdate = off)')
+        op.execute(f"SELECT gin_clean_pending_list('{name}')")
+
+
+def downgrade():
+    for name in INDEXES:
+        op.execute(f'ALTER INDEX {name} RESET (fastupdate)')
@@ -0,0 +1,134 @@
+"""Vectorised free slot search against a plain loop over datetime intervals,
+and the whole availability request for 50 participants with dense calendars.
+"""
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from tests.conftest import at
+
+pytest.importorskip('numpy')
+pytest.importorskip('sqlalchemy')
+
+import numpy as np  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+from api import availability, crud, schemas  # noqa: E402
+
+pytestmark = pytest.mark.benchmark
+
+INTERVALS = 100_000
+ROUNDS = 5
+PARTICIPANTS = 50
+HISTORY_DAYS = 180  # calls on either side of the searched window
+REQUEST_ROUNDS = 50
+REQUEST_BUDGET_MS = 20
+WINDOW_START = datetime(2099, 1, 1, tzinfo=timezone.utc)
+WINDOW_END = WINDOW_START + timedelta(days=365)
+DURATION = timedelta(minutes=30)
+
+
+def busy_intervals():
+    random.seed(0)
+    window = int((WINDOW_END - WINDOW_START).total_seconds())
+    return [(WINDOW_START + timedelta(seconds=offset), timedelta(minutes=random.choice((15, 30, 60, 120))))
+            for offset in (random.randrange(window) for _ in range(INTERVALS))]
+
+
+def loop_slots(rows):
+    """The straightforward version: sort, then walk the intervals keeping the furthest end."""
+    slots = []
+    free_from = WINDOW_START
+    for start, duration in sorted(rows):
+        if start - free_from >= DURATION:
+            slots.append((free_from, start))
+        free_from = max(free_from, start + duration)
+    if WINDOW_END - free_from >= DURATION:
+        slots.append((free_from, WINDOW_END))
+    return slots
+
+
+def vectorised_slots(rows):
+    busy = np.array([(availability.to_epoch(start), duration.total_seconds()) for start, duration in rows])
+    starts = busy[:, 0]
+    slots = availability.free_slots(starts=starts, ends=starts + busy[:, 1],
+                                    window_start=availability.to_epoch(WINDOW_START),
+                                    window_end=availability.to_epoch(WINDOW_END),
+                                    duration=DURATION.total_seconds())
+    return [(availability.from_epoch(start), availability.from_epoch(end)) for start, end in slots]
+
+
+def vectorised_from_epochs(busy):
+    # what get_availability does, the database already returns epoch seconds
+    starts = busy[:, 0]
+    return availability.free_slots(starts=starts, ends=starts + busy[:, 1],
+                                   window_start=availability.to_epoch(WINDOW_START),
+                                   window_end=availability.to_epoch(WINDOW_END),
+                                   duration=DURATION.total_seconds())
+
+
+def median_ms(function, argument) -> float:
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        function(argument)
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[ROUNDS // 2]
+
+
+def test_vectorised_free_slots_against_a_loop():
+    rows = busy_intervals()
+    busy = np.array([(availability.to_epoch(start), duration.total_seconds()) for start, duration in rows])
+    assert vectorised_slots(rows) == loop_slots(rows)
+
+    loop_ms = median_ms(loop_slots, rows)
+    vectorised_ms = median_ms(vectorised_from_epochs, busy)
+    print(f'\n{INTERVALS} busy intervals: loop {loop_ms:.1f} ms, vectorised {vectorised_ms:.1f} ms '
+          f'({loop_ms / vectorised_ms:.1f}x)')
+
+    assert vectorised_ms < loop_ms
+
+
+def seed_dense_calendars(db, make_user, make_call) -> list[int]:
+    # five calls every day for a year per participant, staggered by a quarter
+    # hour per user so the merged calendar is busy through the working day
+    users = [make_user() for _ in range(PARTICIPANTS)]
+    user_ids = [user.id for user in users]
+    db.execute(text(
+        "INSERT INTO calls (title, date, duration, owner_id) "
+        "SELECT 'call', :start + make_interval(days => day, hours => 8 + 2 * slot, mins => 15 * (u.n::int % 4)), "
+        "30 + 30 * ((day + :days + slot + u.n::int) % 3), u.id "
+        "FROM unnest(CAST(:user_ids AS integer[])) WITH ORDINALITY AS u(id, n), "
+        "generate_series(-:days, :days) AS day, generate_series(0, 4) AS slot"
+    ), {'start': at(1, 0), 'user_ids': user_ids, 'days': HISTORY_DAYS})
+    db.execute(text(
+        'INSERT INTO calls_users (user_id, call_id) SELECT owner_id, id FROM calls WHERE owner_id = ANY(:user_ids)'
+    ), {'user_ids': user_ids})
+    db.commit()
+    # and a weekly series each, shared with the next participant
+    for user, member in zip(users, users[1:] + users[:1]):
+        make_call(user, at(1, 7) - timedelta(days=HISTORY_DAYS), duration=45, members=[member],
+                  recurrence_frequency='weekly', recurrence_interval=1)
+    db.execute(text('ANALYZE calls; ANALYZE calls_users'))
+    return user_ids
+
+
+def test_availability_request_for_dense_calendars(db, make_user, make_call):
+    user_ids = seed_dense_calendars(db, make_user, make_call)
+    request = schemas.AvailabilityRequest(user_ids=user_ids, duration=30, **{'from': at(1, 0), 'to': at(15, 0)})
+
+    assert crud.get_availability(db=db, request=request)
+    timings = []
+    for _ in range(REQUEST_ROUNDS):
+        start = time.perf_counter()
+        crud.get_availability(db=db, request=request)
+        timings.append((time.perf_counter() - start) * 1000)
+        db.expunge_all()
+    timings.sort()
+    median_ms, p99_ms = timings[len(timings) // 2], timings[int(len(timings) * 0.99)]
+    print(f'\n{PARTICIPANTS} participants, {PARTICIPANTS * 5 * (2 * HISTORY_DAYS + 1)} calls: '
+          f'get_availability median {median_ms:.1f} ms, p99 {p99_ms:.1f} ms')
+
+    assert median_ms < REQUEST_BUDGET_MS
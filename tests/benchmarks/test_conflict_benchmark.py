@@ -0,0 +1,50 @@
+"""Conflict check latency must not grow with the length of a user's call history."""
+import time
+from datetime import timedelta
+
+import pytest
+
+from tests.conftest import at
+
+pytest.importorskip('sqlalchemy')
+
+from sqlalchemy import insert, text  # noqa: E402
+
+from api import crud, models, recurrence  # noqa: E402
+
+pytestmark = pytest.mark.benchmark
+
+ROUNDS = 200
+
+
+def seed_history(db, user, calls: int):
+    # one call every 2 hours going back from the checked slot
+    rows = [{'title': f'call {n}', 'date': at(1, 0) - timedelta(hours=2 * (n + 1)), 'duration': 60,
+             'owner_id': user.id} for n in range(calls)]
+    call_ids = db.execute(insert(models.Call).values(rows).returning(models.Call.id)).scalars().all()
+    db.execute(insert(models.calls_users), [{'user_id': user.id, 'call_id': call_id} for call_id in call_ids])
+    db.commit()
+    db.execute(text('ANALYZE calls; ANALYZE calls_users'))
+
+
+def median_check_ms(db, user) -> float:
+    intervals = recurrence.planned_intervals(at(1, 10), 60)
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        crud.get_conflicting_call_ids(db=db, user_id=user.id, intervals=intervals)
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def test_conflict_check_is_flat_in_history_length(db, make_user):
+    small, large = make_user(), make_user()
+    seed_history(db, small, 100)
+    seed_history(db, large, 10_000)
+
+    small_ms = median_check_ms(db, small)
+    large_ms = median_check_ms(db, large)
+    print(f'\nconflict check median: 100 calls {small_ms:.3f} ms, 10k calls {large_ms:.3f} ms')
+
+    # the old loop over owned_calls was linear, 100x the history took ~100x as long
+    assert large_ms < small_ms * 3
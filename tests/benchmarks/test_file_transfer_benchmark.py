@@ -0,0 +1,84 @@
+"""Binary chunked profile image download against the base64 JSON path.
+
+Peak memory is the tracemalloc peak of Python allocations during one
+transfer, the process RSS high-water mark can not be reset between runs.
+"""
+import asyncio
+import base64
+import os
+import time
+import tracemalloc
+
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('dotenv')
+pytest.importorskip('psycopg2')
+pytest.importorskip('asyncpg')
+
+from api.websocket.connection import Connection, manager  # noqa: E402
+from api.websocket.handlers import file_handler  # noqa: E402
+from core.concurrency import run_blocking  # noqa: E402
+
+pytestmark = pytest.mark.benchmark
+
+IMAGE_SIZE = 8 * 1024 * 1024
+ROUNDS = 5
+
+
+class CountingWebSocket:
+    def __init__(self):
+        self.sent = 0
+
+    async def send_text(self, data: str):
+        self.sent += len(data)
+
+    async def send_bytes(self, data: bytes):
+        self.sent += len(data)
+
+
+async def base64_download(image, connection: Connection):
+    # the previous download path, one JSON frame with the whole image
+    data = await run_blocking(file_handler._read_file, image)
+    await manager.push_json({'image': base64.b64encode(data).decode('utf-8')}, connection)
+
+
+async def binary_download(image, connection: Connection):
+    await file_handler.stream_file(image, offset=0, connection=connection)
+
+
+def measure(download, image) -> tuple[float, int, int]:
+    async def run():
+        websocket = CountingWebSocket()
+        connection = Connection(websocket, user_id=None, queue_size=64)
+        connection.writer = asyncio.create_task(connection.write())
+        await download(image, connection)
+        while not connection.queue.empty():
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        connection.writer.cancel()
+        return websocket.sent
+
+    timings, peaks = [], []
+    for _ in range(ROUNDS):
+        tracemalloc.start()
+        start = time.perf_counter()
+        sent = asyncio.run(run())
+        timings.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return sorted(timings)[ROUNDS // 2], max(peaks), sent
+
+
+def test_binary_download_against_base64(tmp_path):
+    image = tmp_path / 'image.jpg'
+    image.write_bytes(os.urandom(IMAGE_SIZE))
+
+    base64_s, base64_peak, base64_sent = measure(base64_download, image)
+    binary_s, binary_peak, binary_sent = measure(binary_download, image)
+    print(f'\nbase64: {base64_s * 1000:.1f} ms, peak {base64_peak / 2**20:.1f} MiB, {base64_sent / 2**20:.1f} MiB sent'
+          f'\nbinary: {binary_s * 1000:.1f} ms, peak {binary_peak / 2**20:.1f} MiB, {binary_sent / 2**20:.1f} MiB sent')
+
+    assert binary_sent < base64_sent
+    # a bounded queue of chunks, not copies of the whole image
+    assert binary_peak < IMAGE_SIZE < base64_peak
@@ -0,0 +1,69 @@
+"""Fan-out throughput of the Postgres pub/sub backend with 1, 4 and 8 workers.
+
+Each worker is simulated by its own PostgresBackend, with its own LISTEN
+and publish connections, all in one event loop. Every message is
+published by one worker and has to reach all of them.
+"""
+import asyncio
+import os
+import time
+
+import pytest
+
+pytest.importorskip('asyncpg')
+pytest.importorskip('dotenv')
+pytest.importorskip('fastapi')
+
+from api.websocket import pubsub  # noqa: E402
+
+pytestmark = [
+    pytest.mark.benchmark,
+    pytest.mark.skipif(not os.getenv('TEST_POSTGRES_DB'), reason='TEST_POSTGRES_DB is not set'),
+]
+
+MESSAGES = 20_000
+TIMEOUT = 60  # seconds
+
+
+async def measure(workers: int) -> tuple[float, dict]:
+    from core.config import settings
+
+    received = [0] * workers
+    done = asyncio.Event()
+
+    def receiver(index: int):
+        def on_messages(messages: list[dict]):
+            received[index] += len(messages)
+            if all(count >= MESSAGES for count in received):
+                done.set()
+        return on_messages
+
+    backends = [pubsub.PostgresBackend(dsn=settings.DATABASE_URL, channel='ws_benchmark',
+                                       batch_size=settings.WS_PUBSUB_BATCH_SIZE,
+                                       batch_interval=settings.WS_PUBSUB_BATCH_INTERVAL)
+                for _ in range(workers)]
+    for index, backend in enumerate(backends):
+        await backend.start(receiver(index))
+
+    start = time.perf_counter()
+    for n in range(MESSAGES):
+        backends[n % workers].publish({'user_id': n, 'data': {'type': 'benchmark', 'n': n}, 'sent_at': time.time()})
+        if n % 1000 == 0:
+            await asyncio.sleep(0)
+    await asyncio.wait_for(done.wait(), timeout=TIMEOUT)
+    elapsed = time.perf_counter() - start
+
+    for backend in backends:
+        await backend.stop()
+    return elapsed, backends[0].stats.snapshot()
+
+
+@pytest.mark.parametrize('workers', [1, 4, 8])
+def test_pubsub_fan_out(workers):
+    elapsed, stats = asyncio.run(measure(workers))
+    latency = stats['delivery_latency_ms']
+    print(f'\n{workers} worker(s): {MESSAGES / elapsed:,.0f} messages/s published, '
+          f'{MESSAGES * workers / elapsed:,.0f} deliveries/s, '
+          f'latency avg {latency["avg"]:.1f} ms, max {latency["max"]:.1f} ms')
+
+    assert stats['rejected'] == stats['failed'] == 0
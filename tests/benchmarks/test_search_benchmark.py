@@ -0,0 +1,99 @@
+"""Bounded candidate ranking against ranking every match, over 1M users,
+and the p99 latency of the bounded search against its budget.
+
+Needs pg_trgm, the GIN indexes on users.email come from the models.
+"""
+import time
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+
+from sqlalchemy import func, select, text  # noqa: E402
+
+from api import crud, models, trigrams  # noqa: E402
+from core.config import settings  # noqa: E402
+
+pytestmark = pytest.mark.benchmark
+
+USERS = 1_000_000
+ROUNDS = 3
+LATENCY_ROUNDS = 200
+LATENCY_BUDGET_MS = 10
+QUERIES = (
+    'example',  # every user matches
+    'user1',  # one user in nine matches
+    'user123456@',  # one user matches
+    '123456',  # one user matches, no prefix match
+    'user999999@example.com',  # the whole email of one user
+)
+
+
+def seed_users(db):
+    # the trigram index has fastupdate off, built after the load like a bulk import would
+    trigram_index = next(index for index in models.User.__table__.indexes if index.name == 'ix_users_email_trgm')
+    trigram_index.drop(db.connection())
+    db.execute(text(
+        "INSERT INTO users (email, password_hash, password_salt, profile_picture) "
+        "SELECT 'user' || n || '@example.com', '', '', :picture FROM generate_series(1, :users) AS n"
+    ), {'picture': settings.DEFAULT_PROFILE_PICTURE, 'users': USERS})
+    trigram_index.create(db.connection())
+    db.commit()
+    db.execute(text('ANALYZE users'))
+
+
+def rank_every_match(db, query: str, limit: int = 10):
+    """The search before candidates were bounded, similarity ran on every match."""
+    contains, prefix = crud.search_patterns(query)
+    statement = select(models.User) \
+        .where(models.User.email.ilike(contains, escape='\\')) \
+        .order_by(models.User.email.ilike(prefix, escape='\\').desc(),
+                  func.similarity(models.User.email, query).desc(),
+                  models.User.id) \
+        .limit(limit)
+    return db.execute(statement).scalars().all()
+
+
+def median_ms(search, db, query: str) -> float:
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        search(db=db, query=query)
+        timings.append((time.perf_counter() - start) * 1000)
+        db.expunge_all()
+    return sorted(timings)[ROUNDS // 2]
+
+
+def p99_ms(db, query: str) -> float:
+    timings = []
+    for _ in range(LATENCY_ROUNDS):
+        start = time.perf_counter()
+        crud.search_users(db=db, query=query)
+        timings.append((time.perf_counter() - start) * 1000)
+        db.expunge_all()
+    return sorted(timings)[int(LATENCY_ROUNDS * 0.99)]
+
+
+def test_bounded_search_against_ranking_every_match(db):
+    seed_users(db)
+
+    timings = {}
+    for query in QUERIES:
+        timings[query] = median_ms(rank_every_match, db, query), median_ms(crud.search_users, db, query)
+        print(f'\n{query!r}: every match {timings[query][0]:.1f} ms, bounded {timings[query][1]:.1f} ms')
+
+    # a query matching everyone no longer scores a million rows
+    every_match_ms, bounded_ms = timings['example']
+    assert bounded_ms * 5 < every_match_ms
+
+
+def test_search_latency_stays_within_budget(db):
+    seed_users(db)
+    trigrams.frequent_trigrams.clear()
+    crud.search_users(db=db, query=QUERIES[0])
+
+    timings = {query: p99_ms(db, query) for query in QUERIES}
+    for query, p99 in timings.items():
+        print(f'\n{query!r}: p99 {p99:.1f} ms over {LATENCY_ROUNDS} rounds')
+
+    assert max(timings.values()) < LATENCY_BUDGET_MS
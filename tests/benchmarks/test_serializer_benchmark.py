@@ -0,0 +1,77 @@
+"""Compiled serializers against the response_model path they replaced.
+
+The old path is what FastAPI did for a route returning ORM objects:
+validate them into the response model, run jsonable_encoder and encode
+with the json module. Rows are plain objects, so only serialization is
+measured, not the database.
+"""
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('orjson')
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from api import schemas, serializer  # noqa: E402
+
+pytestmark = pytest.mark.benchmark
+
+USERS = 100
+CALLS_PER_USER = 20
+MEMBERS_PER_CALL = 5
+ROUNDS = 20
+
+
+def user_rows():
+    start = datetime(2099, 1, 1, tzinfo=timezone.utc)
+    members = [SimpleNamespace(id=n, email=f'member{n}@example.com') for n in range(MEMBERS_PER_CALL)]
+    return [
+        SimpleNamespace(
+            id=user_id, email=f'user{user_id}@example.com', profile_picture='images/default.jpg',
+            created_at=start,
+            calls=[SimpleNamespace(id=user_id * CALLS_PER_USER + n, title=f'call {n}', owner_id=user_id,
+                                   date=start + timedelta(hours=n), duration=30, recurrence_frequency=None,
+                                   recurrence_interval=None, recurrence_until=None, users=members)
+                   for n in range(CALLS_PER_USER)],
+        )
+        for user_id in range(USERS)
+    ]
+
+
+def old_path(users) -> bytes:
+    field = create_response_field(name='response', type_=list[schemas.User])
+    content = asyncio.run(serialize_response(field=field, response_content=users, is_coroutine=True))
+    return JSONResponse(content).body
+
+
+def new_path(users) -> bytes:
+    return serializer.json_response(serializer.serialize_user_details(users)).body
+
+
+def median_ms(path, users) -> float:
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        path(users)
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[ROUNDS // 2]
+
+
+def test_compiled_serializer_against_response_model():
+    users = user_rows()
+    assert json.loads(old_path(users)) == json.loads(new_path(users))
+
+    old_ms = median_ms(old_path, users)
+    new_ms = median_ms(new_path, users)
+    print(f'\n{USERS} users x {CALLS_PER_USER} calls x {MEMBERS_PER_CALL} members: '
+          f'response_model {old_ms:.2f} ms, compiled {new_ms:.2f} ms ({old_ms / new_ms:.1f}x)')
+
+    assert new_ms * 3 < old_ms
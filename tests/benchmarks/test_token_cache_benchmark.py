@@ -0,0 +1,38 @@
+"""Verifying a cached token must be much cheaper than decoding it."""
+import time
+
+import pytest
+
+pytest.importorskip('jose')
+pytest.importorskip('pydantic')
+pytest.importorskip('dotenv')
+
+from api import JWT  # noqa: E402
+
+pytestmark = pytest.mark.benchmark
+
+ROUNDS = 20_000
+
+
+class CredentialsError(Exception):
+    pass
+
+
+def median_verify_us(monkeypatch, cache_size: int) -> float:
+    monkeypatch.setattr(JWT, 'token_cache', JWT.TokenCache(max_size=cache_size))
+    token = JWT.create_access_token(data={'user_id': 1})
+    credentials_exception = CredentialsError()
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        JWT.verify_token(token, credentials_exception)
+        timings.append((time.perf_counter() - start) * 1_000_000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def test_cached_verify_is_faster_than_decoding(monkeypatch):
+    uncached_us = median_verify_us(monkeypatch, cache_size=0)
+    cached_us = median_verify_us(monkeypatch, cache_size=10_000)
+    print(f'\nverify_token median: uncached {uncached_us:.2f} us, cached {cached_us:.2f} us')
+
+    assert cached_us * 3 < uncached_us
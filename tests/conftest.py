@@ -0,0 +1,105 @@
+"""
+Database tests run against a scratch Postgres database named by
+TEST_POSTGRES_DB (the other POSTGRES_* settings are shared with the app).
+Its tables are dropped and recreated, so never point it at real data.
+Without it those tests are skipped, pure unit tests still run.
+"""
+import itertools
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+if os.getenv('TEST_POSTGRES_DB'):
+    os.environ['POSTGRES_DB'] = os.environ['TEST_POSTGRES_DB']
+
+TABLES = ('call_exceptions', 'calls_users', 'users_contacts', 'calls', 'users')
+
+
+def at(day: int, hour: int, minute: int = 0) -> datetime:
+    """A fixed, timezone-aware date in the future, so recurring calls are still running."""
+    return datetime(2099, 1, day, hour, minute, tzinfo=timezone.utc)
+
+
+@pytest.fixture(scope='session')
+def database():
+    if not os.getenv('TEST_POSTGRES_DB'):
+        pytest.skip('TEST_POSTGRES_DB is not set')
+    pytest.importorskip('psycopg2')
+
+    from sqlalchemy import text
+
+    from api import models
+    from core.database import engine
+
+    with engine.begin() as connection:
+        connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(database):
+    from sqlalchemy import text
+
+    from api import trigrams
+    from core.database import SessionLocal
+
+    session = SessionLocal()
+    yield session
+    session.close()
+    trigrams.frequent_trigrams.clear()
+    with database.begin() as connection:
+        connection.execute(text(f'TRUNCATE {", ".join(TABLES)} RESTART IDENTITY CASCADE'))
+
+
+@pytest.fixture
+def make_user(db):
+    from api import models
+    from core.config import settings
+
+    numbers = itertools.count(1)
+
+    def make_user(email: str | None = None):
+        # hashes are irrelevant here, going through bcrypt would only slow tests down
+        user = models.User(email=email or f'user{next(numbers)}@example.com', password_hash='', password_salt='',
+                           profile_picture=settings.DEFAULT_PROFILE_PICTURE)
+        db.add(user)
+        db.commit()
+        return user
+
+    return make_user
+
+
+@pytest.fixture
+def make_call(db):
+    from api import models
+
+    def make_call(owner, date: datetime, duration: int = 60, members=(), title: str = 'call', **recurrence):
+        call = models.Call(title=title, date=date, duration=duration, owner_id=owner.id, **recurrence)
+        call.users = [owner, *members]
+        db.add(call)
+        db.commit()
+        return call
+
+    return make_call
+
+
+@pytest.fixture
+def client(database):
+    """HTTP client authenticated as whatever user the test assigns to client.user_id."""
+    from fastapi.testclient import TestClient
+
+    from api import OAuth2, schemas
+    from core.database import async_engine
+    from main import app
+
+    with TestClient(app) as test_client:
+        test_client.user_id = None
+        app.dependency_overrides[OAuth2.get_current_user] = lambda: schemas.TokenData(user_id=test_client.user_id)
+        yield test_client
+        # pooled asyncpg connections belong to this client's event loop, the next test runs another
+        test_client.portal.call(async_engine.dispose)
+    app.dependency_overrides.clear()
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from tests.conftest import at
+
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('fastapi')
+
+from fastapi import HTTPException  # noqa: E402
+
+from api import models  # noqa: E402
+from core import validator  # noqa: E402
+from core.config import settings  # noqa: E402
+
+
+def test_naive_and_aware_bounds_are_compared_in_utc():
+    plus_two = timezone(timedelta(hours=2))
+
+    start, end = validator.validate_time_window(start=datetime(2099, 1, 1, 10), end=at(1, 12).astimezone(plus_two))
+
+    assert (start, end) == (at(1, 10), at(1, 12))
+    assert end.tzinfo == timezone.utc
+    with pytest.raises(HTTPException) as error:
+        validator.validate_time_window(start=datetime(2099, 1, 1, 12), end=at(1, 10))
+    assert error.value.status_code == 400
+
+
+def test_agenda_accepts_a_naive_and_an_aware_bound(client, make_user, make_call):
+    user = make_user()
+    inside = make_call(user, at(1, 10))
+    make_call(user, at(2, 10))
+    client.user_id = user.id
+
+    response = client.get('/users/calls', params={'from': '2099-01-01T09:00:00', 'to': '2099-01-01T12:00:00+00:00'})
+
+    assert response.status_code == 200, response.text
+    assert [call['id'] for call in response.json()] == [inside.id]
+
+
+def test_agenda_without_a_window_starts_now_and_is_capped(client, db, make_user, make_call):
+    user = make_user()
+    make_call(user, datetime.now(timezone.utc) - timedelta(days=1))
+    calls = [models.Call(title='call', date=at(1, 0) + timedelta(hours=hour), duration=30, owner_id=user.id,
+                         users=[user])
+             for hour in range(settings.AGENDA_DEFAULT_LIMIT + 1)]
+    db.add_all(calls)
+    db.commit()
+    client.user_id = user.id
+
+    response = client.get('/users/calls')
+
+    assert response.status_code == 200, response.text
+    assert [call['id'] for call in response.json()] == [call.id for call in calls[:settings.AGENDA_DEFAULT_LIMIT]]
+
+
+def test_agenda_rejects_a_limit_over_the_maximum(client, make_user):
+    client.user_id = make_user().id
+
+    response = client.get('/users/calls', params={'limit': settings.AGENDA_MAX_LIMIT + 1})
+
+    assert response.status_code == 422
@@ -0,0 +1,26 @@
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('passlib')
+
+
+def test_register_then_login(client, db):
+    response = client.post('/register', json={'email': 'new@example.com', 'password': 'correct horse'})
+
+    assert response.status_code == 201, response.text
+    assert response.json()['calls'] == []
+
+    response = client.post('/login', data={'username': 'new@example.com', 'password': 'correct horse'})
+    assert response.status_code == 202, response.text
+    assert response.json()['token_type'] == 'bearer'
+
+    response = client.post('/login', data={'username': 'new@example.com', 'password': 'wrong horse'})
+    assert response.status_code == 401
+
+
+def test_register_rejects_a_taken_email(client, make_user):
+    make_user(email='taken@example.com')
+
+    response = client.post('/register', json={'email': 'taken@example.com', 'password': 'correct horse'})
+
+    assert response.status_code == 400
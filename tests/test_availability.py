@@ -0,0 +1,73 @@
+import pytest
+
+from tests.conftest import at
+
+pytest.importorskip('numpy')
+
+import numpy as np  # noqa: E402
+
+from api import availability  # noqa: E402
+
+
+def test_overlapping_and_nested_busy_intervals_are_merged():
+    starts = np.array([50.0, 0.0, 10.0, 60.0])
+    ends = np.array([70.0, 30.0, 20.0, 65.0])
+
+    merged_starts, merged_ends = availability.merge_busy(starts, ends)
+
+    assert merged_starts.tolist() == [0.0, 50.0]
+    assert merged_ends.tolist() == [30.0, 70.0]
+
+
+def test_only_gaps_long_enough_are_free():
+    slots = availability.free_slots(starts=[10.0, 45.0], ends=[40.0, 90.0], window_start=0.0, window_end=100.0,
+                                    duration=10.0)
+
+    assert slots == [(0.0, 10.0), (90.0, 100.0)]
+
+
+def test_busy_intervals_are_clipped_to_the_window():
+    slots = availability.free_slots(starts=[-50.0], ends=[20.0], window_start=0.0, window_end=100.0,
+                                    duration=10.0, limit=1)
+
+    assert slots == [(20.0, 100.0)]
+
+
+def test_mixed_naive_and_aware_window(client, make_user, make_call):
+    user = make_user()
+    make_call(user, at(1, 10), duration=60)
+    client.user_id = user.id
+
+    response = client.post('/calls/availability', json={
+        'user_ids': [user.id], 'from': '2099-01-01T09:00:00', 'to': '2099-01-01T12:00:00+00:00', 'duration': 30,
+    })
+
+    assert response.status_code == 200, response.text
+    assert response.json() == [
+        {'start': '2099-01-01T09:00:00+00:00', 'end': '2099-01-01T10:00:00+00:00'},
+        {'start': '2099-01-01T11:00:00+00:00', 'end': '2099-01-01T12:00:00+00:00'},
+    ]
+
+
+def test_members_series_and_cancelled_occurrences_count(client, db, make_user, make_call):
+    from api import models
+
+    owner, member, outsider = make_user(), make_user(), make_user()
+    make_call(owner, at(1, 9), duration=60, members=[member])
+    series = make_call(member, at(1, 11), duration=30, recurrence_frequency='daily', recurrence_interval=1)
+    db.add(models.CallException(call_id=series.id, occurrence=at(2, 11), cancelled=True))
+    db.commit()
+    make_call(outsider, at(1, 13), duration=60)
+    client.user_id = owner.id
+
+    response = client.post('/calls/availability', json={
+        'user_ids': [owner.id, member.id], 'from': '2099-01-01T08:00:00Z', 'to': '2099-01-02T12:00:00Z',
+        'duration': 60,
+    })
+
+    assert response.status_code == 200, response.text
+    assert response.json() == [
+        {'start': '2099-01-01T08:00:00+00:00', 'end': '2099-01-01T09:00:00+00:00'},
+        {'start': '2099-01-01T10:00:00+00:00', 'end': '2099-01-01T11:00:00+00:00'},
+        {'start': '2099-01-01T11:30:00+00:00', 'end': '2099-01-02T12:00:00+00:00'},
+    ]
@@ -0,0 +1,84 @@
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('requests')
+pytest.importorskip('dotenv')
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+from starlette.testclient import TestClient  # noqa: E402
+
+from core.body_limit import BodySizeLimitMiddleware  # noqa: E402
+
+LIMIT = 10_000
+CHUNK = 1_000
+
+
+def chunks(total: int):
+    # a generator body is sent chunked, without Content-Length
+    for _ in range(total // CHUNK):
+        yield b'x' * CHUNK
+
+
+@pytest.fixture
+def received():
+    return []
+
+
+@pytest.fixture
+def limited_client(received):
+    async def upload(request: Request):
+        async for chunk in request.stream():
+            received.append(len(chunk))
+        return JSONResponse({'received': sum(received)})
+
+    app = Starlette(routes=[Route('/upload', upload, methods=['PUT']), Route('/other', upload, methods=['PUT'])])
+    return TestClient(BodySizeLimitMiddleware(app, limits={'/upload': LIMIT}))
+
+
+def test_body_within_the_limit_passes(limited_client):
+    response = limited_client.put('/upload', data=chunks(LIMIT))
+
+    assert response.status_code == 200
+    assert response.json() == {'received': LIMIT}
+
+
+def test_oversized_chunked_body_is_cut_off_while_receiving(limited_client, received):
+    response = limited_client.put('/upload', data=chunks(100 * LIMIT))
+
+    assert response.status_code == 413
+    # the app stopped getting data right at the limit
+    assert sum(received) <= LIMIT
+
+
+def test_oversized_content_length_is_rejected_before_reading(limited_client, received):
+    response = limited_client.put('/upload', data=b'x' * (LIMIT + 1))
+
+    assert response.status_code == 413
+    assert received == []
+
+
+def test_paths_without_a_limit_pass_through(limited_client):
+    response = limited_client.put('/other', data=chunks(2 * LIMIT))
+
+    assert response.status_code == 200
+
+
+def test_oversized_chunked_upload_is_rejected(client, make_user):
+    from core.config import settings
+
+    client.user_id = make_user().id
+
+    def multipart():
+        yield b'--boundary\r\nContent-Disposition: form-data; name="image"; filename="a.jpg"\r\n' \
+              b'Content-Type: image/jpeg\r\n\r\n'
+        for _ in range(2 * settings.MAX_IMAGE_SIZE // settings.IMAGE_CHUNK_SIZE):
+            yield b'x' * settings.IMAGE_CHUNK_SIZE
+        yield b'\r\n--boundary--\r\n'
+
+    response = client.put('/file/upload', data=multipart(),
+                          headers={'Content-Type': 'multipart/form-data; boundary=boundary'})
+
+    assert response.status_code == 413
@@ -0,0 +1,85 @@
+import pytest
+
+from tests.conftest import at
+
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('fastapi')
+
+from fastapi import HTTPException  # noqa: E402
+
+from api import crud, schemas  # noqa: E402
+
+
+def test_create_rejects_overlap_with_owned_call(db, make_user, make_call):
+    owner = make_user()
+    existing = make_call(owner, at(1, 10), duration=60)
+
+    with pytest.raises(HTTPException) as error:
+        crud.create_call_for_user(db=db, user_id=owner.id,
+                                  call=schemas.CallCreate(title='late', date=at(1, 10, 30), duration=60))
+
+    assert error.value.status_code == 409
+    assert error.value.detail['conflicting_call_ids'] == [existing.id]
+
+
+def test_back_to_back_calls_do_not_conflict(db, make_user, make_call):
+    owner = make_user()
+    make_call(owner, at(1, 10), duration=60)
+
+    call = crud.create_call_for_user(db=db, user_id=owner.id,
+                                     call=schemas.CallCreate(title='next', date=at(1, 11), duration=30))
+
+    assert call.id is not None
+
+
+def test_create_rejects_overlap_with_call_user_only_attends(db, make_user, make_call):
+    host, guest = make_user(), make_user()
+    attended = make_call(host, at(1, 10), duration=60, members=[guest])
+
+    with pytest.raises(HTTPException) as error:
+        crud.create_call_for_user(db=db, user_id=guest.id,
+                                  call=schemas.CallCreate(title='own', date=at(1, 10, 15), duration=15))
+
+    assert error.value.detail['conflicting_call_ids'] == [attended.id]
+
+
+def test_add_user_checks_calls_user_only_attends(db, make_user, make_call):
+    host, other_host, guest = make_user(), make_user(), make_user()
+    make_call(other_host, at(1, 10), duration=60, members=[guest])
+    call = make_call(host, at(1, 10, 30), duration=60)
+
+    with pytest.raises(HTTPException) as error:
+        crud.add_user_to_call(db=db, user_id=guest.id, call_id=call.id)
+
+    assert error.value.status_code == 409
+
+
+def test_bulk_add_reports_users_busy_in_calls_they_attend(db, make_user, make_call):
+    host, other_host, busy, free = make_user(), make_user(), make_user(), make_user()
+    make_call(other_host, at(1, 10), duration=60, members=[busy])
+    call = make_call(host, at(1, 10, 30), duration=60)
+
+    result = crud.add_users_to_call(db=db, call_id=call.id, user_ids=[busy.id, free.id])
+
+    assert result.conflicting == [busy.id]
+    assert result.added == [free.id]
+
+
+def test_reschedule_into_an_attended_call_conflicts(db, make_user, make_call):
+    owner, other_host = make_user(), make_user()
+    make_call(other_host, at(2, 9), duration=60, members=[owner])
+    call = make_call(owner, at(1, 9), duration=60)
+
+    with pytest.raises(HTTPException) as error:
+        crud.update_call(db=db, call_id=call.id, user_id=owner.id, request=schemas.CallUpdate(date=at(2, 9, 30)))
+
+    assert error.value.status_code == 409
+
+
+def test_database_rejects_calls_longer_than_the_lookback(db, make_user, make_call):
+    from sqlalchemy.exc import IntegrityError
+
+    owner = make_user()
+    with pytest.raises(IntegrityError):
+        make_call(owner, at(1, 10), duration=24 * 60 + 1)
+    db.rollback()
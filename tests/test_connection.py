@@ -0,0 +1,150 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('dotenv')
+pytest.importorskip('psycopg2')
+pytest.importorskip('asyncpg')
+
+from api.websocket.connection import Connection, ConnectionClosed, manager  # noqa: E402
+from api.websocket.handlers import file_handler  # noqa: E402
+from core.config import settings  # noqa: E402
+
+
+class SilentWebSocket:
+    async def send_text(self, data: str):
+        pass
+
+    async def send_bytes(self, data: bytes):
+        pass
+
+
+def test_put_fails_fast_on_a_closed_connection():
+    async def run():
+        connection = Connection(SilentWebSocket(), user_id=None, queue_size=1)
+        connection.close()
+        with pytest.raises(ConnectionClosed):
+            await connection.put('text', 'hello')
+
+    asyncio.run(run())
+
+
+def test_put_waiting_for_space_is_released_by_close():
+    async def run():
+        # no writer drains this queue, the second put waits for space
+        connection = Connection(SilentWebSocket(), user_id=None, queue_size=1)
+        await connection.put('text', 'first')
+        waiting = asyncio.ensure_future(connection.put('text', 'second'))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+
+        manager.disconnect(connection)
+        with pytest.raises(ConnectionClosed):
+            await asyncio.wait_for(waiting, timeout=1)
+
+    asyncio.run(run())
+
+
+def test_send_to_a_closed_connection_is_dropped():
+    async def run():
+        connection = Connection(SilentWebSocket(), user_id=None, queue_size=4)
+        connection.close()
+        return connection.enqueue('text', 'hello'), connection.queue.qsize()
+
+    assert asyncio.run(run()) == (False, 0)
+
+
+def test_stream_stops_when_the_client_goes_away(tmp_path, monkeypatch):
+    image = tmp_path / 'image.jpg'
+    image.write_bytes(b'x' * 10_000)
+    monkeypatch.setattr(file_handler.settings, 'WS_FILE_CHUNK_SIZE', 1_000)
+    opened = []
+
+    def tracking_open(*args, **kwargs):
+        f = open(*args, **kwargs)
+        opened.append(f)
+        return f
+
+    monkeypatch.setattr(file_handler, 'open', tracking_open, raising=False)
+
+    async def run():
+        # queue space for the header and two chunks, then the writer "dies"
+        connection = Connection(SilentWebSocket(), user_id=None, queue_size=3)
+        asyncio.get_running_loop().call_later(0.05, connection.close)
+        return await asyncio.wait_for(file_handler.stream_file(image, offset=0, connection=connection), timeout=1)
+
+    result = asyncio.run(run())
+
+    assert result['complete'] is False
+    assert opened and opened[0].closed
+
+
+class SlowWebSocket:
+    """Client that reads slowly, it goes away once it has the answer to request `last_id`."""
+
+    def __init__(self, frames: list, last_id: int):
+        self.frames = frames
+        self.last_id = last_id
+        self.texts: list[dict] = []
+        self.chunks = 0
+        self.close_code = None
+        self.done = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def receive_json(self):
+        from fastapi import WebSocketDisconnect
+
+        if self.frames:
+            await asyncio.sleep(0.01)
+            return self.frames.pop(0)
+        await asyncio.wait_for(self.done.wait(), timeout=5)
+        raise WebSocketDisconnect()
+
+    async def send_text(self, data: str):
+        await asyncio.sleep(0.001)
+        message = json.loads(data)
+        self.texts.append(message)
+        if message.get('id') == self.last_id and 'data' in message:
+            self.done.set()
+
+    async def send_bytes(self, data: bytes):
+        await asyncio.sleep(0.001)
+        self.chunks += 1
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+        self.done.set()
+
+
+def test_response_is_not_lost_behind_a_download_on_a_slow_socket(tmp_path, monkeypatch):
+    import api.websocket as ws
+
+    image = tmp_path / 'image.jpg'
+    image.write_bytes(b'x' * 100_000)
+    monkeypatch.setattr(settings, 'WS_FILE_CHUNK_SIZE', 1_000)
+    monkeypatch.setattr(settings, 'WS_SEND_QUEUE_SIZE', 8)
+    monkeypatch.setattr(settings, 'WS_STREAM_QUEUE_SLOTS', 4)
+    monkeypatch.setattr(settings, 'WS_SLOW_CONSUMER_POLICY', 'disconnect')
+
+    async def requested_data(request, db, connection=None):
+        if request['path'] == '/download':
+            return await file_handler.stream_file(image, offset=0, connection=connection, request_id=request['id'])
+        return {'status': 'OK'}
+
+    monkeypatch.setattr(ws, 'get_requested_data', requested_data)
+    websocket = SlowWebSocket([{'id': 1, 'method': 'GET', 'path': '/download'},
+                               {'id': 2, 'method': 'GET', 'path': '/other'}], last_id=1)
+
+    asyncio.run(ws.websocket_endpoint(websocket))
+
+    responses = {message['id']: message for message in websocket.texts if 'data' in message}
+    assert websocket.close_code is None
+    assert responses[2] == {'id': 2, 'data': {'status': 'OK'}}
+    assert responses[1]['data']['complete'] is True
+    assert websocket.chunks == 100
+    # the other request was answered while the download was still streaming
+    assert websocket.texts.index(responses[2]) < websocket.texts.index(responses[1])
@@ -0,0 +1,81 @@
+import gzip
+import json
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('fastapi')
+
+import anyio  # noqa: E402
+from starlette.responses import StreamingResponse  # noqa: E402
+
+from api import export  # noqa: E402
+from core.config import settings  # noqa: E402
+from core.database import SessionLocal  # noqa: E402
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    """Sessions opened by exports, with whether each was closed."""
+    opened = []
+
+    def tracked_session():
+        session = SessionLocal()
+        close = session.close
+        state = {'closed': False}
+
+        def tracked_close():
+            state['closed'] = True
+            close()
+
+        session.close = tracked_close
+        opened.append(state)
+        return session
+
+    monkeypatch.setattr(export, 'SessionLocal', tracked_session)
+    monkeypatch.setattr(settings, 'EXPORT_BATCH_SIZE', 1)
+    return opened
+
+
+def test_export_streams_every_row(client, make_user):
+    users = [make_user() for _ in range(3)]
+    client.user_id = users[0].id
+
+    response = client.get('/users/export', params={'gzip': True})
+
+    assert response.status_code == 200, response.text
+    body = response.content
+    # requests decodes Content-Encoding: gzip itself, older versions leave it
+    if body[:2] == b'\x1f\x8b':
+        body = gzip.decompress(body)
+    assert [json.loads(line)['id'] for line in body.splitlines()] == [user.id for user in users]
+
+
+@pytest.mark.parametrize('compressed', [False, True])
+def test_aborted_download_releases_the_session(compressed, sessions, make_user):
+    for _ in range(5):
+        make_user()
+    sent = []
+
+    async def download():
+        first_chunk = anyio.Event()
+
+        async def receive():
+            await first_chunk.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+            if message.get('body'):
+                first_chunk.set()
+
+        response = StreamingResponse(export.export_stream(export.users_statement(), gzip=compressed))
+        await response({'type': 'http', 'headers': []}, receive, send)
+        # the response is still referenced, only an explicit close releases the session
+        return response
+
+    response = anyio.run(download)
+
+    assert response is not None
+    assert sessions == [{'closed': True}]
+    assert not any(message.get('more_body') is False for message in sent)
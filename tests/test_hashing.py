@@ -0,0 +1,90 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('passlib')
+
+from fastapi import HTTPException  # noqa: E402
+
+from api import hashing  # noqa: E402
+
+
+def square(value: int):
+    return value * value
+
+
+def crash():
+    os._exit(1)
+
+
+def wait_for(event_path: str):
+    # workers are other processes, a file is the simplest shared signal
+    while not os.path.exists(event_path):
+        pass
+    return True
+
+
+@pytest.fixture
+def pool():
+    pool = hashing.HashingPool(workers=1, queue_limit=4, blocking_limit=1)
+    yield pool
+    if pool._executor is not None:
+        pool._executor.shutdown(cancel_futures=True)
+
+
+def test_async_callers_get_results(pool):
+    async def run():
+        return await asyncio.gather(*(pool.run_async(square, n) for n in range(4)))
+
+    assert asyncio.run(run()) == [0, 1, 4, 9]
+    assert pool.statistics()['queue_depth'] == 0
+
+
+def test_blocking_callers_beyond_their_limit_are_rejected(pool, tmp_path):
+    release = tmp_path / 'release'
+    blocked = threading.Thread(target=pool.run, args=(wait_for, str(release)))
+    blocked.start()
+    while pool.statistics()['blocking'] == 0:
+        pass
+
+    with pytest.raises(HTTPException) as error:
+        pool.run(square, 2)
+
+    async def run():
+        # async callers do not hold a thread, they are only bound by the queue limit
+        admitted = asyncio.ensure_future(pool.run_async(square, 2))
+        await asyncio.sleep(0)
+        release.touch()
+        return await admitted
+
+    assert asyncio.run(run()) == 4
+    blocked.join()
+    assert error.value.status_code == 503
+    assert pool.statistics()['rejected'] == 1
+
+
+def test_queue_limit_applies_to_async_callers(pool, tmp_path):
+    release = tmp_path / 'release'
+
+    async def run():
+        waiting = [asyncio.ensure_future(pool.run_async(wait_for, str(release))) for _ in range(4)]
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException):
+            await pool.run_async(square, 2)
+        release.touch()
+        return await asyncio.gather(*waiting)
+
+    assert asyncio.run(run()) == [True] * 4
+
+
+def test_pool_recovers_after_a_worker_dies(pool):
+    with pytest.raises(HTTPException) as error:
+        pool.run(crash)
+
+    assert error.value.status_code == 503
+    assert pool.run(square, 3) == 9
+    assert asyncio.run(pool.run_async(square, 4)) == 16
+    assert pool.statistics()['restarts'] == 1
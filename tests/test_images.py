@@ -0,0 +1,95 @@
+import io
+
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('PIL')
+
+from fastapi import HTTPException  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from api import images  # noqa: E402
+from core.config import settings  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'IMAGE_STORE_FOLDER', str(tmp_path / 'objects'))
+    return tmp_path / 'objects'
+
+
+def jpeg(width: int = 800, height: int = 600, color: str = 'red') -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def originals(store) -> list:
+    return [path for path in store.iterdir() if '_' not in path.stem]
+
+
+def test_identical_uploads_are_stored_once(store):
+    image = jpeg()
+
+    first = images.store_profile_image(io.BytesIO(image))
+    second = images.store_profile_image(io.BytesIO(image))
+
+    assert first == second
+    assert originals(store) == [first]
+    assert sorted(path.name for path in store.iterdir()) == sorted(
+        [first.name] + [f'{first.stem}_{size}{settings.IMAGE_EXTENSION}' for size in settings.IMAGE_RENDITIONS])
+
+
+def test_small_size_gets_its_rendition(store):
+    original = images.store_profile_image(io.BytesIO(jpeg()))
+
+    path = images.resolve_profile_image(str(original), size=64)
+
+    assert path.name == f'{original.stem}_64{settings.IMAGE_EXTENSION}'
+    with Image.open(path) as image:
+        assert max(image.size) == 64
+
+
+def test_size_above_the_largest_rendition_gets_the_original(store):
+    original = images.store_profile_image(io.BytesIO(jpeg()))
+
+    assert images.resolve_profile_image(str(original), size=max(settings.IMAGE_RENDITIONS) + 1) == original
+
+
+@pytest.mark.parametrize('content, status_code', [(b'not an image', 400), (None, 413)])
+def test_failed_upload_leaves_no_part_file(store, monkeypatch, content, status_code):
+    if content is None:
+        content = jpeg()
+        monkeypatch.setattr(settings, 'MAX_IMAGE_SIZE', len(content) - 1)
+        monkeypatch.setattr(settings, 'IMAGE_CHUNK_SIZE', 1024)
+
+    with pytest.raises(HTTPException) as error:
+        images.store_profile_image(io.BytesIO(content))
+
+    assert error.value.status_code == status_code
+    assert list(store.iterdir()) == []
+
+
+def test_decompression_bomb_is_an_invalid_image(store, monkeypatch):
+    # a few kilobytes of JPEG that decode to more pixels than Pillow allows
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 100 * 100)
+
+    with pytest.raises(HTTPException) as error:
+        images.store_profile_image(io.BytesIO(jpeg(500, 500)))
+
+    assert error.value.status_code == 400
+    assert list(store.iterdir()) == []
+
+
+def test_rendering_a_bomb_is_an_invalid_image(store, monkeypatch):
+    original = images.store_profile_image(io.BytesIO(jpeg(500, 500, color='blue')))
+    for path in store.iterdir():
+        if path != original:
+            path.unlink()
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 100)
+
+    with pytest.raises(HTTPException) as error:
+        images.get_rendition(original, 64)
+
+    assert error.value.status_code == 400
+    assert not any(path.suffix == '.part' for path in store.iterdir())
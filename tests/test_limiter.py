@@ -0,0 +1,165 @@
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('requests')
+pytest.importorskip('dotenv')
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.responses import JSONResponse, StreamingResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+from starlette.testclient import TestClient  # noqa: E402
+
+from core.config import settings  # noqa: E402
+from core.limiter import AIMDLimiter, ConcurrencyLimiter, ConcurrencyLimitMiddleware  # noqa: E402
+
+NOW = 1_000.0
+TARGET_MS = 100
+FAST_MS = 1
+SLOW_MS = 2 * TARGET_MS
+
+
+class Clock:
+    """Monotonic clock seen by the limiter, tests move it by assigning now."""
+
+    def __init__(self):
+        self.now = NOW
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def make_limiter(clock, initial: int = 10, minimum: int = 2, maximum: int = 20):
+    return AIMDLimiter('reads', TARGET_MS, initial=initial, minimum=minimum, maximum=maximum, backoff=0.5,
+                       clock=clock)
+
+
+def finish(limiter: AIMDLimiter, concurrent: int, latency_ms: float, overloaded: bool = False):
+    """concurrent requests run side by side, then all finish with the same latency."""
+    for _ in range(concurrent):
+        assert limiter.try_acquire()
+    for _ in range(concurrent):
+        limiter.release(latency_ms, overloaded=overloaded)
+
+
+def test_requests_beyond_the_limit_are_rejected(clock):
+    limiter = make_limiter(clock, initial=2)
+
+    assert limiter.try_acquire()
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    assert (limiter.accepted, limiter.rejected) == (2, 1)
+
+
+def test_limit_only_grows_while_in_use(clock):
+    limiter = make_limiter(clock)
+
+    for _ in range(50):
+        finish(limiter, concurrent=1, latency_ms=FAST_MS)
+    assert limiter.limit == 10
+
+    finish(limiter, concurrent=10, latency_ms=FAST_MS)
+    # about one per limit's worth of requests
+    assert 10 < limiter.limit < 11
+
+
+def test_limit_decreases_once_per_target_window(clock):
+    limiter = make_limiter(clock)
+
+    finish(limiter, concurrent=5, latency_ms=SLOW_MS)
+    assert (limiter.limit, limiter.decreases) == (5, 1)
+
+    clock.now += TARGET_MS / 1000 / 2
+    finish(limiter, concurrent=1, latency_ms=FAST_MS, overloaded=True)
+    assert limiter.limit == 5
+
+    clock.now += TARGET_MS / 1000
+    finish(limiter, concurrent=1, latency_ms=FAST_MS, overloaded=True)
+    assert (limiter.limit, limiter.decreases) == (2.5, 2)
+
+
+def test_limit_stays_between_floor_and_ceiling(clock):
+    limiter = make_limiter(clock, initial=20)
+
+    for _ in range(100):
+        finish(limiter, concurrent=int(limiter.limit), latency_ms=FAST_MS)
+    assert limiter.limit == 20
+
+    for _ in range(10):
+        clock.now += TARGET_MS / 1000
+        finish(limiter, concurrent=1, latency_ms=SLOW_MS)
+    assert limiter.limit == 2
+    assert limiter.statistics()['limit'] == 2
+
+
+@pytest.fixture
+def limiter():
+    return ConcurrencyLimiter(targets={'reads': TARGET_MS, 'file': TARGET_MS}, initial=1, minimum=1, maximum=1,
+                              backoff=0.5)
+
+
+@pytest.fixture
+def in_flight_while_streaming():
+    return []
+
+
+@pytest.fixture
+def limited_client(limiter, in_flight_while_streaming):
+    reads = limiter.limiters['reads']
+
+    async def item(request):
+        return JSONResponse({'in_flight': reads.in_flight})
+
+    async def export(request):
+        def rows():
+            for n in range(3):
+                in_flight_while_streaming.append(reads.in_flight)
+                yield f'{n}\n'.encode()
+
+        return StreamingResponse(rows())
+
+    async def fail(request):
+        raise RuntimeError('boom')
+
+    app = Starlette(routes=[Route('/item', item), Route('/export', export), Route('/fail', fail),
+                            Route('/internal/stats', item)])
+    return TestClient(ConcurrencyLimitMiddleware(app, limiter=limiter), raise_server_exceptions=False)
+
+
+def test_requests_over_the_limit_get_a_fast_503(limited_client, limiter):
+    assert limiter.limiters['reads'].try_acquire()
+
+    response = limited_client.get('/item')
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(settings.CONCURRENCY_RETRY_AFTER)
+    assert limiter.limiters['reads'].rejected == 1
+    # exempt paths stay reachable
+    assert limited_client.get('/internal/stats').status_code == 200
+
+
+def test_admitted_requests_hold_a_slot_until_the_response_starts(limited_client, limiter):
+    response = limited_client.get('/item')
+
+    assert response.json() == {'in_flight': 1}
+    assert limiter.limiters['reads'].in_flight == 0
+
+
+def test_streamed_bodies_do_not_hold_a_slot(limited_client, limiter, in_flight_while_streaming):
+    response = limited_client.get('/export')
+
+    assert response.content == b'0\n1\n2\n'
+    assert in_flight_while_streaming == [0, 0, 0]
+    assert limited_client.get('/item').status_code == 200
+
+
+def test_failed_requests_release_their_slot_and_count_as_overload(limited_client, limiter):
+    response = limited_client.get('/fail')
+
+    assert response.status_code == 500
+    assert limiter.limiters['reads'].in_flight == 0
+    assert limiter.limiters['reads'].decreases == 1
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip('fastapi')
+
+from fastapi import HTTPException  # noqa: E402
+
+from api import pagination  # noqa: E402
+
+
+@pytest.mark.parametrize('values', [['abc'], [1.5], [True], [None], [[1]], [1, 2]])
+def test_user_cursor_rejects_anything_but_one_int(values):
+    with pytest.raises(HTTPException) as error:
+        pagination.decode_user_cursor(pagination.encode_cursor(*values))
+
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize('values', [
+    ['not a date', 1],
+    [123, 1],
+    [None, 1],
+    ['2099-01-01T10:00:00', 'abc'],
+    ['2099-01-01T10:00:00', None],
+    ['2099-01-01T10:00:00'],
+])
+def test_call_cursor_rejects_malformed_values(values):
+    with pytest.raises(HTTPException) as error:
+        pagination.decode_call_cursor(pagination.encode_cursor(*values))
+
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize('cursor', [123, None, ['abc'], {'id': 1}, 'not base64!', ''])
+def test_cursor_that_is_not_an_encoded_string_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        pagination.decode_user_cursor(cursor)
+
+    assert error.value.status_code == 400
+
+
+def test_cursors_round_trip():
+    date = datetime(2099, 1, 1, 10)
+
+    assert pagination.decode_user_cursor(pagination.encode_cursor(42)) == 42
+    assert pagination.decode_call_cursor(pagination.encode_cursor(date.isoformat(), 7)) == (date, 7)
+
+
+def test_bad_cursor_is_a_client_error_over_http(client, make_user):
+    client.user_id = make_user().id
+
+    response = client.get('/users/all', params={'cursor': pagination.encode_cursor('abc')})
+
+    assert response.status_code == 400
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('asyncpg')
+pytest.importorskip('orjson')
+pytest.importorskip('dotenv')
+pytest.importorskip('fastapi')
+
+from api.websocket import pubsub  # noqa: E402
+
+
+class FakeConnection:
+    """Stands in for the asyncpg publish connection, records payloads or fails on demand."""
+
+    def __init__(self, fail_on: str | None = None):
+        self.fail_on = fail_on
+        self.payloads: list[str] = []
+
+    def is_closed(self):
+        return False
+
+    async def execute(self, query: str, channel: str, payload: str):
+        if self.fail_on is not None and self.fail_on in payload:
+            raise RuntimeError('pg_notify failed')
+        assert len(payload.encode('utf-8')) <= pubsub.MAX_NOTIFY_PAYLOAD
+        self.payloads.append(payload)
+
+    async def close(self):
+        pass
+
+
+def backend(connection: FakeConnection) -> pubsub.PostgresBackend:
+    backend = pubsub.PostgresBackend(dsn='', channel='test', batch_size=1000, batch_interval=0.001)
+    backend._publish_connection = connection
+    return backend
+
+
+def test_oversized_message_is_rejected_before_buffering():
+    connection = FakeConnection()
+    publisher = backend(connection)
+
+    assert not publisher.publish({'data': 'x' * pubsub.MAX_NOTIFY_PAYLOAD})
+    assert publisher.publish({'data': 'small'})
+    asyncio.run(publisher._flush())
+
+    assert publisher.stats.rejected == 1
+    assert len(connection.payloads) == 1
+
+
+def test_batches_are_sized_in_bytes():
+    connection = FakeConnection()
+    publisher = backend(connection)
+    # three bytes per character in utf-8, a length in characters would overfill the payload
+    for _ in range(20):
+        publisher.publish({'data': '€' * 500})
+
+    asyncio.run(publisher._flush())
+
+    assert len(connection.payloads) > 1
+    assert publisher.stats.published == 20
+
+
+def test_failed_batch_does_not_stop_the_flusher():
+    connection = FakeConnection(fail_on='poison')
+
+    async def run():
+        publisher = backend(connection)
+        publisher._flusher = asyncio.create_task(publisher._flush_loop())
+        publisher.publish({'data': 'poison'})
+        await asyncio.sleep(0.05)
+        publisher.publish({'data': 'after'})
+        await asyncio.sleep(0.05)
+        alive = not publisher._flusher.done()
+        await publisher.stop()
+        return publisher, alive
+
+    publisher, alive = asyncio.run(run())
+
+    assert alive
+    assert publisher.stats.failed == 1
+    assert any('after' in payload for payload in connection.payloads)
+
+
+def test_stop_awaits_the_flusher_and_flushes_the_rest():
+    connection = FakeConnection()
+
+    async def run():
+        publisher = backend(connection)
+        publisher.batch_interval = 60
+        publisher._flusher = flusher = asyncio.create_task(publisher._flush_loop())
+        publisher.publish({'data': 'pending'})
+        await publisher.stop()
+        return flusher
+
+    flusher = asyncio.run(run())
+
+    assert flusher.done()
+    assert len(connection.payloads) == 1
+
+
+def test_base_backend_requires_publish():
+    with pytest.raises(TypeError):
+        pubsub.PubSubBackend()
+
+
+def test_lost_listen_connection_is_reopened(database):
+    from core.config import settings
+
+    async def run():
+        received = []
+        subscriber = pubsub.PostgresBackend(dsn=settings.DATABASE_URL, channel='test_reconnect', batch_size=1,
+                                            batch_interval=0.001)
+        await subscriber.start(received.extend)
+        try:
+            lost = subscriber._listen_connection
+            await subscriber._publish_connection.execute('SELECT pg_terminate_backend($1)',
+                                                         lost.get_server_pid())
+            for _ in range(200):
+                if subscriber.stats.reconnects:
+                    break
+                await asyncio.sleep(0.01)
+
+            subscriber.publish({'data': 'after restart'})
+            for _ in range(200):
+                if received:
+                    break
+                await asyncio.sleep(0.01)
+            return subscriber, lost, received
+        finally:
+            await subscriber.stop()
+
+    subscriber, lost, received = asyncio.run(run())
+
+    assert subscriber.stats.reconnects == 1
+    assert subscriber._listen_connection is not lost
+    assert received == [{'data': 'after restart'}]
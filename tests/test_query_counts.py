@@ -0,0 +1,63 @@
+"""Read endpoints run the same number of statements for one row as for many."""
+from contextlib import contextmanager
+
+import pytest
+
+from tests.conftest import at
+
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('fastapi')
+
+from sqlalchemy import event, insert  # noqa: E402
+
+from api import models  # noqa: E402
+
+SMALL, LARGE = 1, 10
+
+ENDPOINTS = (
+    '/users/all?limit={size}',
+    '/users',
+    '/users/calls',
+    '/calls/all?limit={size}',
+    '/calls/{call_id}',
+    '/calls/{call_id}/users',
+    '/contacts',
+)
+
+
+@contextmanager
+def counting_statements(engine):
+    statements = []
+
+    def count(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+
+
+def seed(db, make_user, make_call, size: int):
+    """A user with size calls of size + 1 participants each and size contacts."""
+    user = make_user()
+    others = [make_user() for _ in range(size)]
+    calls = [make_call(user, at(1 + day, 9), members=others) for day in range(size)]
+    db.execute(insert(models.users_contacts), [{'user_id': user.id, 'contact_id': other.id} for other in others])
+    db.commit()
+    return user, calls[0]
+
+
+@pytest.mark.parametrize('endpoint', ENDPOINTS)
+def test_statement_count_does_not_depend_on_rows(endpoint, client, database, db, make_user, make_call):
+    counts = []
+    for size in (SMALL, LARGE):
+        user, call = seed(db, make_user, make_call, size)
+        client.user_id = user.id
+        with counting_statements(database) as statements:
+            response = client.get(endpoint.format(size=size, call_id=call.id))
+        assert response.status_code == 200, response.text
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1], f'{endpoint}: {counts[0]} statements for {SMALL} row(s), {counts[1]} for {LARGE}'
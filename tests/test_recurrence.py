@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from tests.conftest import at
+
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('fastapi')
+
+from api import crud, models, recurrence, schemas  # noqa: E402
+from core.config import settings  # noqa: E402
+
+
+def test_open_series_without_a_window_is_expanded_from_now():
+    now = datetime.now(timezone.utc)
+    series = SimpleNamespace(date=now - timedelta(days=2 * settings.RECURRENCE_HORIZON), duration=30,
+                             recurrence_frequency='weekly', recurrence_interval=None, recurrence_until=None,
+                             exceptions=[])
+
+    dates = [occurrence.date for occurrence in recurrence.expand(series)]
+
+    assert dates[-1] > now + timedelta(days=settings.RECURRENCE_HORIZON - 7)
+
+
+def test_exceptions_survive_an_update_that_repeats_the_schedule(db, make_user, make_call):
+    owner = make_user()
+    call = make_call(owner, at(1, 10), recurrence_frequency='daily')
+    crud.update_occurrence(db=db, call_id=call.id, user_id=owner.id,
+                           request=schemas.OccurrenceUpdate(occurrence=at(2, 10), cancelled=True))
+
+    # the same date sent back naive, as a client echoing the call would
+    crud.update_call(db=db, call_id=call.id, user_id=owner.id,
+                     request=schemas.CallUpdate(title='renamed', date=datetime(2099, 1, 1, 10), duration=60,
+                                                recurrence_frequency='daily'))
+
+    assert db.query(models.CallException).filter_by(call_id=call.id).count() == 1
+
+
+def test_moving_a_series_drops_its_exceptions(db, make_user, make_call):
+    owner = make_user()
+    call = make_call(owner, at(1, 10), recurrence_frequency='daily')
+    crud.update_occurrence(db=db, call_id=call.id, user_id=owner.id,
+                           request=schemas.OccurrenceUpdate(occurrence=at(2, 10), cancelled=True))
+
+    crud.update_call(db=db, call_id=call.id, user_id=owner.id, request=schemas.CallUpdate(date=at(1, 11)))
+
+    assert db.query(models.CallException).filter_by(call_id=call.id).count() == 0
+
+
+def test_changing_the_duration_keeps_cancelled_occurrences(db, make_user, make_call):
+    owner = make_user()
+    call = make_call(owner, at(1, 10), recurrence_frequency='daily')
+    crud.update_occurrence(db=db, call_id=call.id, user_id=owner.id,
+                           request=schemas.OccurrenceUpdate(occurrence=at(2, 10), cancelled=True))
+
+    crud.update_call(db=db, call_id=call.id, user_id=owner.id, request=schemas.CallUpdate(duration=30))
+
+    assert [exception.occurrence for exception in db.query(models.CallException).filter_by(call_id=call.id)] == \
+        [at(2, 10)]
+    dates = [occurrence.date for occurrence in recurrence.expand(db.get(models.Call, call.id), at(1, 0), at(4, 0))]
+    assert dates == [at(1, 10), at(3, 10)]
+
+
+def test_moving_a_series_keeps_exceptions_still_on_an_occurrence(db, make_user, make_call):
+    owner = make_user()
+    call = make_call(owner, at(1, 10), recurrence_frequency='daily')
+    for day in (2, 3):
+        crud.update_occurrence(db=db, call_id=call.id, user_id=owner.id,
+                               request=schemas.OccurrenceUpdate(occurrence=at(day, 10), cancelled=True))
+
+    # every other day from the 1st, the 3rd is still an occurrence, the 2nd is not
+    crud.update_call(db=db, call_id=call.id, user_id=owner.id, request=schemas.CallUpdate(recurrence_interval=2))
+
+    assert [exception.occurrence for exception in db.query(models.CallException).filter_by(call_id=call.id)] == \
+        [at(3, 10)]
+
+
+def test_cancelled_occurrence_does_not_conflict(db, make_user, make_call):
+    owner = make_user()
+    series = make_call(owner, at(1, 10), recurrence_frequency='daily')
+    crud.update_occurrence(db=db, call_id=series.id, user_id=owner.id,
+                           request=schemas.OccurrenceUpdate(occurrence=at(2, 10), cancelled=True))
+
+    assert crud.get_conflicting_call_ids(db=db, user_id=owner.id, intervals=[(at(2, 10), at(2, 11))]) == []
+    assert crud.get_conflicting_call_ids(db=db, user_id=owner.id, intervals=[(at(3, 10), at(3, 11))]) == [series.id]
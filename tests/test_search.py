@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from tests.conftest import at
+
+pytest.importorskip('fastapi')
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('psycopg2')
+
+from api import crud, models, trigrams  # noqa: E402
+from api.websocket.handlers import get_requested_data  # noqa: E402
+from core.config import settings  # noqa: E402
+
+
+@pytest.mark.parametrize('body', [
+    {},
+    {'q': 'ab'},
+    {'q': '   ab   '},
+    {'q': 'x' * (settings.SEARCH_MAX_LENGTH + 1)},
+    {'q': ['abc']},
+    {'q': 'abc', 'limit': 0},
+    {'q': 'abc', 'limit': settings.SEARCH_MAX_LIMIT + 1},
+    {'q': 'abc', 'limit': 'ten'},
+])
+def test_websocket_search_validates_its_body(body):
+    # rejected before any query runs, the handler has no session to run one on
+    response = asyncio.run(get_requested_data({'method': 'GET', 'path': '/users/search', 'body': body}, db=None))
+
+    assert response['status_code'] == 422
+
+
+def test_prefix_matches_rank_first(db, make_user):
+    inner = make_user(email='mark.anna@example.com')
+    prefix = make_user(email='anna@example.com')
+
+    assert [user.id for user in crud.search_users(db=db, query='anna')] == [prefix.id, inner.id]
+
+
+def test_wildcards_match_literally(db, make_user):
+    literal = make_user(email='a_b_c@example.com')
+    make_user(email='axbxc@example.com')
+
+    assert [user.id for user in crud.search_users(db=db, query='a_b_c')] == [literal.id]
+
+
+def test_prefix_matches_are_kept_when_candidates_run_out(db, make_user, monkeypatch):
+    for n in range(5):
+        make_user(email=f'zz{n}.bob@example.com')
+    prefix = make_user(email='bob@example.com')
+    monkeypatch.setattr(settings, 'SEARCH_CANDIDATES', 2)
+
+    users = crud.search_users(db=db, query='bob', limit=3)
+
+    assert len(users) == 3
+    assert users[0].id == prefix.id
+
+
+def test_narrowed_query_leaves_out_frequent_trigrams():
+    frequent = frozenset(trigram for word in ('user', 'example.com') for *_, trigram in trigrams.like_trigrams(word))
+
+    assert trigrams.narrow_query('user123456@example.com', frequent) == 'er123456@ex'
+    assert trigrams.narrow_query('123456', frequent) == '123456'
+    assert trigrams.narrow_query('example', frequent) == 'example'
+
+
+def test_narrowed_search_still_matches_the_whole_query(db, make_user, monkeypatch):
+    match = make_user(email='user1@example.com')
+    prefix = make_user(email='ser1@example.com')
+    make_user(email='user10@example.com')
+    frequent = frozenset(trigram for *_, trigram in trigrams.like_trigrams('user'))
+    monkeypatch.setattr(trigrams.frequent_trigrams, 'get', lambda db, text_column: frequent)
+
+    assert [user.id for user in crud.search_users(db=db, query='user1@')] == [match.id]
+    assert [user.id for user in crud.search_users(db=db, query='ser1@')] == [prefix.id, match.id]
+
+
+def test_frequent_trigrams_are_recounted_after_the_refresh(db, make_user, monkeypatch):
+    for n in range(20):
+        make_user(email=f'user{n}@example.com')
+    make_user(email='bob@other.org')
+    now = [0.0]
+    counter = trigrams.FrequentTrigrams(sample_rows=1000, share=0.5, refresh=60, clock=lambda: now[0])
+
+    frequent = counter.get(db, models.User.email)
+    counter.get(db, models.User.email)
+    now[0] = 61
+    counter.get(db, models.User.email)
+
+    assert {'use', 'exa', 'com'} <= frequent
+    assert 'bob' not in frequent
+    assert counter.statistics() == {'columns': 1, 'samples': 2}
+
+
+def test_call_search_only_sees_own_calls(db, make_user, make_call):
+    user, other = make_user(), make_user()
+    own = make_call(user, at(1, 10), title='weekly sync')
+    make_call(other, at(1, 12), title='weekly sync')
+
+    assert [call.id for call in crud.search_calls(db=db, user_id=user.id, query='sync')] == [own.id]
+
+
+def test_http_search_caps_the_limit(client, make_user):
+    client.user_id = make_user().id
+
+    response = client.get('/users/search', params={'q': 'user', 'limit': settings.SEARCH_MAX_LIMIT + 1})
+
+    assert response.status_code == 422
@@ -0,0 +1,98 @@
+import time
+from datetime import timedelta
+
+import pytest
+
+pytest.importorskip('jose')
+pytest.importorskip('pydantic')
+pytest.importorskip('dotenv')
+
+from api import JWT, schemas  # noqa: E402
+
+NOW = 1_000_000.0
+
+
+class CredentialsError(Exception):
+    pass
+
+
+class Clock:
+    """Wall clock seen by the cache, tests move it by assigning now."""
+
+    def __init__(self):
+        self.now = NOW
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def cache(clock):
+    return JWT.TokenCache(max_size=2, clock=clock)
+
+
+@pytest.fixture
+def real_cache(monkeypatch):
+    cache = JWT.TokenCache(max_size=2)
+    monkeypatch.setattr(JWT, 'token_cache', cache)
+    return cache
+
+
+def test_entry_is_served_until_exp(cache, clock):
+    cache.put(b'key', schemas.TokenData(user_id=1), expires_at=NOW + 60)
+
+    clock.now = NOW + 59
+    assert cache.get(b'key').user_id == 1
+
+    clock.now = NOW + 60
+    assert cache.get(b'key') is None
+    assert cache.statistics() == {'size': 0, 'max_size': 2, 'hits': 1, 'misses': 1}
+
+
+def test_least_recently_used_entry_is_evicted(cache, clock):
+    for user_id in (1, 2):
+        cache.put(bytes([user_id]), schemas.TokenData(user_id=user_id), expires_at=NOW + 60)
+    cache.get(bytes([1]))
+
+    cache.put(bytes([3]), schemas.TokenData(user_id=3), expires_at=NOW + 60)
+
+    assert cache.get(bytes([2])) is None
+    assert cache.get(bytes([1])).user_id == 1
+    assert cache.get(bytes([3])).user_id == 3
+
+
+def test_zero_size_disables_the_cache(clock):
+    cache = JWT.TokenCache(max_size=0, clock=clock)
+    cache.put(b'key', schemas.TokenData(user_id=1), expires_at=NOW + 60)
+
+    assert cache.get(b'key') is None
+
+
+def test_verified_token_is_served_from_the_cache(real_cache, monkeypatch):
+    token = JWT.create_access_token(data={'user_id': 7})
+    assert JWT.verify_token(token, CredentialsError()).user_id == 7
+
+    def fail(*args, **kwargs):
+        raise AssertionError('cached token was decoded again')
+
+    monkeypatch.setattr(JWT.jwt, 'decode', fail)
+    assert JWT.verify_token(token, CredentialsError()).user_id == 7
+    assert real_cache.statistics()['hits'] == 1
+
+
+def test_cached_token_is_rejected_once_it_expires(real_cache):
+    token = JWT.create_access_token(data={'user_id': 7}, expires_delta=timedelta(seconds=1))
+    JWT.verify_token(token, CredentialsError())
+    assert real_cache.statistics()['size'] == 1
+
+    # exp has whole second resolution, two seconds are past it for sure
+    time.sleep(2.1)
+
+    with pytest.raises(CredentialsError):
+        JWT.verify_token(token, CredentialsError())
+    assert real_cache.statistics()['size'] == 0
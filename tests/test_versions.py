@@ -0,0 +1,93 @@
+import pytest
+
+from tests.conftest import at
+
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('fastapi')
+
+from sqlalchemy import delete, insert  # noqa: E402
+
+from api import crud, models, schemas  # noqa: E402
+
+
+def set_members(db, call, user_ids):
+    db.execute(delete(models.calls_users).where(models.calls_users.c.call_id == call.id))
+    db.execute(insert(models.calls_users), [{'user_id': user_id, 'call_id': call.id} for user_id in user_ids])
+    db.commit()
+
+
+def test_call_version_tells_apart_member_sets_with_equal_count_and_sum(db, make_user, make_call):
+    users = [make_user() for _ in range(5)]
+    call = make_call(users[4], at(1, 9))
+
+    set_members(db, call, [users[0].id, users[3].id])
+    before = crud.get_call_version(call_id=call.id, db=db)
+    set_members(db, call, [users[1].id, users[2].id])
+    after = crud.get_call_version(call_id=call.id, db=db)
+
+    assert users[0].id + users[3].id == users[1].id + users[2].id
+    assert before != after
+
+
+def test_contacts_version_tells_apart_contact_sets_with_equal_count_and_sum(db, make_user):
+    me, *others = [make_user() for _ in range(5)]
+
+    def set_contacts(contacts):
+        db.execute(delete(models.users_contacts).where(models.users_contacts.c.user_id == me.id))
+        db.execute(insert(models.users_contacts), [{'user_id': me.id, 'contact_id': user.id} for user in contacts])
+        db.commit()
+        return crud.get_contacts_version(user_id=me.id, db=db)
+
+    assert set_contacts([others[0], others[3]]) != set_contacts([others[1], others[2]])
+
+
+def user_version(db, user):
+    return crud.get_user_version(user_id=user.id, db=db)
+
+
+def test_user_version_moves_with_everything_the_detail_embeds(db, make_user, make_call):
+    host, guest, bystander = make_user(), make_user(), make_user()
+    call = make_call(host, at(1, 9))
+    versions = {user.id: user_version(db, user) for user in (host, guest, bystander)}
+
+    def moved():
+        nonlocal versions
+        current = {user_id: crud.get_user_version(user_id=user_id, db=db) for user_id in versions}
+        changed = {user_id for user_id in versions if current[user_id] != versions[user_id]}
+        versions = current
+        return changed
+
+    crud.add_user_to_call(db=db, user_id=guest.id, call_id=call.id)
+    assert moved() == {host.id, guest.id}
+
+    crud.update_call(db=db, call_id=call.id, user_id=host.id, request=schemas.CallUpdate(title='renamed'))
+    assert moved() == {host.id, guest.id}
+
+    # the host's email is embedded in the guest's detail as a participant
+    crud.update_user(db=db, user_id=host.id, request=schemas.UserUpdate(email='renamed@example.com'))
+    assert moved() == {host.id, guest.id}
+
+    crud.remove_user_from_call(db=db, user_id=guest.id, call_id=call.id)
+    assert moved() == {host.id, guest.id}
+
+    crud.create_call_for_user(db=db, user_id=bystander.id, call=schemas.CallCreate(title='own', date=at(2, 9),
+                                                                                    duration=30))
+    assert moved() == {bystander.id}
+
+    crud.remove_call(db=db, call_id=call.id, user_id=host.id)
+    assert moved() == {host.id}
+
+
+def test_user_detail_revalidates_after_a_participant_changes(client, db, make_user, make_call):
+    host, guest = make_user(), make_user()
+    make_call(host, at(1, 9), members=[guest])
+    client.user_id = guest.id
+
+    etag = client.get('/users').headers['ETag']
+    assert client.get('/users', headers={'If-None-Match': etag}).status_code == 304
+
+    crud.update_user(db=db, user_id=host.id, request=schemas.UserUpdate(email='renamed@example.com'))
+
+    response = client.get('/users', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'renamed@example.com' in response.text
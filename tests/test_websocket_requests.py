@@ -0,0 +1,178 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('dotenv')
+pytest.importorskip('psycopg2')
+pytest.importorskip('asyncpg')
+
+from sqlalchemy.exc import DBAPIError  # noqa: E402
+
+from api import pagination  # noqa: E402
+from api.websocket.handlers import get_requested_data  # noqa: E402
+
+
+class FailingSession:
+    """Async session whose every query fails with the given exception."""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+    async def execute(self, *args, **kwargs):
+        raise self.error
+
+
+def request(body, db=None, method='GET', path='/users/all'):
+    return asyncio.run(get_requested_data({'method': method, 'path': path, 'body': body}, db=db))
+
+
+@pytest.mark.parametrize('body', [
+    {'skip': 'abc'},
+    {'limit': 0},
+    {'limit': 'ten'},
+    {'skip': -1},
+])
+def test_invalid_page_fields_are_rejected(body):
+    response = request(body)
+
+    assert response['status_code'] == 422
+
+
+@pytest.mark.parametrize('cursor', [pagination.encode_cursor('abc'), '!!!', pagination.encode_cursor(1, 2)])
+def test_bad_cursor_is_a_client_error(cursor):
+    # the cursor is decoded while building the statement, before any query runs
+    response = request({'cursor': cursor, 'limit': 5}, db=FailingSession(AssertionError('queried')))
+
+    assert response == {'error': 'Invalid cursor.', 'status_code': 400}
+
+
+@pytest.mark.parametrize('body', ['[1, 2]', '"text"', 42, '{not json'])
+def test_body_that_is_not_an_object_is_rejected(body):
+    response = request(body)
+
+    assert response == {'error': 'invalid body', 'status_code': 400}
+
+
+def test_database_error_is_reported_not_raised():
+    response = request({}, db=FailingSession(DBAPIError('SELECT', {}, Exception('connection reset'))))
+
+    assert response == {'error': 'database error', 'status_code': 500}
+
+
+@pytest.mark.parametrize('error', [TypeError('bad'), ValueError('bad'), RuntimeError('bug')])
+def test_unexpected_errors_are_server_errors(error, caplog):
+    # input is validated by the schemas, anything raised past them is a bug to log
+    response = request({}, db=FailingSession(error))
+
+    assert response == {'error': 'internal error', 'status_code': 500}
+    assert 'websocket request GET /users/all failed' in caplog.text
+
+
+def test_image_that_is_not_base64_is_a_client_error():
+    # rejected before the session is used
+    connection = type('Connection', (), {'user_id': 1})()
+
+    response = asyncio.run(get_requested_data(
+        {'method': 'PUT', 'path': '/file/upload', 'body': {'image': 'not base64!'}}, db=None, connection=connection))
+
+    assert response == {'error': 'Image must be a base64 encoded string.', 'status_code': 400}
+
+
+def test_socket_survives_malformed_frames(client):
+    with client.websocket_connect('/ws') as websocket:
+        websocket.send_text('{not json')
+        assert websocket.receive_json() == {'error': 'invalid request', 'status_code': 400}
+
+        websocket.send_json([1, 2, 3])
+        assert websocket.receive_json() == {'error': 'invalid request', 'status_code': 400}
+
+        websocket.send_json({'method': 'GET', 'path': '/nowhere'})
+        assert websocket.receive_json() == {'error': 'path not supported'}
+
+
+class FakeWebSocket:
+    """Delivers the given frames, then reports the client as gone after linger seconds."""
+
+    def __init__(self, frames: list, linger: float = 0):
+        self.frames = frames
+        self.linger = linger
+        self.sent: list[str] = []
+
+    async def accept(self):
+        pass
+
+    async def receive_json(self):
+        from fastapi import WebSocketDisconnect
+
+        await asyncio.sleep(0)
+        if not self.frames:
+            await asyncio.sleep(self.linger)
+            raise WebSocketDisconnect()
+        return self.frames.pop(0)
+
+    async def send_text(self, data: str):
+        self.sent.append(data)
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+class FailingSessionFactory:
+    async def __aenter__(self):
+        raise RuntimeError('pool exhausted')
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+def test_failed_request_gets_an_error_with_its_id(monkeypatch):
+    import api.websocket as ws
+
+    monkeypatch.setattr(ws, 'AsyncSessionLocal', FailingSessionFactory)
+    websocket = FakeWebSocket([{'id': 7, 'method': 'GET', 'path': '/users/all'}])
+
+    async def run():
+        await ws.websocket_endpoint(websocket)
+        # the writer task drains the queue on its next turn
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert any('"id":7' in frame and 'internal error' in frame for frame in websocket.sent)
+
+
+@pytest.mark.parametrize('request_frame, error', [
+    ({'id': 3, 'method': 'GET', 'path': '/nowhere'}, {'id': 3, 'error': 'path not supported'}),
+    ({'id': 4, 'method': 'GET', 'path': '/users/all', 'body': {'limit': 0}}, {'id': 4, 'status_code': 422}),
+])
+def test_handler_errors_sit_next_to_the_id(request_frame, error):
+    import json
+
+    import api.websocket as ws
+
+    websocket = FakeWebSocket([request_frame], linger=0.1)
+
+    asyncio.run(ws.websocket_endpoint(websocket))
+    response = json.loads(websocket.sent[0])
+    assert 'data' not in response
+    assert error.items() <= response.items()
+
+
+def test_disconnect_waits_for_cancelled_handlers(monkeypatch):
+    import api.websocket as ws
+
+    unwound = []
+
+    async def slow_request(request, db, connection=None):
+        try:
+            await asyncio.sleep(60)
+        finally:
+            unwound.append(request['id'])
+
+    monkeypatch.setattr(ws, 'get_requested_data', slow_request)
+    websocket = FakeWebSocket([{'id': n, 'method': 'GET', 'path': '/users/all'} for n in (1, 2)])
+
+    asyncio.run(ws.websocket_endpoint(websocket))
+
+    assert sorted(unwound) == [1, 2]